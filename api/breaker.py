@@ -0,0 +1,70 @@
+import time
+from typing import Callable
+
+class UpstreamUnavailable(Exception):
+    """Upstream is down or too slow: the circuit is open or the latency budget ran out."""
+
+class CircuitBreaker:
+    """Fails upstream calls fast while the upstream is known to be down.
+
+    closed: calls go through; failure_threshold failures in a row open it.
+    open: calls are refused until reset_timeout has passed, then exactly one
+    trial call is let through (half-open). Its success closes the circuit,
+    its failure opens it for another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self._trial else "open"
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def probe_due(self) -> bool:
+        # Open, cooled down and nobody trying yet
+        return (self.opened_at is not None and not self._trial
+                and self._clock() - self.opened_at >= self.reset_timeout)
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.probe_due():
+            self._trial = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+            self.opened_at = self._clock()
+            self.opens += 1
+        self._trial = False
+
+    def release(self) -> None:
+        # A call that ended without a verdict (cancelled); let another try
+        self._trial = False
+
+    def reset(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+Loader = Callable[[], Awaitable[Any]]
+
+class _Entry:
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value: Any, stored_at: float):
+        self.value = value
+        self.stored_at = stored_at
+
+class TTLCache:
+    """In-process async cache with stale-while-revalidate.
+
+    Fresh entries are returned as-is. Stale entries are still returned right
+    away while a single background task refreshes them. Entries older than
+    ttl + max_stale are treated as missing and reloaded inline. Concurrent
+    misses for the same key share one load. With max_entries set, the least
+    recently used entries are evicted beyond that many.
+    """
+
+    def __init__(self, ttl: float, max_stale: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, max_entries: Optional[int] = None):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._clock = clock
+        # Kept in least-recently-used order when max_entries is set
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: Hashable, loader: Loader) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return await self._load(key, loader)
+        if self.max_entries is not None:
+            self._entries[key] = self._entries.pop(key)
+
+        age = self._clock() - entry.stored_at
+        if age <= self.ttl:
+            self.hits += 1
+            return entry.value
+
+        if self.max_stale is not None and age > self.ttl + self.max_stale:
+            # Too old to be useful, wait for fresh data
+            self.misses += 1
+            return await self._load(key, loader)
+
+        # Serve stale, refresh in the background (at most one refresh per key)
+        self.stale_hits += 1
+        self._refresh(key, loader)
+        return entry.value
+
+    def stats(self) -> Dict[str, int]:
+        return {"hit": self.hits, "stale": self.stale_hits, "miss": self.misses}
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        return entry.value if entry else None
+
+    def age(self, key: Hashable) -> Optional[float]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return self._clock() - entry.stored_at
+
+    def is_fresh(self, key: Hashable) -> bool:
+        age = self.age(key)
+        return age is not None and age <= self.ttl
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries.pop(key, None)
+        self._entries[key] = _Entry(value, self._clock())
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _task(self, key: Hashable, loader: Loader) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, loader))
+            task.add_done_callback(_log_load_failure)
+            self._inflight[key] = task
+        return task
+
+    async def _run(self, key: Hashable, loader: Loader) -> Any:
+        try:
+            value = await loader()
+            self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _load(self, key: Hashable, loader: Loader) -> Any:
+        # Shield so one cancelled caller does not abort the shared load
+        return await asyncio.shield(self._task(key, loader))
+
+    def _refresh(self, key: Hashable, loader: Loader) -> None:
+        self._task(key, loader)
+
+def _log_load_failure(task: asyncio.Task) -> None:
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        # A stale value (if any) keeps being served; the next request retries
+        print(f"Cache load failed: {exc}")
@@ -0,0 +1,124 @@
+import base64
+import bisect
+import itertools
+import json
+from typing import List, Optional, Tuple
+from .scraper import Property
+
+SORTS = ("price_asc", "price_desc")
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded))["o"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
+
+def price_matches(price_eur: Optional[int], min_price: Optional[int] = None, max_price: Optional[int] = None,
+                  price_floor: Optional[int] = None) -> bool:
+    # Same rules as CatalogueIndex.query, for one row at a time
+    if price_eur is None:
+        return min_price is None and max_price is None
+    if min_price is not None and price_eur < min_price:
+        return False
+    if price_floor is not None and price_eur < price_floor:
+        return False
+    return max_price is None or price_eur <= max_price
+
+class CatalogueIndex:
+    """Price-sorted view of one catalogue snapshot.
+
+    Built once per scrape. Price ranges are answered with bisect on the
+    pre-sorted prices, so a sorted query costs O(log n + page size); a
+    filtered one in upstream order walks the catalogue up to the end of its
+    page. Nothing is re-parsed or re-sorted per request. Listings without a price
+    ("Consultar") always come last, as on the tenant sites.
+    """
+
+    def __init__(self, properties: List[Property]):
+        self.properties = properties
+        self.by_id = {p.id: p for p in properties}
+        self._by_price = sorted(
+            (p for p in properties if p.price_eur is not None),
+            key=lambda p: p.price_eur,
+        )
+        self._prices = [p.price_eur for p in self._by_price]
+        self._unpriced = [p for p in properties if p.price_eur is None]
+
+    def _price_range(self, low: Optional[int], high: Optional[int]) -> Tuple[int, int]:
+        start = bisect.bisect_left(self._prices, low) if low is not None else 0
+        end = bisect.bisect_right(self._prices, high) if high is not None else len(self._prices)
+        return start, max(start, end)
+
+    def query(self, min_price: Optional[int] = None, max_price: Optional[int] = None,
+              price_floor: Optional[int] = None, sort: Optional[str] = None,
+              limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Property], Optional[str], int]:
+        """Return (page, next cursor, total matches).
+
+        min_price/max_price drop unpriced listings; price_floor only drops
+        priced listings below it.
+        """
+        if sort is not None and sort not in SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        offset = decode_cursor(cursor)
+
+        lower_bounds = [v for v in (min_price, price_floor) if v is not None]
+        start, end = self._price_range(max(lower_bounds) if lower_bounds else None, max_price)
+        unpriced = self._unpriced if min_price is None and max_price is None else []
+
+        if sort is None and not lower_bounds and max_price is None:
+            # No filter, original order: the catalogue itself
+            matches = self.properties
+        elif sort == "price_asc":
+            matches = _Concat(_Slice(self._by_price, start, end), unpriced)
+        elif sort == "price_desc":
+            matches = _Concat(_Slice(self._by_price, start, end, reverse=True), unpriced)
+        else:
+            matches = None
+
+        total = len(matches) if matches is not None else end - start + len(unpriced)
+        stop = total if limit is None else min(total, offset + limit)
+        if matches is None:
+            # Original upstream order within the price range: walk the
+            # catalogue only as far as the page's last match (the total is
+            # already known from the bisect)
+            rows = (p for p in self.properties if price_matches(p.price_eur, min_price, max_price, price_floor))
+            page = list(itertools.islice(rows, offset, stop))
+        else:
+            page = [matches[i] for i in range(offset, stop)]
+        next_cursor = encode_cursor(stop) if stop < total else None
+        return page, next_cursor, total
+
+class _Slice:
+    # A window over a sorted list without copying it
+    __slots__ = ("items", "start", "end", "reverse")
+
+    def __init__(self, items: List, start: int, end: int, reverse: bool = False):
+        self.items, self.start, self.end, self.reverse = items, start, end, reverse
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __getitem__(self, i: int):
+        return self.items[self.end - 1 - i] if self.reverse else self.items[self.start + i]
+
+class _Concat:
+    __slots__ = ("first", "second")
+
+    def __init__(self, first, second):
+        self.first, self.second = first, second
+
+    def __len__(self) -> int:
+        return len(self.first) + len(self.second)
+
+    def __getitem__(self, i: int):
+        n = len(self.first)
+        return self.first[i] if i < n else self.second[i - n]
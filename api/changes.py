@@ -0,0 +1,119 @@
+import hashlib
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, FrozenSet, List, Optional, Sequence, Tuple
+from .scraper import Property, as_dict
+from .serialize import dumps
+
+# One diff: id -> (op, names of the fields that changed). op is "add",
+# "remove" or "update"; only updates carry field names.
+Diff = Dict[str, Tuple[str, FrozenSet[str]]]
+
+def row_hash(prop: Property) -> bytes:
+    return hashlib.blake2b(dumps(prop), digest_size=8).digest()
+
+class ChangeGap(Exception):
+    """The requested version is older than the retained history (or unknown)."""
+
+class ChangeFeed:
+    """Versioned snapshots of the catalogue, keyed by Property.id.
+
+    Each observed catalogue is compared with the previous one row by row
+    through per-row hashes, so an unchanged catalogue costs one hash compare
+    per row and records nothing. Versions are millisecond timestamps, which
+    keeps them increasing across restarts; a consumer holding a version from
+    before a restart (or older than the last max_versions diffs) gets a
+    ChangeGap and has to resync from the full listing.
+    """
+
+    def __init__(self, max_versions: int = 100, clock: Callable[[], float] = time.time):
+        self.max_versions = max_versions
+        self._clock = clock
+        self._hashes: Dict[str, bytes] = {}
+        self._rows: Dict[str, Property] = {}
+        self._log: Deque[Tuple[int, Diff]] = deque()
+        self._observed: Optional[Sequence[Property]] = None
+        self.version = 0
+        # Oldest version diffs can be computed from
+        self.base_version = 0
+
+    def observe(self, catalogue: Sequence[Property]) -> int:
+        """Record the catalogue as the current snapshot; returns the version."""
+        # The listing cache hands back the same list until it reloads
+        if catalogue is self._observed:
+            return self.version
+        self._observed = catalogue
+
+        hashes: Dict[str, bytes] = {}
+        rows: Dict[str, Property] = {}
+        diff: Diff = {}
+        for prop in catalogue:
+            digest = row_hash(prop)
+            hashes[prop.id] = digest
+            rows[prop.id] = prop
+            old = self._hashes.get(prop.id)
+            if old is None:
+                diff[prop.id] = ("add", frozenset())
+            elif old != digest:
+                before, after = as_dict(self._rows[prop.id]), as_dict(prop)
+                diff[prop.id] = ("update", frozenset(k for k, v in after.items() if before.get(k) != v))
+        for prop_id in self._hashes.keys() - hashes.keys():
+            diff[prop_id] = ("remove", frozenset())
+
+        self._hashes, self._rows = hashes, rows
+        if diff:
+            first = self.version == 0
+            self.version = max(self.version + 1, int(self._clock() * 1000))
+            if first:
+                # Nobody holds the empty catalogue; since=0 covers it
+                self.base_version = self.version
+                return self.version
+            self._log.append((self.version, diff))
+            while len(self._log) > self.max_versions:
+                self.base_version = self._log.popleft()[0]
+        return self.version
+
+    def changes_since(self, since: int, include: Optional[Callable[[str], bool]] = None) -> List[dict]:
+        """Compact records taking a consumer at `since` to the current version.
+
+        Several changes to one id collapse into one record: "add" carries the
+        whole row (and also stands for a re-added id), "update" only the
+        fields that changed, "remove" just the id. since=0 always works and
+        returns the whole current snapshot as adds.
+        """
+        if since == 0:
+            return [
+                {"op": "add", "id": prop_id, "property": as_dict(row)}
+                for prop_id, row in self._rows.items() if include is None or include(prop_id)
+            ]
+        if since < self.base_version or since > self.version:
+            raise ChangeGap(f"Version {since} is not available, resync from /api/properties")
+
+        # id -> [op when first seen, latest op, changed fields]
+        net: Dict[str, list] = {}
+        for version, diff in self._log:
+            if version <= since:
+                continue
+            for prop_id, (op, fields) in diff.items():
+                entry = net.get(prop_id)
+                if entry is None:
+                    net[prop_id] = [op, op, set(fields)]
+                elif op == "update":
+                    entry[2] |= fields
+                else:
+                    entry[1] = op
+
+        records = []
+        for prop_id, (first, last, fields) in net.items():
+            if include is not None and not include(prop_id):
+                continue
+            if last == "remove":
+                # Added and removed again since `since`: nothing to report
+                if first != "add":
+                    records.append({"op": "remove", "id": prop_id})
+            elif last == "add" or first == "add":
+                records.append({"op": "add", "id": prop_id, "property": as_dict(self._rows[prop_id])})
+            else:
+                row = self._rows[prop_id]
+                records.append({"op": "update", "id": prop_id, "changes": {f: getattr(row, f) for f in sorted(fields)}})
+        return records
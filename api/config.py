@@ -0,0 +1,172 @@
+import os
+import tempfile
+
+# Runtime tuning knobs. Everything can be overridden from the environment
+# (Vercel project settings or a local .env) without touching the code.
+
+def env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+def env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+# Upstream site being scraped. Point it at the local stand-in
+# (python -m api.standin) to work without touching the live site.
+BASE_URL = os.environ.get("UPSTREAM_BASE_URL", "https://www.thewellcomehome.com").rstrip("/")
+
+# Listing cache: the upstream catalogue only changes a few times a day
+LISTING_CACHE_TTL = env_float("LISTING_CACHE_TTL", 600.0)
+# How long a stale listing may still be served while it is being refreshed
+LISTING_CACHE_MAX_STALE = env_float("LISTING_CACHE_MAX_STALE", 86400.0)
+
+# Cache-Control per endpoint. max-age is for browsers, which revalidate
+# with the ETag afterwards (a 304 costs a few bytes); s-maxage and
+# stale-while-revalidate are for the edge in front of the API. Responses
+# served from the outage snapshot get SNAPSHOT_CACHE_CONTROL so the edge
+# picks up fresh data soon after upstream is back.
+LISTING_CACHE_CONTROL = os.environ.get(
+    "LISTING_CACHE_CONTROL",
+    f"public, max-age=60, s-maxage={int(LISTING_CACHE_TTL)}, stale-while-revalidate={int(LISTING_CACHE_MAX_STALE)}",
+)
+DETAIL_CACHE_CONTROL = os.environ.get(
+    "DETAIL_CACHE_CONTROL", "public, max-age=300, s-maxage=3600, stale-while-revalidate=86400",
+)
+SEARCH_CACHE_CONTROL = os.environ.get(
+    "SEARCH_CACHE_CONTROL", "public, max-age=60, s-maxage=300, stale-while-revalidate=3600",
+)
+# Polled with ?since=; every poll must reach the API (the ETag still saves the body)
+CHANGES_CACHE_CONTROL = "no-cache"
+SNAPSHOT_CACHE_CONTROL = "public, max-age=0, s-maxage=30"
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = env_int("COMPRESSION_MIN_BYTES", 1024)
+
+# Shared upstream HTTP client
+HTTP_TIMEOUT = env_float("HTTP_TIMEOUT", 30.0)
+HTTP_MAX_CONNECTIONS = env_int("HTTP_MAX_CONNECTIONS", 20)
+HTTP_MAX_KEEPALIVE = env_int("HTTP_MAX_KEEPALIVE", 10)
+HTTP_KEEPALIVE_EXPIRY = env_float("HTTP_KEEPALIVE_EXPIRY", 60.0)
+# Needs the h2 package (in requirements.txt); HTTP/1.1 without it
+HTTP2 = env_bool("HTTP2", True)
+
+# Upstream politeness, per host and shared by every scraper request: AIMD
+# concurrency between the min and max, a token bucket of UPSTREAM_RATE
+# requests/s (0 = unlimited) and retries of 429/502/503/504 and transport
+# errors with jittered exponential backoff (Retry-After wins when sent)
+UPSTREAM_MIN_CONCURRENCY = env_int("UPSTREAM_MIN_CONCURRENCY", 1)
+UPSTREAM_MAX_CONCURRENCY = env_int("UPSTREAM_MAX_CONCURRENCY", 8)
+UPSTREAM_INITIAL_CONCURRENCY = env_int("UPSTREAM_INITIAL_CONCURRENCY", 4)
+UPSTREAM_RATE = env_float("UPSTREAM_RATE", 20.0)
+UPSTREAM_BURST = env_float("UPSTREAM_BURST", 40.0)
+# Responses slower than this count as congestion and shrink the limit
+UPSTREAM_TARGET_LATENCY = env_float("UPSTREAM_TARGET_LATENCY", 2.0)
+UPSTREAM_MAX_RETRIES = env_int("UPSTREAM_MAX_RETRIES", 3)
+UPSTREAM_BACKOFF_BASE = env_float("UPSTREAM_BACKOFF_BASE", 0.5)
+UPSTREAM_BACKOFF_MAX = env_float("UPSTREAM_BACKOFF_MAX", 30.0)
+
+# Circuit breaker: each upstream attempt gets at most UPSTREAM_LATENCY_BUDGET
+# seconds once it holds a scheduler slot (queueing and backoff do not count);
+# BREAKER_FAILURE_THRESHOLD failures in a
+# row open the circuit, and after BREAKER_RESET_TIMEOUT seconds one request
+# probes upstream again. While it is open the API answers from the
+# last-known-good snapshot at SNAPSHOT_PATH, if one is configured.
+UPSTREAM_LATENCY_BUDGET = env_float("UPSTREAM_LATENCY_BUDGET", 10.0)
+BREAKER_FAILURE_THRESHOLD = env_int("BREAKER_FAILURE_THRESHOLD", 5)
+BREAKER_RESET_TIMEOUT = env_float("BREAKER_RESET_TIMEOUT", 30.0)
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", "")
+
+# HTML parser backend: "lxml" (fast single-pass extractor) or "html5lib"
+# (the original BeautifulSoup extractor, kept as a reference; its packages
+# are only in requirements-dev.txt)
+PARSER_BACKEND = os.environ.get("PARSER_BACKEND", "lxml")
+
+# Where HTML parsing runs: "inline" (on the event loop), "thread" or "process"
+PARSE_EXECUTOR = os.environ.get("PARSE_EXECUTOR", "thread")
+PARSE_WORKERS = env_int("PARSE_WORKERS", 4)
+
+# Batch detail endpoint
+BATCH_CONCURRENCY = env_int("BATCH_CONCURRENCY", 8)
+BATCH_MAX_IDS = env_int("BATCH_MAX_IDS", 50)
+
+# Detail cache (scrape mode): details are fresh for DETAIL_CACHE_TTL seconds,
+# then served stale for up to DETAIL_CACHE_MAX_STALE more while they refresh;
+# the least recently used are evicted beyond DETAIL_CACHE_MAX_ENTRIES
+DETAIL_CACHE_TTL = env_float("DETAIL_CACHE_TTL", 600.0)
+DETAIL_CACHE_MAX_STALE = env_float("DETAIL_CACHE_MAX_STALE", 3600.0)
+DETAIL_CACHE_MAX_ENTRIES = env_int("DETAIL_CACHE_MAX_ENTRIES", 1000)
+
+# Speculative prefetch: after a JSON listing response, the details of its
+# first PREFETCH_TOP_N rows are loaded into the detail cache in the
+# background, while upstream has spare capacity. 0 disables it.
+PREFETCH_TOP_N = env_int("PREFETCH_TOP_N", 0)
+PREFETCH_QUEUE_SIZE = env_int("PREFETCH_QUEUE_SIZE", 64)
+PREFETCH_CONCURRENCY = env_int("PREFETCH_CONCURRENCY", 2)
+
+# Crawler mode: when set, the API serves everything from this SQLite file
+# and never scrapes on the request path (see api/crawler.py)
+PROPERTY_STORE_PATH = os.environ.get("PROPERTY_STORE_PATH", "")
+CRAWL_CONCURRENCY = env_int("CRAWL_CONCURRENCY", 4)
+CRAWL_INTERVAL = env_float("CRAWL_INTERVAL", 0.0)
+
+# Change feed (/api/changes): number of catalogue diffs kept in memory.
+# Consumers further behind than that get a 410 and resync.
+CHANGES_MAX_VERSIONS = env_int("CHANGES_MAX_VERSIONS", 100)
+
+# Map endpoint: grid cell size of the spatial index (degrees, ~5 km) and
+# the zoom level below which nearby points are clustered server-side
+GEO_CELL_DEG = env_float("GEO_CELL_DEG", 0.05)
+GEO_CLUSTER_BELOW_ZOOM = env_int("GEO_CLUSTER_BELOW_ZOOM", 13)
+GEO_MAX_RADIUS_KM = env_float("GEO_MAX_RADIUS_KM", 200.0)
+
+# In-process metrics exported at /api/metrics (Prometheus text format)
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+
+# Image proxy (/api/images): originals and resized variants are kept in a
+# size-bounded on-disk LRU. Only these hosts are proxied.
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "wch-image-cache"))
+IMAGE_CACHE_MAX_BYTES = env_int("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+IMAGE_PROXY_HOSTS = tuple(
+    h.strip() for h in os.environ.get("IMAGE_PROXY_HOSTS", "media.mobiliagestion.es,www.thewellcomehome.com").split(",")
+    if h.strip()
+)
+IMAGE_WIDTHS = (160, 320, 480, 640, 960, 1280, 1920)
+IMAGE_QUALITY = env_int("IMAGE_QUALITY", 80)
+IMAGE_MAX_BYTES = env_int("IMAGE_MAX_BYTES", 25 * 1024 * 1024)
+
+# Floor plans are spotted in detail galleries from the first IMAGE_PROBE_BYTES
+# of each image (ranged GET) when a detail is fetched or crawled; results are
+# cached per URL in memory. A fetch waits at most IMAGE_PROBE_BUDGET seconds
+# for them, then drops the last image as the parser used to.
+IMAGE_PROBE_BYTES = env_int("IMAGE_PROBE_BYTES", 16384)
+IMAGE_PROBE_BUDGET = env_float("IMAGE_PROBE_BUDGET", 2.0)
+IMAGE_PROBE_CACHE_SIZE = env_int("IMAGE_PROBE_CACHE_SIZE", 10000)
+IMAGE_PROBE_CONCURRENCY = env_int("IMAGE_PROBE_CONCURRENCY", 8)
+
+# Image manifest: which rewritten -original image URLs really exist. Checks
+# run in the background, at most IMAGE_MANIFEST_CHECK_BUDGET seconds per URL,
+# and are cached in SQLite for IMAGE_MANIFEST_TTL seconds (misses for the
+# shorter negative TTL). Empty path disables the manifest.
+IMAGE_MANIFEST_PATH = os.environ.get(
+    "IMAGE_MANIFEST_PATH", os.path.join(tempfile.gettempdir(), "wch-image-manifest.sqlite3")
+)
+IMAGE_MANIFEST_TTL = env_float("IMAGE_MANIFEST_TTL", 7 * 86400.0)
+IMAGE_MANIFEST_NEGATIVE_TTL = env_float("IMAGE_MANIFEST_NEGATIVE_TTL", 86400.0)
+IMAGE_MANIFEST_CONCURRENCY = env_int("IMAGE_MANIFEST_CONCURRENCY", 8)
+IMAGE_MANIFEST_CHECK_BUDGET = env_float("IMAGE_MANIFEST_CHECK_BUDGET", 3.0)
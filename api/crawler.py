@@ -0,0 +1,114 @@
+"""Background crawler that fills the property store.
+
+    python -m api.crawler --db properties.db              # one crawl
+    python -m api.crawler --db properties.db --interval 3600
+
+Each run scrapes the listing, then every detail page, committing each
+detail as it arrives. A crawl that dies half way is resumed by the next
+invocation instead of starting over. Detail pages are re-fetched
+conditionally (ETag / Last-Modified) and only re-parsed when their body
+hash changed.
+"""
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+
+from . import config, http_client
+from .scraper import get_properties, refresh_property_detail, upstream_scheduler
+from .store import PropertyStore
+
+@dataclass
+class CrawlStats:
+    run_id: int = 0
+    resumed: bool = False
+    listed: int = 0
+    # Detail pages downloaded (200), answered 304, downloaded but
+    # byte-identical, and actually re-parsed
+    fetched: int = 0
+    not_modified: int = 0
+    unchanged: int = 0
+    parsed: int = 0
+    missing: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+async def crawl(store: PropertyStore, client: Optional[httpx.AsyncClient] = None,
+                concurrency: Optional[int] = None) -> CrawlStats:
+    started = time.perf_counter()
+    stats = CrawlStats()
+
+    run_id = store.unfinished_run()
+    if run_id is None:
+        properties = await get_properties(client=client)
+        store.replace_listing(properties)
+        run_id = store.start_run([p.id for p in properties])
+        stats.listed = len(properties)
+    else:
+        stats.resumed = True
+    stats.run_id = run_id
+
+    semaphore = asyncio.Semaphore(concurrency or config.CRAWL_CONCURRENCY)
+
+    async def crawl_one(prop_id: str):
+        async with semaphore:
+            try:
+                result = await refresh_property_detail(prop_id, store.get_validators(prop_id), client=client)
+            except Exception as e:
+                # Left for the next run to retry
+                stats.failed += 1
+                store.mark_done(run_id, prop_id, str(e) or e.__class__.__name__)
+                return
+        if result.status == "missing":
+            stats.missing += 1
+            store.delete_detail(prop_id)
+        elif result.status == "not_modified":
+            stats.not_modified += 1
+            store.put_validators(prop_id, result.validators)
+        else:
+            stats.fetched += 1
+            if result.status == "unchanged":
+                stats.unchanged += 1
+            else:
+                stats.parsed += 1
+                store.put_detail(result.detail)
+            store.put_validators(prop_id, result.validators)
+        store.mark_done(run_id, prop_id)
+
+    await asyncio.gather(*[crawl_one(prop_id) for prop_id in store.pending(run_id)])
+    store.finish_run(run_id)
+
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+async def run(db_path: str, interval: float, concurrency: int) -> None:
+    store = PropertyStore(db_path)
+    try:
+        while True:
+            try:
+                stats = await crawl(store, concurrency=concurrency)
+                print(f"Crawl finished: {stats}")
+                print(f"Upstream: {upstream_scheduler.stats()}")
+            except Exception as e:
+                print(f"Crawl failed: {e}")
+            if interval <= 0:
+                break
+            await asyncio.sleep(interval)
+    finally:
+        await http_client.close_client()
+        store.close()
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Crawl the upstream catalogue into the property store")
+    parser.add_argument("--db", default=config.PROPERTY_STORE_PATH or "properties.db")
+    parser.add_argument("--interval", type=float, default=config.CRAWL_INTERVAL,
+                        help="seconds between crawls; 0 crawls once and exits")
+    parser.add_argument("--concurrency", type=int, default=config.CRAWL_CONCURRENCY)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.db, args.interval, args.concurrency))
+
+if __name__ == "__main__":
+    main()
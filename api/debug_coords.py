@@ -1,36 +1,44 @@
+import argparse
 import asyncio
-from scraper import get_property_detail
+from api import http_client
+from api.scraper import get_properties, get_property_detail
+from api.standin import standin_client
 
-# Use a known property ID that should have a map
-# If the user mentioned a specific one, I'd use it. Otherwise, I'll pick one from previous logs if available, or just a generic one.
-# Looking at previous logs, "ref-1655" was mentioned in an error. Let's try that or just get_properties list first.
+# Runs against the recorded pages (api/standin.py) unless --live is given.
+#   python -m api.debug_coords [--live]
 
-async def main():
+async def main(live: bool):
     print("Fetching property detail...")
-    # I'll try to fetch a property detail directly. I need an ID.
-    # Let's first get the list to find a valid ID.
-    from scraper import get_properties
-    props = await get_properties()
-    if not props:
-        print("No properties found to test.")
-        return
+    if not live:
+        http_client.set_client(standin_client())
+    try:
+        # I'll try to fetch a property detail directly. I need an ID.
+        # Let's first get the list to find a valid ID.
+        props = await get_properties()
+        if not props:
+            print("No properties found to test.")
+            return
 
-    prop_id = props[0].id
-    print(f"Testing with Property ID: {prop_id}")
-    
-    detail = await get_property_detail(prop_id)
-    if not detail:
-        print("Failed to fetch detail.")
-        return
-        
-    print(f"Title: {detail.title}")
-    print(f"Lat: {detail.latitude}")
-    print(f"Lng: {detail.longitude}")
-    
-    if detail.latitude is None or detail.longitude is None:
-        print("COORDINATES MISSING!")
-    else:
-        print("Coordinates found.")
+        prop_id = props[0].id
+        print(f"Testing with Property ID: {prop_id}")
+
+        detail = await get_property_detail(prop_id)
+        if not detail:
+            print("Failed to fetch detail.")
+            return
+
+        print(f"Title: {detail.title}")
+        print(f"Lat: {detail.latitude}")
+        print(f"Lng: {detail.longitude}")
+
+        if detail.latitude is None or detail.longitude is None:
+            print("COORDINATES MISSING!")
+        else:
+            print("Coordinates found.")
+    finally:
+        await http_client.close_client()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", action="store_true", help="hit the real upstream site")
+    asyncio.run(main(parser.parse_args().live))
@@ -0,0 +1,55 @@
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from . import config
+
+# Parsing is CPU bound; running it on the event loop stalls every other
+# in-flight request. Parse functions take bytes and return plain dicts so
+# they can be shipped to a process pool as well.
+
+MODES = ("inline", "thread", "process")
+
+_mode = config.PARSE_EXECUTOR
+_workers = config.PARSE_WORKERS
+_pool: Optional[Executor] = None
+
+def set_mode(mode: str, workers: Optional[int] = None) -> None:
+    global _mode, _workers
+    if mode not in MODES:
+        raise ValueError(f"Unknown parse executor: {mode}")
+    shutdown()
+    _mode = mode
+    if workers is not None:
+        _workers = workers
+
+def get_mode() -> str:
+    return _mode
+
+def _get_pool() -> Executor:
+    global _pool
+    if _pool is None:
+        if _mode == "process":
+            # Pulls in multiprocessing; only paid for when asked for
+            from concurrent.futures import ProcessPoolExecutor
+            try:
+                _pool = ProcessPoolExecutor(max_workers=_workers)
+            except (OSError, NotImplementedError) as e:
+                # Serverless sandboxes may lack the semaphores multiprocessing needs
+                print(f"Process pool unavailable, parsing in threads: {e}")
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=_workers, thread_name_prefix="parse")
+    return _pool
+
+async def run_parse(fn: Callable[..., Any], *args: Any) -> Any:
+    if _mode == "inline":
+        return fn(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), functools.partial(fn, *args))
+
+def shutdown() -> None:
+    global _pool
+    pool = _pool
+    _pool = None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,141 @@
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+class GeoPoint:
+    __slots__ = ("id", "lat", "lon")
+
+    def __init__(self, prop_id: str, lat: float, lon: float):
+        self.id, self.lat, self.lon = prop_id, lat, lon
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dlat, dlon = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    # Leaflet's LatLngBounds.toBBoxString() order: west,south,east,north
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise ValueError("bbox must be west,south,east,north")
+    if not all(math.isfinite(v) for v in (west, south, east, north)):
+        raise ValueError("bbox coordinates must be finite")
+    if not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError("Invalid bbox longitudes")
+    if south > north or not (-90 <= south <= 90 and -90 <= north <= 90):
+        raise ValueError("Invalid bbox latitudes")
+    return west, south, east, north
+
+class GeoIndex:
+    """Uniform grid over (lat, lon) for the map endpoints.
+
+    Points are bucketed in cells of cell_deg degrees, so a bounding box or
+    radius query only looks at the cells it overlaps. Points can be added,
+    moved and removed one at a time, so the index is kept up to date as
+    details arrive instead of being rebuilt.
+    """
+
+    def __init__(self, cell_deg: float = 0.05):
+        self.cell_deg = cell_deg
+        self._cells: Dict[Tuple[int, int], Dict[str, GeoPoint]] = {}
+        self._points: Dict[str, GeoPoint] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def upsert(self, prop_id: str, lat: Optional[float], lon: Optional[float]) -> None:
+        if lat is None or lon is None:
+            self.remove(prop_id)
+            return
+        old = self._points.get(prop_id)
+        if old is not None:
+            if (old.lat, old.lon) == (lat, lon):
+                return
+            self.remove(prop_id)
+        point = self._points[prop_id] = GeoPoint(prop_id, lat, lon)
+        self._cells.setdefault(self._cell(lat, lon), {})[prop_id] = point
+
+    def remove(self, prop_id: str) -> None:
+        point = self._points.pop(prop_id, None)
+        if point is None:
+            return
+        key = self._cell(point.lat, point.lon)
+        cell = self._cells[key]
+        del cell[prop_id]
+        if not cell:
+            del self._cells[key]
+
+    def _lon_ranges(self, west: float, east: float) -> List[Tuple[float, float]]:
+        # A box crossing the antimeridian is split in two
+        if west <= east:
+            return [(west, east)]
+        return [(west, 180.0), (-180.0, east)]
+
+    def bbox(self, west: float, south: float, east: float, north: float) -> List[GeoPoint]:
+        found = []
+        for lo, hi in self._lon_ranges(west, east):
+            min_row, min_col = self._cell(south, lo)
+            max_row, max_col = self._cell(north, hi)
+            span = (max_row - min_row + 1) * (max_col - min_col + 1)
+            if span > len(self._cells):
+                # Huge box (zoomed out): cheaper to walk the occupied cells
+                cells: Iterable = (
+                    cell for (row, col), cell in self._cells.items()
+                    if min_row <= row <= max_row and min_col <= col <= max_col
+                )
+            else:
+                cells = (
+                    self._cells[key] for key in (
+                        (row, col) for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)
+                    ) if key in self._cells
+                )
+            for cell in cells:
+                found.extend(p for p in cell.values() if south <= p.lat <= north and lo <= p.lon <= hi)
+        return found
+
+    def radius(self, lat: float, lon: float, radius_km: float) -> List[Tuple[GeoPoint, float]]:
+        """Points within radius_km of (lat, lon) as (point, distance), nearest first."""
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        cos_lat = math.cos(math.radians(lat))
+        dlon = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+        west, east = lon - dlon, lon + dlon
+        if dlon >= 180.0:
+            west, east = -180.0, 180.0
+        else:
+            west = west + 360.0 if west < -180.0 else west
+            east = east - 360.0 if east > 180.0 else east
+        candidates = self.bbox(west, max(-90.0, lat - dlat), east, min(90.0, lat + dlat))
+        hits = [(p, haversine_km(lat, lon, p.lat, p.lon)) for p in candidates]
+        hits = [(p, d) for p, d in hits if d <= radius_km]
+        hits.sort(key=lambda hit: hit[1])
+        return hits
+
+def cluster(points: List[GeoPoint], zoom: int) -> Tuple[List[GeoPoint], List[dict]]:
+    """Group points that would overlap on a map at this zoom level.
+
+    Buckets are roughly 64px squares of a 256px web-mercator tile. Returns
+    (lone points, clusters); a cluster is {"lat", "lon", "count"} at the
+    centroid of its members.
+    """
+    size = 360.0 / (2 ** zoom * 4)
+    buckets: Dict[Tuple[int, int], List[GeoPoint]] = {}
+    for p in points:
+        buckets.setdefault((int(math.floor(p.lat / size)), int(math.floor(p.lon / size))), []).append(p)
+
+    lone, clusters = [], []
+    for members in buckets.values():
+        if len(members) == 1:
+            lone.append(members[0])
+            continue
+        clusters.append({
+            "lat": sum(p.lat for p in members) / len(members),
+            "lon": sum(p.lon for p in members) / len(members),
+            "count": len(members),
+        })
+    return lone, clusters
@@ -0,0 +1,70 @@
+import asyncio
+import httpx
+from typing import Any, Optional
+from . import config
+
+# One pooled client per process so repeated upstream requests reuse
+# keep-alive connections instead of paying a TCP+TLS handshake each time.
+
+# Sent with every upstream request (pages and images)
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def create_client(transport: Optional[httpx.AsyncBaseTransport] = None, **overrides: Any) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+    options = {
+        "timeout": config.HTTP_TIMEOUT,
+        "limits": limits,
+        "http2": config.HTTP2 and http2_available(),
+    }
+    options.update(overrides)
+    if transport is not None:
+        options["transport"] = transport
+    return httpx.AsyncClient(**options)
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def get_client() -> httpx.AsyncClient:
+    global _client, _client_loop
+    loop = _running_loop()
+    # Pooled connections belong to the loop that opened them; scripts and
+    # tests that spin up a new loop get a fresh client.
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = create_client()
+        _client_loop = loop
+    return _client
+
+def set_client(client: Optional[httpx.AsyncClient]) -> None:
+    global _client, _client_loop
+    _client = client
+    _client_loop = _running_loop() if client is not None else None
+
+async def start_client() -> httpx.AsyncClient:
+    return get_client()
+
+async def close_client() -> None:
+    global _client, _client_loop
+    client = _client
+    _client = None
+    _client_loop = None
+    if client is not None and not client.is_closed:
+        await client.aclose()
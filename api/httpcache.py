@@ -0,0 +1,229 @@
+"""HTTP caching for API responses: strong ETags, 304s and compression.
+
+Bodies are hashed after serialization, so the ETag changes exactly when the
+bytes do, whatever changed them (catalogue, verified image URLs, query).
+Compression is negotiated per request (brotli when the optional brotli
+package is installed, else gzip); compressed copies of ETagged bodies are
+kept in a small LRU so a popular listing is compressed once per version.
+Encoded copies carry an ETag of their own ("<hash>-gzip", "<hash>-br"), so
+caches never confuse them with the identity bytes, and every compressible
+response, 304s and uncompressed ones included, says Vary: Accept-Encoding.
+"""
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Content types worth compressing; images are compressed already
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+CODINGS = ("br", "gzip")
+
+def brotli_available() -> bool:
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def encoded_etag(etag: str, coding: str) -> str:
+    # "x" -> "x-gzip", W/"x" -> W/"x-gzip"
+    return etag[:-1] + f'-{coding}"' if etag.endswith('"') else etag
+
+def identity_etag(etag: str) -> str:
+    for coding in CODINGS:
+        suffix = f'-{coding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"; the ETags
+    # of the encoded copies ("x-gzip", "x-br") match "x" as well
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or identity_etag(candidate.removeprefix("W/")) == etag:
+            return True
+    return False
+
+def add_vary(vary: Optional[str], field: str) -> str:
+    """A Vary value listing field, keeping the fields already there."""
+    fields = [f.strip() for f in (vary or "").split(",") if f.strip()]
+    if "*" not in fields and field.lower() not in (f.lower() for f in fields):
+        fields.append(field)
+    return ", ".join(fields)
+
+def _vary_on_encoding(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    # Raw ASGI headers with their Vary fields merged into one that lists Accept-Encoding
+    vary = ", ".join(v.decode("latin-1") for k, v in headers if k.lower() == b"vary")
+    return [(k, v) for k, v in headers if k.lower() != b"vary"] + [
+        (b"vary", add_vary(vary, "Accept-Encoding").encode("latin-1"))]
+
+def conditional_response(request: Request, body: bytes, cache_control: str,
+                         media_type: str = "application/json",
+                         headers: Optional[Dict[str, str]] = None) -> Response:
+    """200 with an ETag, or an empty 304 when the client already has these bytes."""
+    etag = etag_for(body)
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": cache_control}
+    if media_type.startswith(COMPRESSIBLE_TYPES):
+        # Here rather than in the middleware, which cannot tell what a 304 is for
+        headers["Vary"] = add_vary(headers.get("Vary"), "Accept-Encoding")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
+
+def negotiate(accept_encoding: str, brotli: bool) -> Optional[str]:
+    """"br" or "gzip" from an Accept-Encoding header, or None for identity."""
+    offered: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[coding.strip().lower()] = q
+    wildcard = offered.get("*", 0.0)
+    for coding in (("br", "gzip") if brotli else ("gzip",)):
+        if offered.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+class _Stream:
+    # Incremental compressor; every chunk is flushed so NDJSON rows still
+    # reach the client as they are produced
+    def __init__(self, coding: str, gzip_level: int, brotli_quality: int):
+        if coding == "br":
+            import brotli
+            self._br = brotli.Compressor(quality=brotli_quality)
+            self._gz = None
+        else:
+            self._br = None
+            self._gz = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self._br is not None:
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._br.finish() if self._br is not None else self._gz.flush()
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON/NDJSON/text responses."""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 5, cache_entries: int = 32):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_entries = cache_entries
+        self.brotli = brotli_available()
+        # (etag, coding) -> compressed body
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+    def compress(self, body: bytes, coding: str, etag: Optional[str]) -> bytes:
+        key = (etag, coding)
+        if etag is not None and key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if coding == "br":
+            import brotli
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, self.gzip_level, mtime=0)
+        if etag is not None and not etag.startswith("W/"):
+            self._cache[key] = compressed
+            if len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return compressed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = if_none_match = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+            elif name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+        # HEAD responses still get their Vary, but never an encoding
+        coding = negotiate(accept, self.brotli) if scope["method"] != "HEAD" else None
+
+        state = {"start": None, "stream": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                lookup = {k.lower(): v for k, v in headers}
+                etag = lookup.get(b"etag", b"").decode("latin-1")
+                content_type = lookup.get(b"content-type", b"").decode("latin-1")
+                if status == 304:
+                    # Answer with the validator the client holds: the encoded
+                    # ETag when it revalidates a copy in the negotiated coding
+                    state["passthrough"] = True
+                    if coding is not None and etag and encoded_etag(etag, coding) in if_none_match:
+                        headers = [(k, v) for k, v in headers if k.lower() != b"etag"]
+                        headers.append((b"etag", encoded_etag(etag, coding).encode("latin-1")))
+                        message = {**message, "headers": headers}
+                    await send(message)
+                elif (status < 200 or status == 204 or b"content-encoding" in lookup
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                    state["passthrough"] = True
+                    await send(message)
+                elif coding is None:
+                    state["passthrough"] = True
+                    await send({**message, "headers": _vary_on_encoding(headers)})
+                else:
+                    state["start"] = {**message, "headers": _vary_on_encoding(headers)}
+                return
+            if state["passthrough"] or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            start = state["start"]
+            if state["stream"] is None and start is not None:
+                state["start"] = None
+                if not more and len(body) < self.minimum_size:
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers, etag = [], None
+                for k, v in start["headers"]:
+                    if k.lower() == b"etag":
+                        etag = v.decode("latin-1")
+                        v = encoded_etag(etag, coding).encode("latin-1")
+                    elif k.lower() == b"content-length":
+                        continue
+                    headers.append((k, v))
+                headers.append((b"content-encoding", coding.encode()))
+                if not more:
+                    compressed = self.compress(body, coding, etag)
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                state["stream"] = _Stream(coding, self.gzip_level, self.brotli_quality)
+                await send({**start, "headers": headers})
+            stream = state["stream"]
+            data = stream.chunk(body) if body else b""
+            if not more:
+                data += stream.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,179 @@
+import asyncio
+import contextlib
+import io
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import httpx
+from . import metrics
+from .http_client import HEADERS, get_client
+from .images import pillow_available
+from .manifest import candidates
+from .singleflight import SingleFlight
+
+# Pixels at least this bright count as paper white
+WHITE_LEVEL = 230
+# Grey libjpeg paints over the part of a truncated image it could not decode
+JPEG_FILL = (128, 128, 128)
+JPEG_EOI = b"\xff\xd9"
+
+@dataclass
+class ImageProbe:
+    width: int
+    height: int
+    # None when too little of the image could be decoded to tell
+    white_ratio: Optional[float] = None
+    colours: Optional[int] = None
+
+    @property
+    def is_floor_plan(self) -> Optional[bool]:
+        # Plans are line drawings: mostly white paper and a handful of inks
+        if self.white_ratio is None:
+            return None
+        return self.white_ratio >= 0.6 and self.colours <= 12
+
+def _decoded_height(image) -> int:
+    # Rows at the bottom that are pure fill grey were never decoded
+    height = image.height
+    while height > 0:
+        row = image.crop((0, height - 1, image.width, height))
+        if row.getextrema() != tuple((value, value) for value in JPEG_FILL):
+            break
+        height -= 1
+    return height
+
+def decode_probe(data: bytes, sample: int = 64) -> Optional[ImageProbe]:
+    """Dimensions and a tiny colour summary from the first bytes of an image.
+
+    Truncated JPEGs are closed with an EOI marker so libjpeg decodes what is
+    there (a progressive JPEG has the whole picture at low resolution in its
+    first scans). Other truncated formats only give their dimensions.
+    """
+    from PIL import Image
+
+    try:
+        image = Image.open(io.BytesIO(data))
+    except OSError:
+        return None
+    width, height = image.size
+    try:
+        if image.format == "JPEG" and not data.endswith(JPEG_EOI):
+            image = Image.open(io.BytesIO(data + JPEG_EOI))
+        image.draft("RGB", (sample, sample))
+        image = image.convert("RGB")
+    except OSError:
+        return ImageProbe(width, height)
+
+    image.thumbnail((sample, sample))
+    rows = _decoded_height(image)
+    # A sliver of the top edge says nothing about the whole picture
+    if rows < image.height // 4:
+        return ImageProbe(width, height)
+    image = image.crop((0, 0, image.width, rows))
+
+    pixels = image.width * image.height
+    grey = image.convert("L").histogram()
+    white_ratio = sum(grey[WHITE_LEVEL:]) / pixels
+    # Colours covering at least 1% of the image, at 3 bits per channel
+    quantized = image.point(lambda v: v >> 5 << 5)
+    colours = sum(1 for count, _ in quantized.getcolors(pixels) if count * 100 >= pixels)
+    return ImageProbe(width, height, white_ratio, colours)
+
+class ImageProber:
+    """Probes gallery images with ranged GETs of their first few KB.
+
+    Results are cached per URL (including images that could not be
+    classified) and concurrent probes of one URL share a request; network
+    errors are not cached. With a scheduler, every probe holds a slot of the
+    image host's budget.
+    """
+
+    def __init__(self, probe_bytes: int = 16384, max_entries: int = 10000, concurrency: int = 8,
+                 scheduler=None):
+        self.probe_bytes = probe_bytes
+        self.max_entries = max_entries
+        self.concurrency = concurrency
+        self._scheduler = scheduler
+        self._cache: "OrderedDict[str, Optional[ImageProbe]]" = OrderedDict()
+        self._flights = SingleFlight()
+
+    async def probe(self, url: str, client: Optional[httpx.AsyncClient] = None) -> Optional[ImageProbe]:
+        if url in self._cache:
+            self._cache.move_to_end(url)
+            return self._cache[url]
+        return await self._flights.do(url, lambda: self._probe(url, client))
+
+    async def _probe(self, url: str, client: Optional[httpx.AsyncClient]) -> Optional[ImageProbe]:
+        data = await self._head_bytes(url, client or get_client())
+        result = None
+        if data:
+            # A few KB decoded at 1/8 scale: too small to be worth a process hop
+            with metrics.STAGE_SECONDS.time(kind="image", stage="probe"):
+                result = await asyncio.to_thread(decode_probe, data)
+        self._cache[url] = result
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return result
+
+    async def _head_bytes(self, url: str, client: httpx.AsyncClient) -> Optional[bytes]:
+        # The rewritten -original URL may not exist; fall back like the manifest
+        for option in candidates(url):
+            headers = {**HEADERS, "Range": f"bytes=0-{self.probe_bytes - 1}"}
+            slot = self._scheduler.for_url(option).slot() if self._scheduler is not None else contextlib.nullcontext()
+            async with slot as held, client.stream("GET", option, headers=headers) as response:
+                if held is not None:
+                    held.done(response.status_code)
+                metrics.UPSTREAM_REQUESTS.inc(kind="image_probe", status=response.status_code)
+                if response.status_code not in (200, 206):
+                    continue
+                # Servers that ignore Range send everything; stop reading early
+                data = b""
+                async for chunk in response.aiter_bytes():
+                    data += chunk
+                    if len(data) >= self.probe_bytes:
+                        break
+                metrics.UPSTREAM_BYTES.inc(len(data), kind="image_probe")
+                return data[:self.probe_bytes]
+        return None
+
+    def _cached(self, urls: List[str]) -> Dict[str, Optional[ImageProbe]]:
+        return {url: self._cache[url] for url in urls if url in self._cache}
+
+    async def probe_many(self, urls: List[str], client: Optional[httpx.AsyncClient] = None) -> Dict[str, Optional[ImageProbe]]:
+        if all(url in self._cache for url in urls):
+            for url in urls:
+                self._cache.move_to_end(url)
+            return {url: self._cache[url] for url in urls}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe_one(url: str) -> Optional[ImageProbe]:
+            async with semaphore:
+                try:
+                    return await self.probe(url, client)
+                except httpx.HTTPError as e:
+                    print(f"Image probe failed for {url}: {e}")
+                    return None
+
+        results = await asyncio.gather(*(probe_one(url) for url in urls))
+        return dict(zip(urls, results))
+
+    async def gallery(self, images: List[str], client: Optional[httpx.AsyncClient] = None,
+                      budget: Optional[float] = None) -> List[str]:
+        """The gallery without its floor plans.
+
+        Probing stops after budget seconds, keeping what was classified by
+        then. When no image at all could be classified (or Pillow is
+        missing), falls back to the old heuristic of dropping the last image.
+        """
+        if not images or not pillow_available():
+            return images[:-1]
+        try:
+            async with asyncio.timeout(budget):
+                probes = await self.probe_many(images, client)
+        except TimeoutError:
+            print(f"Image probes took over {budget:g}s; using the {len(self._cached(images))} finished")
+            probes = self._cached(images)
+        verdicts = [probes[url].is_floor_plan if probes.get(url) else None for url in images]
+        if all(verdict is None for verdict in verdicts):
+            return images[:-1]
+        return [url for url, verdict in zip(images, verdicts) if not verdict]
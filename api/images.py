@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+from . import metrics
+from .executor import run_parse
+from .http_client import HEADERS, get_client
+from .singleflight import SingleFlight
+
+class DiskLRU:
+    """Size-bounded, least-recently-used file cache in one directory.
+
+    Entries are stored as <sha256(key)>-<etag>, so a restart rebuilds the
+    index (and every ETag) from a directory listing without reading any
+    file. Recency survives restarts through the files' mtimes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key hash -> (file name, size), least recently used first
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self.size = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self) -> None:
+        found = []
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if not entry.is_file() or name.endswith(".tmp") or "-" not in name:
+                continue
+            stat = entry.stat()
+            found.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name.split("-", 1)[0]] = (name, size)
+            self.size += size
+        self._evict()
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """(path, etag) of a cached entry, marking it as recently used."""
+        key_hash = self._hash(key)
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key_hash)
+        path = os.path.join(self.directory, entry[0])
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Removed behind our back
+            with self._lock:
+                if self._entries.pop(key_hash, None):
+                    self.size -= entry[1]
+            return None
+        return path, entry[0].split("-", 1)[1]
+
+    def read(self, key: str) -> Optional[bytes]:
+        hit = self.get(key)
+        if hit is None:
+            return None
+        try:
+            with open(hit[0], "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes) -> Tuple[str, str]:
+        key_hash = self._hash(key)
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        name = f"{key_hash}-{etag}"
+        path = os.path.join(self.directory, name)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            old = self._entries.pop(key_hash, None)
+            if old is not None:
+                self.size -= old[1]
+                if old[0] != name:
+                    _unlink(os.path.join(self.directory, old[0]))
+            self._entries[key_hash] = (name, len(data))
+            self.size += len(data)
+            self._evict()
+        return path, etag
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            _, (name, size) = self._entries.popitem(last=False)
+            self.size -= size
+            _unlink(os.path.join(self.directory, name))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def _unlink(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def pillow_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+FORMATS = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+def resize_image(data: bytes, width: int, fmt: str, quality: int) -> bytes:
+    # CPU bound, runs in the parse executor. Never upscales.
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        # Let the JPEG decoder skip detail we are about to throw away
+        image.draft("RGB", (width, width))
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        out = io.BytesIO()
+        if fmt == "webp":
+            image.save(out, "WEBP", quality=quality, method=4)
+        else:
+            image.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+        return out.getvalue()
+
+def snap_width(width: int, widths: Tuple[int, ...]) -> int:
+    # Round up to an allowed width so callers cannot mint unbounded variants
+    for allowed in widths:
+        if width <= allowed:
+            return allowed
+    return widths[-1]
+
+def original_media_type(src: str) -> str:
+    return mimetypes.guess_type(urlsplit(src).path)[0] or "application/octet-stream"
+
+def allowed_source(src: str, hosts: Tuple[str, ...]) -> bool:
+    parts = urlsplit(src)
+    return parts.scheme in ("http", "https") and (parts.hostname or "") in hosts
+
+class ImageProxy:
+    """Fetches each original once and derives resized variants from it.
+
+    Originals and variants share one DiskLRU. Concurrent requests for the
+    same file share one upstream fetch / resize.
+    """
+
+    def __init__(self, cache: DiskLRU, quality: int = 80, max_bytes: int = 25 * 1024 * 1024):
+        self.cache = cache
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.flights = SingleFlight()
+
+    async def original(self, src: str, client: Optional[httpx.AsyncClient] = None) -> Optional[Tuple[str, str]]:
+        """(path, etag) of the cached original, or None when upstream has no such image."""
+        key = "original:" + src
+        hit = self.cache.get(key)
+        metrics.IMAGE_CACHE.inc(result="hit" if hit else "miss", variant="original")
+        return hit or await self.flights.do(key, lambda: self._fetch(key, src, client))
+
+    async def _fetch(self, key: str, src: str, client: Optional[httpx.AsyncClient]) -> Optional[Tuple[str, str]]:
+        client = client or get_client()
+        with metrics.STAGE_SECONDS.time(kind="image", stage="fetch"):
+            response = await client.get(src, headers=HEADERS)
+        metrics.UPSTREAM_REQUESTS.inc(kind="image", status=response.status_code)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        if len(response.content) > self.max_bytes:
+            raise ValueError(f"Image larger than {self.max_bytes} bytes")
+        metrics.UPSTREAM_BYTES.inc(len(response.content), kind="image")
+        return await asyncio.to_thread(self.cache.put, key, response.content)
+
+    async def variant(self, src: str, width: int, fmt: str,
+                      client: Optional[httpx.AsyncClient] = None) -> Optional[Tuple[str, str]]:
+        key = f"w{width}.{fmt}:{src}"
+        hit = self.cache.get(key)
+        metrics.IMAGE_CACHE.inc(result="hit" if hit else "miss", variant="resized")
+        return hit or await self.flights.do(key, lambda: self._resize(key, src, width, fmt, client))
+
+    async def _resize(self, key: str, src: str, width: int, fmt: str,
+                      client: Optional[httpx.AsyncClient]) -> Optional[Tuple[str, str]]:
+        original = await self.original(src, client)
+        if original is None:
+            return None
+        data = await asyncio.to_thread(_read, original[0])
+        with metrics.STAGE_SECONDS.time(kind="image", stage="resize"):
+            resized = await run_parse(resize_image, data, width, fmt, self.quality)
+        return await asyncio.to_thread(self.cache.put, key, resized)
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
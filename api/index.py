@@ -1,9 +1,95 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from .scraper import get_properties, Property, get_property_detail
-from typing import List
+import gc
+# Cold start: nothing built while importing the app is garbage, so collecting
+# during the import graph is wasted time (~10% of it). Re-enabled once the
+# imports are done, even when one fails, with everything imported so far
+# frozen out of later scans.
+gc.disable()
+try:
+    import asyncio
+    import dataclasses
+    import time
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI, HTTPException, Query, Request, Response
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+    from starlette.background import BackgroundTask
+    from .scraper import LISTING_URL, as_dict, get_properties, Property, PropertyDetail, get_property_detail, get_property_details, stream_properties, upstream_breaker, upstream_flights, upstream_scheduler
+    from .breaker import UpstreamUnavailable
+    from .cache import TTLCache
+    from .catalogue import CatalogueIndex, price_matches
+    from .changes import ChangeFeed, ChangeGap
+    from .geo import GeoIndex, cluster, parse_bbox
+    from .httpcache import CompressionMiddleware, conditional_response, etag_matches
+    from .manifest import ImageManifest
+    from .prefetch import Prefetcher
+    from .images import FORMATS, DiskLRU, ImageProxy, allowed_source, original_media_type, pillow_available, snap_width
+    from .search import SearchIndex, document_text
+    from .serialize import ORJSONResponse, dumps
+    from . import config, executor, http_client, metrics
+    from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
+    if TYPE_CHECKING:
+        from .snapshot import SnapshotStore
+finally:
+    gc.enable()
+    gc.freeze()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The pooled upstream client lives as long as the app
+    await http_client.start_client()
+    yield
+    await detail_prefetcher.close()
+    await http_client.close_client()
+    executor.shutdown()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# One cached scrape backs every tenant and mode
+listing_cache = TTLCache(ttl=config.LISTING_CACHE_TTL, max_stale=config.LISTING_CACHE_MAX_STALE)
+LISTING_CACHE_KEY = "listing"
+
+# Scrape mode: details by id, filled by detail requests and the prefetcher
+detail_cache = TTLCache(ttl=config.DETAIL_CACHE_TTL, max_stale=config.DETAIL_CACHE_MAX_STALE,
+                        max_entries=config.DETAIL_CACHE_MAX_ENTRIES)
+
+# Crawler mode: every read is served from the local store (filled by
+# `python -m api.crawler`) and nothing is scraped on the request path
+def open_store():
+    # Scrape mode never imports the store (or sqlite3) at startup
+    if not config.PROPERTY_STORE_PATH:
+        return None
+    from .store import PropertyStore
+    return PropertyStore(config.PROPERTY_STORE_PATH)
+
+store = open_store()
+_store_listing = (None, [])
+
+# Coordinates of every detail seen so far, for the map endpoint. Scrape
+# mode feeds it as details are fetched; crawler mode rebuilds it from the
+# store whenever the crawler commits.
+geo_index = GeoIndex(config.GEO_CELL_DEG)
+_store_coordinates = None
+
+# Full-text index over descriptions and features, kept up to date the same
+# way. In crawler mode only details written since the last sync are re-read.
+search_index = SearchIndex()
+_search_synced = (None, 0.0)  # (store generation, newest updated_at indexed)
+
+# New, removed and changed listings between catalogue versions, fed by
+# every catalogue read (see sale_catalogue)
+change_feed = ChangeFeed(config.CHANGES_MAX_VERSIONS)
+
+# Last-known-good listing and details, served while upstream is down (see
+# api/snapshot.py). Created on first use.
+snapshots: Optional["SnapshotStore"] = None
+_snapshot_listing = (None, [])  # (snapshot rows, their sale-only view)
+# Background listing load checking whether upstream is back
+_upstream_probe: Optional[asyncio.Task] = None
+# Seconds since the snapshot a response was served from was saved
+SNAPSHOT_AGE_HEADER = "X-Snapshot-Age"
+
+# Verified image URLs (see api/manifest.py). Created on first use.
+image_manifest: Optional[ImageManifest] = None
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,63 +97,626 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", SNAPSHOT_AGE_HEADER],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=config.COMPRESSION_MIN_BYTES)
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.register(metrics.Callback(
+    "api_listing_cache_requests_total", "Listing cache lookups by result", "counter", "result",
+    listing_cache.stats,
+))
+metrics.register(metrics.Callback(
+    "api_detail_cache_requests_total", "Detail cache lookups by result", "counter", "result",
+    detail_cache.stats,
+))
+metrics.register(metrics.Callback(
+    "api_detail_cache_evictions_total", "Details evicted from the cache to stay under its size", "counter", "cache",
+    lambda: {"detail": detail_cache.evictions},
+))
+metrics.register(metrics.Callback(
+    "api_detail_prefetch_total", "Speculative detail prefetches by outcome (used: a request asked for it later)",
+    "counter", "result", lambda: detail_prefetcher.stats(),
+))
+metrics.register(metrics.Callback(
+    "api_detail_hit_ratio", "Share of detail lookups served from the cache, and of prefetches later used",
+    "gauge", "source", lambda: {"cache": detail_cache_hit_ratio(), "prefetch": detail_prefetcher.hit_ratio()},
+))
+metrics.register(metrics.Callback(
+    "scraper_upstream_flights_total", "Upstream calls executed vs coalesced onto one in flight", "counter", "result",
+    lambda: {"executed": upstream_flights.executed, "coalesced": upstream_flights.coalesced},
+))
+# Per-host politeness budget (see api/scheduler.py)
+for _stat, _type, _help in (
+    ("limit", "gauge", "Current AIMD concurrency limit"),
+    ("in_flight", "gauge", "Upstream requests in flight"),
+    ("requests", "counter", "Upstream attempts made through the scheduler"),
+    ("retries", "counter", "Upstream attempts retried after a 429, gateway error or transport error"),
+    ("throttled", "counter", "Upstream 429 responses"),
+    ("errors", "counter", "Upstream 5xx responses and transport errors"),
+):
+    metrics.register(metrics.Callback(
+        f"scraper_upstream_{_stat}" + ("_total" if _type == "counter" else ""), _help, _type, "host",
+        lambda _stat=_stat: {host: stats[_stat] for host, stats in upstream_scheduler.stats().items()},
+    ))
+metrics.register(metrics.Callback(
+    "scraper_upstream_circuit_open", "1 while the upstream circuit breaker is open", "gauge", "state",
+    lambda: {upstream_breaker.state: 1},
+))
 
 @app.get("/api/hello")
 def read_root():
     return {"message": "Hello from Python Backend!"}
 
+def is_for_sale(prop: Property) -> bool:
+    # Filter out rentals globally as per user requirement
+    # Check against title and price
+    title_lower = prop.title.lower() if prop.title else ""
+    price_lower = prop.price.lower() if prop.price else ""
+
+    if "alquiler" in title_lower:
+        return False
+    if "/mes" in price_lower or "mensual" in price_lower:
+        return False
+    return True
+
+def sale_only(data: List[Property]) -> List[Property]:
+    return [prop for prop in data if is_for_sale(prop)]
+
+def get_snapshots() -> Optional["SnapshotStore"]:
+    global snapshots
+    if snapshots is None and config.SNAPSHOT_PATH:
+        # Off unless configured, so its module (and sqlite3) loads on first use
+        from .snapshot import SnapshotStore
+        snapshots = SnapshotStore(config.SNAPSHOT_PATH)
+    return snapshots
+
+async def load_sale_properties() -> List[Property]:
+    data = await get_properties()
+    last_good = get_snapshots()
+    if last_good is not None:
+        last_good.save_listing(data)
+    return sale_only(data)
+
+def schedule_upstream_probe() -> None:
+    # While the circuit is open, one background listing load at a time is
+    # the breaker's trial request; its success closes the circuit
+    global _upstream_probe
+    if _upstream_probe is None and upstream_breaker.probe_due():
+        _upstream_probe = asyncio.ensure_future(_probe_upstream())
+
+async def _probe_upstream() -> None:
+    global _upstream_probe
+    try:
+        listing_cache.set(LISTING_CACHE_KEY, await load_sale_properties())
+    except Exception as e:
+        print(f"Upstream still unavailable: {e}")
+    finally:
+        _upstream_probe = None
+
+def snapshot_age(saved_at: float) -> float:
+    return max(0.0, time.time() - saved_at)
+
+def snapshot_catalogue() -> Optional[Tuple[List[Property], float]]:
+    # (sale catalogue, age) from the last-known-good listing
+    global _snapshot_listing
+    last_good = get_snapshots()
+    saved = last_good.listing() if last_good is not None else None
+    if saved is None:
+        return None
+    listing, saved_at = saved
+    if _snapshot_listing[0] is not listing:
+        _snapshot_listing = (listing, sale_only(listing))
+    schedule_upstream_probe()
+    return _snapshot_listing[1], snapshot_age(saved_at)
+
+def snapshot_detail(prop_id: str) -> Optional[Tuple[PropertyDetail, float]]:
+    last_good = get_snapshots()
+    saved = last_good.detail(prop_id) if last_good is not None else None
+    if saved is None:
+        return None
+    schedule_upstream_probe()
+    return saved[0], snapshot_age(saved[1])
+
+def snapshot_headers(age: Optional[float]) -> Dict[str, str]:
+    return {} if age is None else {SNAPSHOT_AGE_HEADER: str(int(age))}
+
+def cache_control(age: Optional[float], live: str) -> str:
+    # Snapshot answers must not be pinned at the edge for the usual TTL
+    return live if age is None else config.SNAPSHOT_CACHE_CONTROL
+
+def json_response(request: Request, content: Any, cache_control: str,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    # Serialized here rather than by FastAPI, so the body can be hashed for its ETag
+    return conditional_response(request, dumps(content), cache_control, headers=headers)
+
+async def sale_catalogue_with_age() -> Tuple[List[Property], Optional[float]]:
+    """The sale catalogue, and the snapshot's age when upstream is down.
+
+    While the circuit is open the last-known-good snapshot is served right
+    away; otherwise it only stands in when loading the listing fails.
+    """
+    global _store_listing
+    age = None
+    if store is None:
+        fallback = snapshot_catalogue() if upstream_breaker.is_open else None
+        if fallback is None:
+            try:
+                data = await listing_cache.get(LISTING_CACHE_KEY, load_sale_properties)
+            except Exception as e:
+                fallback = snapshot_catalogue()
+                if fallback is None:
+                    raise
+                print(f"Serving the listing snapshot: {e}")
+        if fallback is not None:
+            data, age = fallback
+    else:
+        # The store hands back the same list object until the crawler commits
+        listing = store.list_properties()
+        if _store_listing[0] is not listing:
+            _store_listing = (listing, sale_only(listing))
+        data = _store_listing[1]
+    # A no-op unless the catalogue object changed
+    change_feed.observe(data)
+    return data, age
+
+async def sale_catalogue() -> List[Property]:
+    return (await sale_catalogue_with_age())[0]
+
+def remember_live_detail(detail: PropertyDetail) -> None:
+    remember_detail(detail)
+    last_good = get_snapshots()
+    if last_good is not None:
+        last_good.save_detail(detail)
+
+async def load_live_detail(prop_id: str) -> Optional[PropertyDetail]:
+    detail = await get_property_detail(prop_id)
+    if detail:
+        remember_live_detail(detail)
+    return detail
+
+async def fetch_detail(prop_id: str) -> Tuple[Optional[PropertyDetail], Optional[float]]:
+    # (detail, snapshot age); the age is None unless upstream failed
+    if store is not None:
+        return store.get_detail(prop_id), None
+    if detail_cache.is_fresh(prop_id):
+        detail_prefetcher.claim(prop_id)
+    try:
+        detail = await detail_cache.get(prop_id, lambda: load_live_detail(prop_id))
+    except Exception as e:
+        fallback = snapshot_detail(prop_id)
+        if fallback is None:
+            raise
+        print(f"Serving the snapshot of {prop_id}: {e}")
+        return fallback
+    return detail, None
+
+def detail_cache_hit_ratio() -> float:
+    lookups = sum(detail_cache.stats().values())
+    return detail_cache.hits / lookups if lookups else 0.0
+
+async def prefetch_detail(prop_id: str) -> None:
+    detail = await load_live_detail(prop_id)
+    detail_cache.set(prop_id, detail)
+    if detail:
+        # Also queues its image checks, so the click finds them verified
+        verified_detail(detail)
+
+def upstream_busy() -> bool:
+    # Prefetches leave the last free upstream slot to foreground requests,
+    # but an idle host is never busy, however low AIMD has set its limit
+    host = upstream_scheduler.for_url(LISTING_URL)
+    return host.in_flight > 0 and host.in_flight >= max(1, int(host.limit) - 1)
+
+# Speculative detail loads after a listing response (see PREFETCH_TOP_N)
+detail_prefetcher = Prefetcher(
+    prefetch_detail, detail_cache.is_fresh, upstream_busy,
+    queue_size=config.PREFETCH_QUEUE_SIZE, concurrency=config.PREFETCH_CONCURRENCY,
+)
+
+async def prefetch_listing_details(page: List[Property]) -> None:
+    # The first cards of a listing are what gets clicked next
+    detail_prefetcher.schedule(prop.id for prop in page[:config.PREFETCH_TOP_N])
+
+def remember_detail(detail) -> None:
+    geo_index.upsert(detail.id, detail.latitude, detail.longitude)
+    search_index.upsert(detail.id, document_text(detail))
+
+def get_image_manifest() -> Optional[ImageManifest]:
+    global image_manifest
+    if image_manifest is None and config.IMAGE_MANIFEST_PATH:
+        image_manifest = ImageManifest(
+            config.IMAGE_MANIFEST_PATH, config.IMAGE_MANIFEST_TTL,
+            config.IMAGE_MANIFEST_NEGATIVE_TTL, config.IMAGE_MANIFEST_CONCURRENCY,
+            config.IMAGE_MANIFEST_CHECK_BUDGET, upstream_scheduler,
+        )
+    return image_manifest
+
+def verified_listing(page: List[Property]) -> List[Property]:
+    # Swap in verified image URLs; unknown ones are checked in the background
+    # and show up on a later request. Cached objects are copied, not mutated.
+    manifest = get_image_manifest()
+    if manifest is None:
+        return page
+    manifest.schedule(prop.image_url for prop in page)
+    verified = []
+    for prop in page:
+        url = manifest.lookup(prop.image_url)
+        verified.append(prop if url == prop.image_url else dataclasses.replace(prop, image_url=url))
+    return verified
+
+def verified_detail(detail: PropertyDetail) -> PropertyDetail:
+    # Same as verified_listing: nothing here waits on the image host. Floor
+    # plans are already gone (dropped when the detail was fetched, see
+    # scraper.image_prober).
+    manifest = get_image_manifest()
+    if manifest is None or not detail.images:
+        return detail
+    manifest.schedule(detail.images)
+    images = [manifest.lookup(url) for url in detail.images]
+    return detail if images == detail.images else dataclasses.replace(detail, images=images)
+
+def current_geo_index() -> GeoIndex:
+    global geo_index, _store_coordinates
+    if store is not None:
+        coordinates = store.list_coordinates()
+        if coordinates is not _store_coordinates:
+            rebuilt = GeoIndex(config.GEO_CELL_DEG)
+            for prop_id, (lat, lon) in coordinates.items():
+                rebuilt.upsert(prop_id, lat, lon)
+            geo_index, _store_coordinates = rebuilt, coordinates
+    return geo_index
+
+def current_search_index() -> SearchIndex:
+    global _search_synced
+    if store is not None:
+        generation, synced_until = _search_synced
+        if generation != store.generation():
+            generation = store.generation()
+            details, synced_until = store.details_since(synced_until)
+            for detail in details:
+                search_index.upsert(detail.id, document_text(detail))
+            live = store.detail_ids()
+            for prop_id in [prop_id for prop_id in search_index.doc_ids() if prop_id not in live]:
+                search_index.remove(prop_id)
+            _search_synced = (generation, synced_until)
+    return search_index
+
+# TEMPORARY: Filter specific properties by Request
+ALLOWED_NUMBERS = {
+    "3450", "3492", "3239", "3282", "3377", 
+    "3351", "3533", "3528", "3514", "3008"
+}
+
+def is_allowed_id(prop_id: str) -> bool:
+    # Check if property ID (e.g., 'ref-3450') ends with any of the allowed numbers
+    # This handles both 'ref-3450' and potentially '3450' formats
+    return any(prop_id.endswith(num) for num in ALLOWED_NUMBERS)
+
+def is_allowed(prop: Property) -> bool:
+    return is_allowed_id(prop.id)
+
+def allowed_only(data: List[Property]) -> List[Property]:
+    return [prop for prop in data if is_allowed(prop)]
+
+# mode -> (catalogue it was built from, index); rebuilt when the catalogue changes
+_catalogue_indexes: Dict[str, Tuple[List[Property], CatalogueIndex]] = {}
+
+def catalogue_index(data: List[Property], mode: str) -> CatalogueIndex:
+    cached = _catalogue_indexes.get(mode)
+    if cached is None or cached[0] is not data:
+        view = data if mode == "all" else allowed_only(data)
+        cached = (data, CatalogueIndex(view))
+        _catalogue_indexes[mode] = cached
+    return cached[1]
+
 @app.get("/api/properties", response_model=List[Property])
-async def list_properties(mode: str = "limited"):
+async def list_properties(
+    request: Request,
+    mode: str = "limited",
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    price_floor: Optional[int] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    format: str = "json",
+):
+    if format == "ndjson":
+        if sort is not None or cursor is not None:
+            raise HTTPException(status_code=400, detail="sort and cursor are not supported with format=ndjson")
+        return await stream_listing(mode, min_price, max_price, price_floor, limit)
+    if format != "json":
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+
     try:
-        data = await get_properties()
-        
-        # Filter out rentals globally as per user requirement
-        # Check against title and price
-        sale_properties = []
-        for prop in data:
-            title_lower = prop.title.lower() if prop.title else ""
-            price_lower = prop.price.lower() if prop.price else ""
-            
-            if "alquiler" in title_lower:
-                continue
-            if "/mes" in price_lower or "mensual" in price_lower:
-                continue
-            
-            sale_properties.append(prop)
-            
-        data = sale_properties
-
-        if mode == "all":
-            return data
-
-        # TEMPORARY: Filter specific properties by Request
-        ALLOWED_NUMBERS = {
-            "3450", "3492", "3239", "3282", "3377", 
-            "3351", "3533", "3528", "3514", "3008"
-        }
-        
-        filtered_data = []
-        for prop in data:
-            # Check if property ID (e.g., 'ref-3450') ends with any of the allowed numbers
-            # This handles both 'ref-3450' and potentially '3450' formats
-            if any(prop.id.endswith(num) for num in ALLOWED_NUMBERS):
-                filtered_data.append(prop)
-                
-        return filtered_data
+        data, age = await sale_catalogue_with_age()
+        index = catalogue_index(data, "all" if mode == "all" else "limited")
+        try:
+            page, next_cursor, total = index.query(
+                min_price=min_price, max_price=max_price, price_floor=price_floor,
+                sort=sort, limit=limit, cursor=cursor,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        headers = {"X-Total-Count": str(total), **snapshot_headers(age)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        page = verified_listing(page)
+        with metrics.STAGE_SECONDS.time(kind="listing", stage="serialize"):
+            body = dumps(page)
+        response = conditional_response(request, body, cache_control(age, config.LISTING_CACHE_CONTROL), headers=headers)
+        if store is None and age is None and config.PREFETCH_TOP_N > 0:
+            # Runs once the response has been sent
+            response.background = BackgroundTask(prefetch_listing_details, page)
+        return response
+    except HTTPException:
+        raise
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
         print(f"CRITICAL ERROR in list_properties: {e}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
+async def listing_rows(mode: str, catalogue: Optional[List[Property]] = None) -> AsyncIterator[Property]:
+    # Rows in upstream order, rental and allow-list filters applied inline.
+    # Served from memory when a catalogue is already at hand, otherwise
+    # parsed straight off the upstream response as it downloads.
+    if catalogue is not None:
+        rows = iter(catalogue)
+    elif store is not None:
+        rows = iter(await sale_catalogue())
+    else:
+        cached = listing_cache.peek(LISTING_CACHE_KEY)
+        rows = iter(cached) if cached is not None and listing_cache.age(LISTING_CACHE_KEY) < config.LISTING_CACHE_TTL else None
+    if rows is not None:
+        for prop in rows:
+            if mode == "all" or is_allowed(prop):
+                yield prop
+        return
+    async for prop in stream_properties():
+        if is_for_sale(prop) and (mode == "all" or is_allowed(prop)):
+            yield prop
+
+async def stream_listing(mode: str, min_price: Optional[int], max_price: Optional[int],
+                         price_floor: Optional[int], limit: Optional[int]) -> StreamingResponse:
+    def matching(catalogue: Optional[List[Property]] = None) -> AsyncIterator[Property]:
+        return (
+            prop async for prop in listing_rows(mode, catalogue)
+            if price_matches(prop.price_eur, min_price, max_price, price_floor)
+        )
+
+    # Upstream down: stream the snapshot rather than wait on it
+    fallback = snapshot_catalogue() if store is None and upstream_breaker.is_open else None
+    rows = matching(fallback[0] if fallback else None)
+    # Wait for the first row so upstream errors still become a proper status
+    try:
+        first = await anext(rows, None)
+    except Exception as e:
+        await rows.aclose()
+        fallback = snapshot_catalogue() if store is None else None
+        if fallback is None:
+            print(f"CRITICAL ERROR in list_properties (ndjson): {e}")
+            raise HTTPException(status_code=502, detail=f"Upstream error: {str(e)}")
+        print(f"Serving the listing snapshot: {e}")
+        rows = matching(fallback[0])
+        first = await anext(rows, None)
+
+    async def body() -> AsyncIterator[bytes]:
+        sent = 0
+        try:
+            prop = first
+            while prop is not None and (limit is None or sent < limit):
+                prop = verified_listing([prop])[0]
+                yield dumps(prop) + b"\n"
+                sent += 1
+                prop = await anext(rows, None)
+        except Exception as e:
+            # Headers are gone already; the client sees a truncated stream
+            print(f"Error while streaming properties: {e}")
+        finally:
+            await rows.aclose()
+
+    age = fallback[1] if fallback else None
+    headers = {"Cache-Control": cache_control(age, config.LISTING_CACHE_CONTROL), **snapshot_headers(age)}
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers=headers)
+
+@app.get("/api/changes")
+async def catalogue_changes(request: Request, since: int = Query(0, ge=0), mode: str = "limited"):
+    # Poll with the version from the previous response. since=0 returns
+    # every listing as an "add"; a 410 means the version is gone, start over.
+    try:
+        await sale_catalogue()
+    except Exception as e:
+        print(f"Error loading catalogue for changes: {e}")
+        raise HTTPException(status_code=502, detail=f"Upstream error: {str(e)}")
+    try:
+        records = change_feed.changes_since(since, None if mode == "all" else is_allowed_id)
+    except ChangeGap as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    return json_response(request, {"version": change_feed.version, "changes": records}, config.CHANGES_CACHE_CONTROL)
+
+@app.get("/api/properties/batch")
+async def property_detail_batch(request: Request, ids: str):
+    # ids=ref-1,ref-2,... -> one request instead of N sequential detail calls
+    prop_ids = [prop_id.strip() for prop_id in ids.split(",") if prop_id.strip()]
+    prop_ids = list(dict.fromkeys(prop_ids))
+    if not prop_ids:
+        raise HTTPException(status_code=400, detail="No property ids given")
+    if len(prop_ids) > config.BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {config.BATCH_MAX_IDS} ids per batch")
+
+    ages: List[float] = []
+    if store is not None:
+        details = {prop_id: store.get_detail(prop_id) for prop_id in prop_ids}
+        errors = {prop_id: "Property not found" for prop_id, detail in details.items() if detail is None}
+    else:
+        # Fresh cached details (prefetched ones included) are served as they
+        # are; only the rest goes upstream
+        details, errors = {}, {}
+        for prop_id in [prop_id for prop_id in prop_ids if detail_cache.is_fresh(prop_id)]:
+            detail_prefetcher.claim(prop_id)
+            detail = await detail_cache.get(prop_id, lambda prop_id=prop_id: load_live_detail(prop_id))
+            if detail is None:
+                errors[prop_id] = "Property not found"
+            else:
+                details[prop_id] = detail
+        missing = [prop_id for prop_id in prop_ids if prop_id not in details and prop_id not in errors]
+        if missing:
+            fetched, failed = await get_property_details(missing)
+            for detail in fetched.values():
+                remember_live_detail(detail)
+                detail_cache.set(detail.id, detail)
+            details.update(fetched)
+            errors.update(failed)
+        # Upstream failures (not 404s) fall back to the snapshot
+        for prop_id in [prop_id for prop_id, error in errors.items() if error != "Property not found"]:
+            fallback = snapshot_detail(prop_id)
+            if fallback is not None:
+                details[prop_id] = fallback[0]
+                del errors[prop_id]
+                ages.append(fallback[1])
+    found = [details[prop_id] for prop_id in prop_ids if details.get(prop_id)]
+    # The oldest snapshot used, if any
+    age = max(ages) if ages else None
+    content = {
+        "properties": [verified_detail(detail) for detail in found],
+        "errors": errors,
+    }
+    return json_response(request, content, cache_control(age, config.DETAIL_CACHE_CONTROL), snapshot_headers(age))
+
+def geo_point(prop: Property, lat: float, lon: float) -> dict:
+    return {"id": prop.id, "lat": lat, "lon": lon, "price_eur": prop.price_eur}
+
+@app.get("/api/properties/geo")
+async def properties_geo(
+    request: Request,
+    mode: str = "limited",
+    bbox: Optional[str] = None,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=config.GEO_MAX_RADIUS_KM),
+    zoom: Optional[int] = Query(None, ge=0, le=22),
+):
+    # Only properties whose coordinates are already known; never fetches details
+    catalogue = catalogue_index(await sale_catalogue(), "all" if mode == "all" else "limited").by_id
+    index = current_geo_index()
+
+    if bbox is not None:
+        try:
+            west, south, east, north = parse_bbox(bbox)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        hits = [(p, None) for p in index.bbox(west, south, east, north)]
+    elif lat is not None and lon is not None and radius_km is not None:
+        hits = index.radius(lat, lon, radius_km)
+    else:
+        raise HTTPException(status_code=400, detail="Pass bbox, or lat, lon and radius_km")
+
+    hits = [(p, distance) for p, distance in hits if p.id in catalogue]
+    clusters = []
+    if zoom is not None and zoom < config.GEO_CLUSTER_BELOW_ZOOM:
+        lone, clusters = cluster([p for p, _ in hits], zoom)
+        lone_ids = {p.id for p in lone}
+        hits = [(p, distance) for p, distance in hits if p.id in lone_ids]
+
+    points = []
+    for p, distance in hits:
+        point = geo_point(catalogue[p.id], p.lat, p.lon)
+        if distance is not None:
+            point["distance_km"] = round(distance, 3)
+        points.append(point)
+    return json_response(request, {"points": points, "clusters": clusters}, config.SEARCH_CACHE_CONTROL)
+
+@app.get("/api/search")
+async def search_properties(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    mode: str = "limited",
+    limit: int = Query(20, ge=1, le=100),
+):
+    # Ranked over every detail seen so far (crawler mode: the whole store)
+    catalogue = catalogue_index(await sale_catalogue(), "all" if mode == "all" else "limited").by_id
+    hits = [(prop_id, score) for prop_id, score in current_search_index().search(q) if prop_id in catalogue]
+    return json_response(request, {
+        "total": len(hits),
+        "results": [
+            {**as_dict(catalogue[prop_id]), "score": round(score, 4)}
+            for prop_id, score in hits[:limit]
+        ],
+    }, config.SEARCH_CACHE_CONTROL)
+
+# Created on first use: opening the cache scans its directory
+image_proxy: Optional[ImageProxy] = None
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def get_image_proxy() -> ImageProxy:
+    global image_proxy
+    if image_proxy is None:
+        cache = DiskLRU(config.IMAGE_CACHE_DIR, config.IMAGE_CACHE_MAX_BYTES)
+        image_proxy = ImageProxy(cache, config.IMAGE_QUALITY, config.IMAGE_MAX_BYTES)
+    return image_proxy
+
+@app.get("/api/images")
+async def proxy_image(
+    request: Request,
+    src: str,
+    w: Optional[int] = Query(None, ge=1, le=4096),
+    format: Optional[str] = None,
+):
+    # Serves upstream images (resized when w is given) from the disk cache.
+    # Without format=, WebP is picked when the browser accepts it.
+    if not allowed_source(src, config.IMAGE_PROXY_HOSTS):
+        raise HTTPException(status_code=400, detail="Image host not allowed")
+    if format is not None and format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+
+    proxy = get_image_proxy()
+    headers = {"Cache-Control": IMAGE_CACHE_CONTROL}
+    try:
+        if w is None or not pillow_available():
+            hit = await proxy.original(src)
+            media_type = original_media_type(src)
+        else:
+            fmt = format or ("webp" if "image/webp" in request.headers.get("accept", "") else "jpeg")
+            if format is None:
+                headers["Vary"] = "Accept"
+            hit = await proxy.variant(src, snap_width(w, config.IMAGE_WIDTHS), fmt)
+            media_type = FORMATS[fmt]
+    except Exception as e:
+        print(f"Error proxying image {src}: {e}")
+        raise HTTPException(status_code=502, detail="Upstream image unavailable")
+    if hit is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    path, etag = hit
+    headers["ETag"] = f'"{etag}"'
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+@app.get("/api/metrics")
+def read_metrics():
+    if not metrics.enabled():
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/properties/{prop_id}")
-async def property_detail(prop_id: str):
+async def property_detail(request: Request, prop_id: str):
     try:
-        data = await get_property_detail(prop_id)
+        data, age = await fetch_detail(prop_id)
         if not data:
             raise HTTPException(status_code=404, detail="Property not found")
-        return data
+        body = dumps(verified_detail(data))
+        return conditional_response(request, body, cache_control(age, config.DETAIL_CACHE_CONTROL),
+                                    headers=snapshot_headers(age))
+    except HTTPException:
+        raise
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Error fetching detail: {e}")
         raise HTTPException(status_code=500, detail=str(e))
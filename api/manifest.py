@@ -0,0 +1,180 @@
+import asyncio
+import contextlib
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import httpx
+from . import metrics
+from .http_client import HEADERS, get_client
+from .singleflight import SingleFlight
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_manifest (
+    url TEXT PRIMARY KEY,
+    resolved TEXT,
+    checked_at REAL NOT NULL
+);
+"""
+
+# get_clean_image_url() output: <base>-original.<ext>
+ORIGINAL_RE = re.compile(r"^(?P<base>.+?)-original(?P<ext>\.(?:jpe?g|png))$", re.I)
+
+def candidates(url: str) -> List[str]:
+    """URLs to try for a rewritten image, best first: original, large, base.
+
+    URLs that were not rewritten to -original are taken as they are.
+    """
+    match = ORIGINAL_RE.match(url)
+    if not match:
+        return [url]
+    base, ext = match.group("base"), match.group("ext")
+    return [url, f"{base}-large{ext}", f"{base}{ext}"]
+
+class ImageManifest:
+    """Which image URL actually exists, persisted in SQLite with a TTL.
+
+    get_clean_image_url() guesses the watermark-free -original variant, which
+    not every photo has. The manifest checks the candidates best first (HEAD,
+    or a one-byte ranged GET where HEAD is refused) and stops at the first
+    that exists. A URL with no working candidate is cached as well, for the
+    shorter negative TTL, so no URL is checked more than once per TTL.
+    Network errors and checks that run over budget seconds are not cached.
+    With a scheduler, every request holds a slot of the image host's budget.
+    """
+
+    def __init__(self, path: str, ttl: float, negative_ttl: float, concurrency: int = 8,
+                 budget: Optional[float] = None, scheduler=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.budget = budget
+        self._scheduler = scheduler
+        # Imported here: the app loads this module at startup (imageprobe
+        # uses candidates()) but opens the manifest on first use
+        import sqlite3
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # url -> (resolved url or None, checked_at)
+        self._entries: Dict[str, Tuple[Optional[str], float]] = {
+            url: (resolved, checked_at)
+            for url, resolved, checked_at in self._conn.execute(
+                "SELECT url, resolved, checked_at FROM image_manifest"
+            )
+        }
+        self.concurrency = concurrency
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.checks = 0
+
+    def _bind_loop(self) -> None:
+        # Tasks and semaphores belong to one loop; scripts and tests that
+        # spin up a new loop start with fresh ones (as get_client() does)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._flights = SingleFlight()
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            # Background checks in flight; holds the task references
+            self._pending: Dict[str, asyncio.Task] = {}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _fresh(self, url: str) -> Optional[Tuple[Optional[str], float]]:
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        ttl = self.ttl if entry[0] is not None else self.negative_ttl
+        return entry if time.time() - entry[1] < ttl else None
+
+    def lookup(self, url: str) -> str:
+        """The verified URL for url, or url itself when not (freshly) known.
+
+        Never touches the network. A URL known to have no working candidate
+        is returned unchanged.
+        """
+        entry = self._fresh(url)
+        if entry is None:
+            metrics.IMAGE_MANIFEST.inc(result="miss")
+            return url
+        metrics.IMAGE_MANIFEST.inc(result="hit" if entry[0] is not None else "negative")
+        return entry[0] or url
+
+    async def resolve(self, url: str, client: Optional[httpx.AsyncClient] = None) -> str:
+        """Like lookup(), checking upstream first when the entry is missing or expired."""
+        if not url or self._fresh(url) is not None:
+            return self.lookup(url)
+        self._bind_loop()
+        try:
+            resolved = await self._flights.do(url, lambda: self._check(url, client))
+        except httpx.HTTPError as e:
+            print(f"Image check failed for {url}: {e}")
+            return url
+        return resolved or url
+
+    async def resolve_many(self, urls: Iterable[str], client: Optional[httpx.AsyncClient] = None) -> List[str]:
+        urls = list(urls)
+        # The common case: everything known, no tasks needed
+        if all(not url or self._fresh(url) is not None for url in urls):
+            return [self.lookup(url) for url in urls]
+        return list(await asyncio.gather(*(self.resolve(url, client) for url in urls)))
+
+    def schedule(self, urls: Iterable[str], client: Optional[httpx.AsyncClient] = None) -> None:
+        """Check unknown or expired URLs in the background."""
+        self._bind_loop()
+        for url in urls:
+            if not url or url in self._pending or self._fresh(url) is not None:
+                continue
+            task = asyncio.ensure_future(self.resolve(url, client))
+            self._pending[url] = task
+            task.add_done_callback(lambda _, url=url: self._pending.pop(url, None))
+
+    async def wait_pending(self) -> None:
+        self._bind_loop()
+        while self._pending:
+            await asyncio.gather(*list(self._pending.values()), return_exceptions=True)
+
+    async def _check(self, url: str, client: Optional[httpx.AsyncClient]) -> Optional[str]:
+        client = client or get_client()
+        # Best candidate first; a transport error or running out of budget
+        # fails the whole check
+        resolved = None
+        try:
+            async with asyncio.timeout(self.budget):
+                for option in candidates(url):
+                    if await self._exists(client, option):
+                        resolved = option
+                        break
+        except TimeoutError as e:
+            raise httpx.TimeoutException(f"Image check took over {self.budget:g}s") from e
+        self._save(url, resolved)
+        return resolved
+
+    async def _exists(self, client: httpx.AsyncClient, url: str) -> bool:
+        slot = self._scheduler.for_url(url).slot() if self._scheduler is not None else contextlib.nullcontext()
+        async with self._semaphore, slot as held:
+            self.checks += 1
+            response = await client.head(url, headers=HEADERS)
+            if response.status_code in (405, 501):
+                # Streamed and never read, in case the server ignores Range
+                async with client.stream("GET", url, headers={**HEADERS, "Range": "bytes=0-0"}) as response:
+                    pass
+            if held is not None:
+                held.done(response.status_code)
+        metrics.UPSTREAM_REQUESTS.inc(kind="image_check", status=response.status_code)
+        return response.status_code in (200, 206)
+
+    def _save(self, url: str, resolved: Optional[str]) -> None:
+        checked_at = time.time()
+        self._entries[url] = (resolved, checked_at)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_manifest (url, resolved, checked_at) VALUES (?, ?, ?)",
+                (url, resolved, checked_at),
+            )
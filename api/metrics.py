@@ -0,0 +1,232 @@
+"""In-process metrics, exported in the Prometheus text format at /api/metrics.
+
+Every recording call starts with a check of one module flag, so with
+METRICS_ENABLED=0 the instrumented hot paths pay a function call and
+nothing else. Values are per process: each worker exports its own.
+"""
+import bisect
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from .config import METRICS_ENABLED
+
+_enabled = METRICS_ENABLED
+_NULL = nullcontext()
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def enabled() -> bool:
+    return _enabled
+
+def set_enabled(value: bool) -> None:
+    global _enabled
+    _enabled = value
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not _enabled:
+            return
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def reset(self) -> None:
+        self._values.clear()
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, key)} {value:g}"
+            for key, value in sorted(self._values.items())
+        ]
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [count per bucket (last one is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        if not _enabled:
+            return
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the elapsed seconds of its block."""
+        if not _enabled:
+            return _NULL
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def reset(self) -> None:
+        self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:.6g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+class Callback(_Metric):
+    # Read at export time from objects that already count (caches, singleflight)
+    def __init__(self, name: str, help: str, type: str, labelname: str,
+                 collect: Callable[[], Dict[str, float]]):
+        super().__init__(name, help, (labelname,))
+        self.type = type
+        self.collect = collect
+
+    def reset(self) -> None:
+        pass
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, (label,))} {value:g}"
+            for label, value in sorted(self.collect().items())
+        ]
+
+REGISTRY: Dict[str, _Metric] = {}
+
+def register(metric: _Metric) -> _Metric:
+    REGISTRY[metric.name] = metric
+    return metric
+
+def reset() -> None:
+    for metric in REGISTRY.values():
+        metric.reset()
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY.values():
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+# Hot-path metrics. kind is "listing", "detail" or "image"; stage is one of
+# fetch (upstream round trip), build (HTML -> tree), extract (tree -> dicts),
+# records (dicts -> dataclasses), serialize (records -> JSON via orjson),
+# resize and probe (image classification).
+STAGE_SECONDS = register(Histogram(
+    "scraper_stage_seconds", "Time spent per hot-path stage", ("kind", "stage"),
+))
+UPSTREAM_BYTES = register(Counter(
+    "scraper_upstream_bytes_total", "Response bytes fetched from upstream", ("kind",),
+))
+UPSTREAM_REQUESTS = register(Counter(
+    "scraper_upstream_requests_total", "Upstream requests by status code", ("kind", "status"),
+))
+LISTING_ROWS = register(Counter(
+    "scraper_listing_rows_total",
+    "Listing rows by outcome: parsed, filtered (rental or no photo/link) or error (swallowed exception)",
+    ("outcome",),
+))
+IMAGE_CACHE = register(Counter(
+    "api_image_cache_requests_total", "Image proxy disk cache lookups", ("variant", "result"),
+))
+IMAGE_MANIFEST = register(Counter(
+    "api_image_manifest_lookups_total", "Image manifest lookups: hit, negative (no candidate exists) or miss",
+    ("result",),
+))
+HTTP_SECONDS = register(Histogram(
+    "api_request_seconds", "API request latency by route and status", ("route", "status"),
+))
+
+def record_parse(kind: str, stats: Optional[Dict[str, float]]) -> None:
+    # stats as returned by the parsers' *_with_stats functions
+    if not _enabled or not stats:
+        return
+    STAGE_SECONDS.observe(stats["build_seconds"], kind=kind, stage="build")
+    STAGE_SECONDS.observe(stats["extract_seconds"], kind=kind, stage="extract")
+    if kind == "listing":
+        LISTING_ROWS.inc(stats["rows"], outcome="parsed")
+        LISTING_ROWS.inc(stats["filtered"], outcome="filtered")
+        LISTING_ROWS.inc(stats["errors"], outcome="error")
+
+class MetricsMiddleware:
+    """ASGI middleware timing every request, labelled by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_SECONDS.observe(
+                time.perf_counter() - started,
+                route=getattr(route, "path", "unmatched"),
+                status=status["code"],
+            )
@@ -0,0 +1,659 @@
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from .config import BASE_URL, PARSER_BACKEND
+from .utils import clean_description, get_clean_image_url, parse_count, parse_price_eur, parse_spanish_number
+
+# Parsing is kept free of I/O: functions take the raw page bytes and return
+# plain dicts so they can run inline, in a thread or in another process.
+
+LISTING_FIELDS = {
+    ("td", "foto"),
+    ("span", "tipo"),
+    ("span", "localizacion"),
+    ("span", "precioVenta"),
+    ("span", "precioAlquiler"),
+    ("td", "superficie"),
+    ("td", "dormitorios"),
+    ("td", "banos"),
+}
+
+# Detail page: (tag, class) -> slot filled by the first matching element.
+# A None tag matches any tag; "#name" matches on the id attribute.
+DETAIL_DISPATCH = {
+    ("title", None): "title",
+    ("div", "IDDescripcionBig"): "description",
+    ("ul", "#lightSlider"): "slider",
+    (None, "IDPrecioBig"): "price",
+    ("div", "bloqueIconosBig"): "icons",
+    ("div", "IDOtrosDatosBig2Columnas"): "features",
+}
+# Tags collected in document order during the same pass
+DETAIL_COLLECT = {"img": "imgs", "script": "scripts"}
+
+REF_RE = re.compile(r'(?i)Ref\s*[:.]?\s*\d+')
+PRICE_TEXT_RE = re.compile(r"[\d\.]+\s*€")
+DIGITS_RE = re.compile(r'\d+')
+NUMBER = r'([-+]?\d*\.\d+|\d+)'
+LATLNG_RE = re.compile(r'LatLng\s*\(\s*' + NUMBER + r'\s*,\s*' + NUMBER + r'\s*\)')
+FROMLONLAT_RE = re.compile(r'fromLonLat\s*\(\s*\[\s*' + NUMBER + r'\s*,\s*' + NUMBER + r'\s*\]')
+LAT_RE = re.compile(r'(?:var|let|const)?\s*(?:lat|latitude)\s*[:=]\s*' + NUMBER, re.IGNORECASE)
+LNG_RE = re.compile(r'(?:var|let|const)?\s*(?:lng|lon|longitude)\s*[:=]\s*' + NUMBER, re.IGNORECASE)
+
+def parse_listing(content: bytes, backend: Optional[str] = None) -> List[Dict]:
+    return parse_listing_with_stats(content, backend)[0]
+
+def _new_stats() -> Dict[str, float]:
+    return {"build_seconds": 0.0, "extract_seconds": 0.0, "rows": 0, "filtered": 0, "errors": 0}
+
+def parse_listing_with_stats(content: bytes, backend: Optional[str] = None) -> Tuple[List[Dict], Dict[str, float]]:
+    # Stage timings and row counts are returned, not recorded, so this also
+    # works when parsing runs in another process (see api/metrics.py)
+    backend = backend or PARSER_BACKEND
+    stats = _new_stats()
+    started = time.perf_counter()
+    if backend == "lxml":
+        doc = _lxml_document(content)
+        built = time.perf_counter()
+        rows = _extract_listing_lxml(doc, stats)
+    elif backend == "html5lib":
+        built = started
+        rows = _parse_listing_html5lib(content)
+    else:
+        raise ValueError(f"Unknown parser backend: {backend}")
+    for row in rows:
+        _add_numeric_fields(row)
+    stats["build_seconds"] = built - started
+    stats["extract_seconds"] = time.perf_counter() - built
+    stats["rows"] = len(rows)
+    return rows, stats
+
+def _add_numeric_fields(row: Dict) -> None:
+    # Parsed once here so filtering and sorting never re-parse strings
+    row["price_eur"] = parse_price_eur(row["price"])
+    row["size_m2"] = parse_spanish_number(row["size"])
+    row["num_bedrooms"] = parse_count(row["bedrooms"])
+    row["num_bathrooms"] = parse_count(row["bathrooms"])
+
+def parse_detail(content: bytes, prop_id: str, backend: Optional[str] = None) -> Dict:
+    return parse_detail_with_stats(content, prop_id, backend)[0]
+
+def parse_detail_with_stats(content: bytes, prop_id: str, backend: Optional[str] = None) -> Tuple[Dict, Dict[str, float]]:
+    backend = backend or PARSER_BACKEND
+    stats = _new_stats()
+    started = time.perf_counter()
+    if backend == "lxml":
+        doc = _lxml_document(content)
+        built = time.perf_counter()
+        detail = _extract_detail_lxml(doc, prop_id)
+    elif backend == "html5lib":
+        built = started
+        detail = _parse_detail_html5lib(content, prop_id)
+    else:
+        raise ValueError(f"Unknown parser backend: {backend}")
+    stats["build_seconds"] = built - started
+    stats["extract_seconds"] = time.perf_counter() - built
+    return detail, stats
+
+def _lxml_document(content: bytes):
+    import lxml.html
+    # Decode as UTF-8 ourselves (what the upstream serves); only let lxml
+    # sniff the encoding when that fails.
+    try:
+        return lxml.html.document_fromstring(content.decode("utf-8"))
+    except UnicodeDecodeError:
+        return lxml.html.document_fromstring(content)
+
+def _text(el) -> str:
+    # Same result as BeautifulSoup's get_text(strip=True)
+    return "".join(t.strip() for t in el.itertext())
+
+def _listing_row(fields: Dict, foto_td) -> Optional[Dict]:
+    img_tag = next(foto_td.iter("img"), None)
+    link_tag = next(foto_td.iter("a"), None)
+    if img_tag is None or link_tag is None:
+        return None
+
+    raw_img = img_tag.get("data-src") or img_tag.get("src")
+    image_url = get_clean_image_url(raw_img)
+
+    detail_url = link_tag.get("href")
+    if detail_url and not detail_url.startswith("http"):
+        detail_url = f"{BASE_URL}{detail_url}"
+
+    def get_text(tag: str, key: str) -> str:
+        el = fields.get((tag, key))
+        return _text(el) if el is not None else ""
+
+    price_span = fields.get(("span", "precioVenta"))
+    price = get_text("span", "precioVenta")
+
+    # Filter out rentals at source
+    # If there is no sale price, but there is a rental price, it is a rental.
+    if (price_span is None or not price) and ("span", "precioAlquiler") in fields:
+        return None
+
+    prop_type = get_text("span", "tipo")
+    location = get_text("span", "localizacion")
+
+    return {
+        "id": detail_url.split("/")[-1] if detail_url else "unknown",
+        "title": f"{prop_type} en {location}",
+        "price": price,
+        "location": location,
+        "image_url": image_url or "",
+        "detail_url": detail_url or "",
+        "size": get_text("td", "superficie"),
+        "bedrooms": get_text("td", "dormitorios"),
+        "bathrooms": get_text("td", "banos"),
+    }
+
+def _listing_tr(row, stats: Optional[Dict] = None) -> Optional[Dict]:
+    # One walk over the row collects every data-info field,
+    # keeping the first match like row.find() would
+    fields = {}
+    for el in row.iter("td", "span"):
+        key = el.get("data-info")
+        if key is not None and (el.tag, key) in LISTING_FIELDS:
+            fields.setdefault((el.tag, key), el)
+
+    foto_td = fields.get(("td", "foto"))
+    if foto_td is None:
+        # Header and spacer rows
+        return None
+    prop = _listing_row(fields, foto_td)
+    if prop is None and stats is not None:
+        stats["filtered"] += 1
+    return prop
+
+def _parse_listing_lxml(content: bytes) -> List[Dict]:
+    return _extract_listing_lxml(_lxml_document(content))
+
+def _extract_listing_lxml(doc, stats: Optional[Dict] = None) -> List[Dict]:
+    properties = []
+
+    for table in doc.iterfind(".//table[@id='infoListado']"):
+        for row in table.iter("tr"):
+            try:
+                prop = _listing_tr(row, stats)
+                if prop is not None:
+                    properties.append(prop)
+            except Exception:
+                if stats is not None:
+                    stats["errors"] += 1
+                continue
+
+    return properties
+
+class ListingStreamParser:
+    """Incremental version of the lxml listing parser.
+
+    Feed the page in chunks as they arrive; read_rows() hands back every
+    row completed so far (same dicts as parse_listing) and drops the parsed
+    elements, so memory stays flat however long the listing is.
+    """
+
+    def __init__(self):
+        from lxml import etree
+        self._parser = etree.HTMLPullParser(events=("start", "end"), encoding="utf-8")
+        self._tables = 0
+        self._rows = 0
+        self.stats = _new_stats()
+
+    def feed(self, chunk: bytes) -> None:
+        started = time.perf_counter()
+        self._parser.feed(chunk)
+        self.stats["build_seconds"] += time.perf_counter() - started
+
+    def close(self) -> None:
+        self._parser.close()
+
+    def read_rows(self):
+        # Time spent in here while the caller consumes rows is not counted
+        started = time.perf_counter()
+        for event, el in self._parser.read_events():
+            if el.tag == "table" and el.get("id") == "infoListado":
+                self._tables += 1 if event == "start" else -1
+            elif el.tag == "tr" and self._tables:
+                self._rows += 1 if event == "start" else -1
+                if event == "end" and self._rows == 0:
+                    try:
+                        prop = _listing_tr(el, self.stats)
+                    except Exception:
+                        self.stats["errors"] += 1
+                        prop = None
+                    # Free the row and everything before it
+                    el.clear()
+                    while el.getprevious() is not None:
+                        del el.getparent()[0]
+                    if prop is not None:
+                        _add_numeric_fields(prop)
+                        self.stats["rows"] += 1
+                        self.stats["extract_seconds"] += time.perf_counter() - started
+                        yield prop
+                        started = time.perf_counter()
+        self.stats["extract_seconds"] += time.perf_counter() - started
+
+def _classes(el) -> List[str]:
+    value = el.get("class")
+    return value.split() if value else []
+
+def _detail_title(title_el) -> str:
+    title = title_el.text if title_el is not None else "Propiedad"
+    title = clean_description(title)
+    title = title.replace("Mobiliaria", "")
+    title = REF_RE.sub('', title)
+    if "|" in title: title = title.split("|")[0]
+    elif " - " in title:
+        parts = title.split(" - ")
+        if len(parts) > 1: title = parts[0]
+    return title.strip(" .-|")
+
+def _detail_images(slider, imgs: List) -> List[str]:
+    images = []
+    # 1. Primary Method: LightSlider
+    if slider is not None:
+        for li in slider.iter("li"):
+            if "sliderImage" not in _classes(li):
+                continue
+            clean_src = get_clean_image_url(li.get("data-src"))
+            if clean_src and clean_src not in images:
+                images.append(clean_src)
+
+    # 2. Fallback: Any large images if slider not found
+    if not images:
+        for img in imgs:
+            src = img.get("data-src") or img.get("src")
+            if not src: continue
+            if (".jpg" in src or ".png" in src) and "logo" not in src.lower() and "icon" not in src.lower():
+                clean_src = get_clean_image_url(src)
+                if clean_src not in images and ("large" in src or "original" in clean_src):
+                    images.append(clean_src)
+
+    # Already unique. Floor plans are left in; the scraper probes the images
+    # and drops them before the detail is cached or stored (see api/imageprobe.py)
+    return images
+
+def _detail_price(price_el, doc) -> str:
+    if price_el is not None:
+        return _text(price_el)
+    # Only scan every text node when the price block is missing
+    for node in doc.xpath("//text() | //comment()"):
+        text = node if isinstance(node, str) else node.text
+        if text and PRICE_TEXT_RE.search(text):
+            text = text.strip()
+            if any(c.isdigit() for c in text):
+                return text
+    return "Consultar"
+
+def _detail_icons(icons) -> Dict:
+    found = {"size": None, "bedrooms": None, "bathrooms": None}
+    if icons is None:
+        return found
+    for item in icons.iter("div"):
+        if "spanIconosInmuebleBig" not in _classes(item):
+            continue
+        text = _text(item)
+        lower_text = text.lower()
+        if "m2" in lower_text or "m²" in lower_text:
+            found["size"] = text
+        elif "habitaciones" in lower_text or "dormitorios" in lower_text:
+            nums = DIGITS_RE.findall(text)
+            if nums: found["bedrooms"] = nums[0]
+        elif "baños" in lower_text or "aseos" in lower_text:
+            nums = DIGITS_RE.findall(text)
+            if nums: found["bathrooms"] = nums[0]
+    return found
+
+def _first_direct_string(el) -> Optional[str]:
+    # Equivalent of bs4's el.find(string=True, recursive=False)
+    if el.text is not None:
+        return el.text
+    for child in el:
+        if not isinstance(child.tag, str) and child.text is not None:
+            return child.text
+        if child.tail is not None:
+            return child.tail
+    return None
+
+def _detail_features(container) -> Dict[str, str]:
+    features = {}
+    if container is None:
+        return features
+    for p in container.iter("div"):
+        if "IDPropiedadBig" not in _classes(p):
+            continue
+        full_text = _text(p)
+        value_text = ""
+        pull_right = next((s for s in p.iter("span") if "pull-right" in _classes(s)), None)
+        if pull_right is not None:
+            checked = any("fa-check" in _classes(s) for s in pull_right.iter("span") if s is not pull_right)
+            value_text = "Sí" if checked else _text(pull_right)
+
+        key_text = _first_direct_string(p)
+        if not key_text:
+            key_text = full_text.replace(_text(pull_right), "") if pull_right is not None else full_text
+
+        k = key_text.strip()
+        v = value_text.strip()
+        if k and v:
+            features[k] = v
+    return features
+
+def _detail_coordinates(scripts: List) -> tuple:
+    for script in scripts:
+        code = script.text
+        if not code:
+            continue
+        match = LATLNG_RE.search(code)
+        if match:
+            return float(match.group(1)), float(match.group(2))
+        # OpenLayers uses [lon, lat] order in fromLonLat
+        match = FROMLONLAT_RE.search(code)
+        if match:
+            return float(match.group(2)), float(match.group(1))
+        lat_match = LAT_RE.search(code)
+        lng_match = LNG_RE.search(code)
+        if lat_match and lng_match:
+            return float(lat_match.group(1)), float(lng_match.group(1))
+    return None, None
+
+def _parse_detail_lxml(content: bytes, prop_id: str) -> Dict:
+    return _extract_detail_lxml(_lxml_document(content), prop_id)
+
+def _extract_detail_lxml(doc, prop_id: str) -> Dict:
+    # Single pass: route each element to its slot via the dispatch table
+    slots = {}
+    collected = {"imgs": [], "scripts": []}
+    for el in doc.iter():
+        tag = el.tag
+        if not isinstance(tag, str):
+            continue
+        bucket = DETAIL_COLLECT.get(tag)
+        if bucket:
+            collected[bucket].append(el)
+        keys = [(tag, None)]
+        for cls in _classes(el):
+            keys.append((tag, cls))
+            keys.append((None, cls))
+        el_id = el.get("id")
+        if el_id:
+            keys.append((tag, "#" + el_id))
+        for key in keys:
+            slot = DETAIL_DISPATCH.get(key)
+            if slot and slot not in slots:
+                slots[slot] = el
+
+    description = ""
+    desc_div = slots.get("description")
+    if desc_div is not None:
+        paragraphs = (_text(p) for p in desc_div.iter("p"))
+        description = clean_description("\n\n".join(t for t in paragraphs if t))
+
+    latitude, longitude = _detail_coordinates(collected["scripts"])
+
+    return {
+        "id": prop_id,
+        "title": _detail_title(slots.get("title")),
+        "description": description,
+        "price": _detail_price(slots.get("price"), doc),
+        "images": _detail_images(slots.get("slider"), collected["imgs"]),
+        "features": _detail_features(slots.get("features")),
+        **_detail_icons(slots.get("icons")),
+        "latitude": latitude,
+        "longitude": longitude,
+    }
+
+def _parse_listing_html5lib(content: bytes) -> List[Dict]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html5lib')
+    properties = []
+
+    rows = soup.select("table#infoListado tr")
+
+    for row in rows:
+        try:
+            foto_td = row.find("td", attrs={"data-info": "foto"})
+            if not foto_td:
+                continue
+
+            def get_data(key: str) -> str:
+                td = row.find("td", attrs={"data-info": key})
+                if td:
+                    return td.get_text(strip=True)
+                return ""
+
+            img_tag = foto_td.find("img")
+            link_tag = foto_td.find("a")
+
+            if not img_tag or not link_tag:
+                continue
+
+            raw_img = img_tag.get("data-src") or img_tag.get("src")
+            image_url = get_clean_image_url(raw_img)
+
+            detail_url = link_tag.get("href")
+
+            if detail_url and not detail_url.startswith("http"):
+                detail_url = f"{BASE_URL}{detail_url}"
+
+            prop_type = row.find("span", attrs={"data-info": "tipo"})
+            prop_type = prop_type.get_text(strip=True) if prop_type else ""
+
+            loc_span = row.find("span", attrs={"data-info": "localizacion"})
+            location = loc_span.get_text(strip=True) if loc_span else ""
+
+            price_span = row.find("span", attrs={"data-info": "precioVenta"})
+            price = price_span.get_text(strip=True) if price_span else ""
+
+            size = get_data("superficie")
+            bedrooms = get_data("dormitorios")
+            bathrooms = get_data("banos")
+
+            # Filter out rentals at source
+            # If there is no sale price, but there is a rental price, it is a rental.
+            price_rent_span = row.find("span", attrs={"data-info": "precioAlquiler"})
+            if (not price_span or not price) and price_rent_span:
+                # It's a rental
+                continue
+
+            prop_id = detail_url.split("/")[-1] if detail_url else "unknown"
+
+            properties.append({
+                "id": prop_id,
+                "title": f"{prop_type} en {location}",
+                "price": price,
+                "location": location,
+                "image_url": image_url or "",
+                "detail_url": detail_url or "",
+                "size": size,
+                "bedrooms": bedrooms,
+                "bathrooms": bathrooms,
+            })
+        except Exception as e:
+            # print(f"Skipping row due to error: {e}")
+            continue
+
+    return properties
+
+def _parse_detail_html5lib(content: bytes, prop_id: str) -> Dict:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html5lib')
+
+    # Description
+    description = ""
+    desc_div = soup.find("div", class_="IDDescripcionBig")
+    if desc_div:
+        ps = desc_div.find_all("p")
+        raw_desc = "\n\n".join([p.get_text(strip=True) for p in ps if p.get_text(strip=True)])
+        description = clean_description(raw_desc)
+
+    # Images
+    images = []
+    # 1. Primary Method: LightSlider
+    slider_items = soup.select("ul#lightSlider li.sliderImage")
+    if slider_items:
+         for li in slider_items:
+             src = li.get("data-src")
+             clean_src = get_clean_image_url(src)
+             if clean_src and clean_src not in images:
+                 images.append(clean_src)
+
+    # 2. Fallback: Any large images if slider not found
+    if not images:
+        candidate_imgs = soup.find_all("img")
+        for img in candidate_imgs:
+            src = img.get("data-src") or img.get("src")
+            if not src: continue
+
+            # Filter logic
+            if (".jpg" in src or ".png" in src) and "logo" not in src.lower() and "icon" not in src.lower():
+                 clean_src = get_clean_image_url(src)
+                 if clean_src not in images and ("large" in src or "original" in clean_src): 
+                    images.append(clean_src)
+
+    # Remove duplicates preserving order
+    seen = set()
+    unique_images = []
+    for x in images:
+        if x not in seen:
+            unique_images.append(x)
+            seen.add(x)
+
+    # Floor plans are dropped by the scraper after probing the images
+
+    # Title & Price Extraction (Improved)
+    title = soup.title.string if soup.title else "Propiedad"
+    title = clean_description(title) # Apply the new cleaning function
+    title = title.replace("Mobiliaria", "")
+    title = re.sub(r'(?i)Ref\s*[:.]?\s*\d+', '', title)
+    if "|" in title: title = title.split("|")[0]
+    elif " - " in title: 
+        parts = title.split(" - ")
+        if len(parts) > 1: title = parts[0]
+    title = title.strip(" .-|")
+
+    # Price Strategy: IDPrecioBig
+    price = "Consultar"
+    price_div = soup.find(class_="IDPrecioBig")
+    if price_div:
+        price = price_div.get_text(strip=True)
+    else:
+        # Fallback
+        price_tags = soup.find_all(string=re.compile(r"[\d\.]+\s*€"))
+        if price_tags:
+            for pt in price_tags:
+                text = pt.strip()
+                if any(c.isdigit() for c in text):
+                     price = text
+                     break
+
+    # Specific Details (Size, Beds, Baths) from .bloqueIconosBig
+    size = None
+    bedrooms = None
+    bathrooms = None
+
+    icon_block = soup.find("div", class_="bloqueIconosBig")
+    if icon_block:
+        items = icon_block.find_all("div", class_="spanIconosInmuebleBig")
+        for item in items:
+            text = item.get_text(strip=True)
+            lower_text = text.lower()
+
+            if "m2" in lower_text or "m²" in lower_text:
+                size = text
+            elif "habitaciones" in lower_text or "dormitorios" in lower_text:
+                 # Extract number
+                 nums = re.findall(r'\d+', text)
+                 if nums: bedrooms = nums[0]
+            elif "baños" in lower_text or "aseos" in lower_text:
+                 nums = re.findall(r'\d+', text)
+                 if nums: bathrooms = nums[0]
+
+    # Features Extraction
+    features = {}
+    features_container = soup.find("div", class_="IDOtrosDatosBig2Columnas")
+    if features_container:
+        props = features_container.find_all("div", class_="IDPropiedadBig")
+        for p in props:
+            full_text = p.get_text(strip=True)
+            key_text = ""
+            value_text = ""
+            pull_right = p.find("span", class_="pull-right")
+            if pull_right:
+                if pull_right.find("span", class_="fa-check"):
+                    value_text = "Sí"
+                else:
+                    value_text = pull_right.get_text(strip=True)
+
+            key_text = p.find(string=True, recursive=False)
+            if not key_text:
+                 if pull_right:
+                     val_in_dom = pull_right.get_text(strip=True)
+                     key_text = full_text.replace(val_in_dom, "")
+                 else:
+                     key_text = full_text
+
+            if key_text:
+                k = key_text.strip()
+                v = value_text.strip()
+                if k and v:
+                    features[k] = v
+
+    # Coordinate Extraction
+    latitude = None
+    longitude = None
+
+    # Look for coordinates in script tags
+    scripts = soup.find_all("script")
+    for script in scripts:
+        if script.string:
+            # 1. Google Maps style (legacy checks)
+            coords_match = re.search(r'LatLng\s*\(\s*([-+]?\d*\.\d+|\d+)\s*,\s*([-+]?\d*\.\d+|\d+)\s*\)', script.string)
+            if coords_match:
+                 try:
+                    latitude = float(coords_match.group(1))
+                    longitude = float(coords_match.group(2))
+                    break
+                 except ValueError:
+                    pass
+
+            # 2. OpenLayers style: ol.proj.fromLonLat([-3.688, 40.425]) -> [lon, lat]
+            ol_match = re.search(r'fromLonLat\s*\(\s*\[\s*([-+]?\d*\.\d+|\d+)\s*,\s*([-+]?\d*\.\d+|\d+)\s*\]', script.string)
+            if ol_match:
+                 try:
+                    # OpenLayers uses [lon, lat] order in fromLonLat
+                    longitude = float(ol_match.group(1))
+                    latitude = float(ol_match.group(2))
+                    break
+                 except ValueError:
+                    pass
+
+            # 3. Generic variable assignments (lat = ..., lon = ...)
+            # Case insensitive math for lat/lon variables
+            lat_match = re.search(r'(?:var|let|const)?\s*(?:lat|latitude)\s*[:=]\s*([-+]?\d*\.\d+|\d+)', script.string, re.IGNORECASE)
+            lng_match = re.search(r'(?:var|let|const)?\s*(?:lng|lon|longitude)\s*[:=]\s*([-+]?\d*\.\d+|\d+)', script.string, re.IGNORECASE)
+
+            if lat_match and lng_match:
+                try:
+                    latitude = float(lat_match.group(1))
+                    longitude = float(lng_match.group(1))
+                    break
+                except ValueError:
+                    continue
+
+    return {
+        "id": prop_id,
+        "title": title,
+        "description": description,
+        "price": price,
+        "images": unique_images,
+        "features": features,
+        "size": size,
+        "bedrooms": bedrooms,
+        "bathrooms": bathrooms,
+        "latitude": latitude,
+        "longitude": longitude,
+    }
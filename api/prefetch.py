@@ -0,0 +1,122 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Iterable, Set
+
+class Prefetcher:
+    """Bounded, low-priority background queue of speculative loads.
+
+    Keys are queued at most once and skipped when already cached; when the
+    queue is full new keys are dropped rather than waited for. Workers only
+    start a load while busy() is false (foreground requests have the
+    upstream to themselves), backing off from idle_wait up to max_idle_wait
+    while it is true. They stop as soon as the queue is empty, or once busy()
+    has held for give_up_after seconds; the queue is then left for the next
+    schedule() call to pick up.
+
+    Prefetched keys are remembered until claim() is called for them, so
+    used / fetched tells how much of the speculation paid off.
+    """
+
+    def __init__(self, load: Callable[[Hashable], Awaitable[object]], cached: Callable[[Hashable], bool],
+                 busy: Callable[[], bool] = lambda: False, queue_size: int = 64, concurrency: int = 2,
+                 idle_wait: float = 0.05, max_idle_wait: float = 1.0, give_up_after: float = 10.0,
+                 max_tracked: int = 1024):
+        self._load = load
+        self._cached = cached
+        self._busy = busy
+        self.queue_size = queue_size
+        self.concurrency = concurrency
+        self.idle_wait = idle_wait
+        self.max_idle_wait = max_idle_wait
+        self.give_up_after = give_up_after
+        self.max_tracked = max_tracked
+        self._queue: Deque[Hashable] = deque()
+        self._queued: Set[Hashable] = set()
+        self._workers: Set[asyncio.Task] = set()
+        # Prefetched keys nobody asked for yet, oldest first
+        self._unclaimed: "OrderedDict[Hashable, None]" = OrderedDict()
+        self.enqueued = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.fetched = 0
+        self.failed = 0
+        self.used = 0
+
+    def schedule(self, keys: Iterable[Hashable]) -> int:
+        """Queue keys for loading; returns how many were queued."""
+        queued = 0
+        for key in keys:
+            if key in self._queued or self._cached(key):
+                continue
+            if len(self._queue) >= self.queue_size:
+                self.dropped += 1
+                continue
+            self._queue.append(key)
+            self._queued.add(key)
+            queued += 1
+        self.enqueued += queued
+        while self._queue and len(self._workers) < self.concurrency:
+            worker = asyncio.ensure_future(self._drain())
+            self._workers.add(worker)
+            worker.add_done_callback(self._workers.discard)
+        return queued
+
+    def claim(self, key: Hashable) -> bool:
+        """Note a foreground request for key; True when a prefetch served it."""
+        if key in self._unclaimed:
+            del self._unclaimed[key]
+            self.used += 1
+            return True
+        return False
+
+    async def _drain(self) -> None:
+        wait, waited = self.idle_wait, 0.0
+        while self._queue:
+            if self._busy():
+                if waited >= self.give_up_after:
+                    return
+                await asyncio.sleep(wait)
+                waited += wait
+                wait = min(self.max_idle_wait, wait * 2)
+                continue
+            wait, waited = self.idle_wait, 0.0
+            key = self._queue.popleft()
+            self._queued.discard(key)
+            if self._cached(key):
+                self.skipped += 1
+                continue
+            try:
+                await self._load(key)
+            except Exception as e:
+                self.failed += 1
+                print(f"Prefetch of {key} failed: {e}")
+                continue
+            self.fetched += 1
+            self._unclaimed[key] = None
+            if len(self._unclaimed) > self.max_tracked:
+                self._unclaimed.popitem(last=False)
+
+    async def join(self) -> None:
+        # Until the queue has drained and every load has finished
+        while self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def close(self) -> None:
+        for worker in list(self._workers):
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._queue.clear()
+        self._queued.clear()
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "enqueued": self.enqueued, "dropped": self.dropped, "skipped": self.skipped,
+            "fetched": self.fetched, "failed": self.failed, "used": self.used,
+        }
+
+    def hit_ratio(self) -> float:
+        # Share of prefetched loads a request later asked for
+        return self.used / self.fetched if self.fetched else 0.0
@@ -0,0 +1,250 @@
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Deque, Dict, Optional
+from urllib.parse import urlsplit
+import httpx
+
+# Worth another try: throttling and gateway trouble. A plain 500 is the
+# page itself failing and is returned as-is.
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+def retry_after(response: httpx.Response, now: Optional[float] = None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+class TokenBucket:
+    """Requests per second with bursts; rate <= 0 disables the limit."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def reserve(self) -> float:
+        """Take a token; returns how long the caller must wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        # Negative tokens are callers already queued ahead
+        return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+class HostScheduler:
+    """Shared request budget for one upstream host.
+
+    Concurrency follows AIMD: every fast success adds 1/limit (about +1
+    per round of requests), while a 429, 5xx, transport error or a response
+    slower than target_latency cuts the limit (at most once per cooldown,
+    so one burst of failures counts once). A token bucket caps the request
+    rate on top, and retryable failures are retried with full-jitter
+    exponential backoff, honouring Retry-After.
+    """
+
+    def __init__(self, host: str, min_concurrency: int = 1, max_concurrency: int = 8,
+                 initial_concurrency: int = 4, rate: float = 20.0, burst: float = 40.0,
+                 target_latency: float = 2.0, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        self.host = host
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate, burst, clock)
+        self._clock = clock
+        self._sleep = sleep
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = float("-inf")
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.errors = 0
+        self.latency_ewma: Optional[float] = None
+
+    # Concurrency slots
+
+    async def _acquire(self) -> None:
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif waiter.done():
+                    # Woken but gone: pass the free slot on
+                    self._wake()
+                raise
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        wait = self.bucket.reserve()
+        if wait > 0:
+            try:
+                await self._sleep(wait)
+            except BaseException:
+                # Cancelled while rate limited: __aexit__ will not run, so
+                # the slot is given back here
+                self._release()
+                raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    # AIMD
+
+    def _increase(self) -> None:
+        if self.limit < self.max_concurrency:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._wake()
+
+    def _decrease(self) -> None:
+        now = self._clock()
+        if now - self._last_decrease < max(self.target_latency, self.latency_ewma or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_concurrency, self.limit / 2)
+
+    def _record(self, status: Optional[int], latency: float) -> None:
+        self.requests += 1
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        if status is None or status >= 500:
+            self.errors += 1
+            self._decrease()
+        elif status == 429:
+            self.throttled += 1
+            self._decrease()
+        elif latency > self.target_latency:
+            self._decrease()
+        else:
+            self._increase()
+
+    def slot(self) -> "_Slot":
+        """Context manager holding one request's budget; call .done(status) in it.
+
+        For streamed requests. Leaving it with an exception counts as a
+        transport error. No retries.
+        """
+        return _Slot(self)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def request(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """Run send() within the budget, retrying throttled or failed attempts.
+
+        Returns the last response (possibly still a 429/5xx once retries run
+        out) and re-raises the transport error of the last attempt.
+        """
+        attempt = 0
+        while True:
+            async with self.slot() as slot:
+                try:
+                    response = await send()
+                except httpx.TransportError:
+                    if attempt >= self.max_retries:
+                        raise
+                    slot.done(None)
+                    delay = self.backoff(attempt)
+                else:
+                    slot.done(response.status_code)
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                        return response
+                    hinted = retry_after(response)
+                    delay = min(self.backoff_max, hinted) if hinted is not None else self.backoff(attempt)
+            attempt += 1
+            self.retries += 1
+            await self._sleep(delay)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "latency_ewma": round(self.latency_ewma or 0.0, 4),
+        }
+
+class _Slot:
+    __slots__ = ("scheduler", "started", "finished")
+
+    def __init__(self, scheduler: HostScheduler):
+        self.scheduler = scheduler
+        self.finished = False
+
+    async def __aenter__(self) -> "_Slot":
+        await self.scheduler._acquire()
+        self.started = self.scheduler._clock()
+        return self
+
+    def done(self, status: Optional[int]) -> None:
+        if not self.finished:
+            self.finished = True
+            self.scheduler._record(status, self.scheduler._clock() - self.started)
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        try:
+            if not self.finished and exc_type is not None and not issubclass(exc_type, asyncio.CancelledError):
+                self.done(None)
+        finally:
+            self.scheduler._release()
+        return False
+
+class Scheduler:
+    """One HostScheduler per upstream host, created on first use."""
+
+    def __init__(self, **options):
+        self.options = options
+        self.hosts: Dict[str, HostScheduler] = {}
+
+    def for_url(self, url: str) -> HostScheduler:
+        host = urlsplit(url).netloc
+        scheduler = self.hosts.get(host)
+        if scheduler is None:
+            scheduler = self.hosts[host] = HostScheduler(host, **self.options)
+        return scheduler
+
+    async def request(self, url: str, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        return await self.for_url(url).request(send)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {host: scheduler.stats() for host, scheduler in self.hosts.items()}
+
+    def reset(self, **options) -> None:
+        # Drops every host's state; new options apply to hosts created from now on
+        self.options.update(options)
+        self.hosts.clear()
@@ -1,11 +1,28 @@
+import asyncio
+import hashlib
 import httpx
-from bs4 import BeautifulSoup
-from typing import List, Optional, Dict
-from pydantic import BaseModel
-import re
-from .utils import clean_description
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Dict, Tuple
+from .utils import clean_description, get_clean_image_url
+from . import config
+from .config import BASE_URL, BATCH_CONCURRENCY
+from .http_client import HEADERS, get_client
+from .parsers import ListingStreamParser, parse_detail_with_stats, parse_listing_with_stats
+from .executor import run_parse
+from .imageprobe import ImageProber
+from .breaker import CircuitBreaker, UpstreamUnavailable
+from .scheduler import Scheduler
+from .singleflight import SingleFlight
+from . import metrics
 
-class Property(BaseModel):
+# Internal records: plain dataclasses. The parsers already hand back typed
+# values, so nothing is re-validated per row; pydantic only sees these at the
+# HTTP boundary (OpenAPI schemas). No __slots__: orjson serializes a dataclass
+# straight from its __dict__, and falls back to a getattr per field (2-3x
+# slower on the listing) when there is none.
+@dataclass
+class Property:
     id: str
     title: str
     price: str
@@ -15,8 +32,14 @@ class Property(BaseModel):
     size: Optional[str] = None
     bedrooms: Optional[str] = None
     bathrooms: Optional[str] = None
+    # Numeric copies of the display strings above, parsed once at scrape time
+    price_eur: Optional[int] = None
+    size_m2: Optional[float] = None
+    num_bedrooms: Optional[int] = None
+    num_bathrooms: Optional[int] = None
 
-class PropertyDetail(BaseModel):
+@dataclass
+class PropertyDetail:
     id: str
     title: str
     description: str
@@ -29,301 +52,218 @@ class PropertyDetail(BaseModel):
     latitude: Optional[float] = None
     longitude: Optional[float] = None
 
-BASE_URL = "https://www.thewellcomehome.com"
+def as_dict(record) -> dict:
+    # Shallow, unlike dataclasses.asdict(): list and dict fields are shared
+    return dict(record.__dict__)
+
 LISTING_URL = f"{BASE_URL}/es/venta_o_alquiler"
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-}
+# Concurrent requests for the same upstream URL share one fetch + parse.
+# Callers get the same objects back and must not mutate them.
+upstream_flights = SingleFlight()
+
+# Every upstream request goes through here, so the batch endpoint, the
+# crawler and page loads share one politeness budget per host
+upstream_scheduler = Scheduler(
+    min_concurrency=config.UPSTREAM_MIN_CONCURRENCY,
+    max_concurrency=config.UPSTREAM_MAX_CONCURRENCY,
+    initial_concurrency=config.UPSTREAM_INITIAL_CONCURRENCY,
+    rate=config.UPSTREAM_RATE,
+    burst=config.UPSTREAM_BURST,
+    target_latency=config.UPSTREAM_TARGET_LATENCY,
+    max_retries=config.UPSTREAM_MAX_RETRIES,
+    backoff_base=config.UPSTREAM_BACKOFF_BASE,
+    backoff_max=config.UPSTREAM_BACKOFF_MAX,
+)
+
+# Fails page fetches fast while upstream is down (the API then serves its
+# last-known-good snapshot, see api/snapshot.py)
+upstream_breaker = CircuitBreaker(config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT)
+
+# Drops floor plans from detail galleries where details are fetched or
+# crawled, so cached, stored and snapshotted details never contain them and
+# no read has to wait on the image host (which gets its own scheduler budget)
+image_prober = ImageProber(config.IMAGE_PROBE_BYTES, config.IMAGE_PROBE_CACHE_SIZE,
+                           config.IMAGE_PROBE_CONCURRENCY, scheduler=upstream_scheduler)
+
+@contextmanager
+def _upstream_call():
+    # Transport errors count against the circuit; a call that ends without
+    # a verdict (cancelled, or its reader went away) frees the trial slot
+    if not upstream_breaker.allow():
+        raise UpstreamUnavailable("Upstream circuit is open")
+    try:
+        yield
+    except httpx.TransportError:
+        upstream_breaker.record_failure()
+        raise
+    except BaseException:
+        upstream_breaker.release()
+        raise
+
+def _record_status(status: int) -> None:
+    # 404s and redirects are answers; throttling and server errors are not
+    if status == 429 or status >= 500:
+        upstream_breaker.record_failure()
+    else:
+        upstream_breaker.record_success()
 
-def get_clean_image_url(src: str) -> str:
-    if not src: return ""
-    
-    # Ensure absolute URL
-    if not src.startswith("http"):
-        src = f"https:{src}" if src.startswith("//") else f"{BASE_URL}{src}"
-    
-    # Watermark Removal Logic
-    # 1. Strip common suffixes to get to the base filename
-    src = src.replace("-large.jpg", ".jpg")
-    src = src.replace("-thumb.jpg", ".jpg")
-    src = src.replace("-large.png", ".png")
-    src = src.replace("-thumb.png", ".png")
-    
-    # 2. Inject -original to access the clean version
-    # Avoid double -original
-    if "-original" not in src:
-         if src.lower().endswith(".jpg"):
-             src = src[:-4] + "-original.jpg"
-         elif src.lower().endswith(".jpeg"):
-             src = src[:-5] + "-original.jpeg"
-         elif src.lower().endswith(".png"):
-             src = src[:-4] + "-original.png"
-             
-    return src
+async def get_properties(client: Optional[httpx.AsyncClient] = None) -> List[Property]:
+    return await upstream_flights.do(LISTING_URL, lambda: _fetch_properties(client))
 
-async def get_properties() -> List[Property]:
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.get(LISTING_URL, headers=HEADERS)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html5lib')
-        properties = []
-        
-        rows = soup.select("table#infoListado tr")
-        
-        for row in rows:
+async def _fetch(client: Optional[httpx.AsyncClient], url: str, kind: str, headers=HEADERS) -> httpx.Response:
+    client = client or get_client()
+
+    async def send() -> httpx.Response:
+        # One attempt, already holding a scheduler slot: the latency budget
+        # covers upstream time only, not queueing, rate limiting or backoff
+        with metrics.STAGE_SECONDS.time(kind=kind, stage="fetch"):
             try:
-                foto_td = row.find("td", attrs={"data-info": "foto"})
-                if not foto_td:
-                    continue
+                # Cancels in place; wait_for() would wrap every fetch in a task
+                async with asyncio.timeout(config.UPSTREAM_LATENCY_BUDGET):
+                    response = await client.get(url, headers=headers)
+            except TimeoutError as e:
+                # A transport error to the scheduler, so it is retried like one
+                raise httpx.ReadTimeout(
+                    f"Upstream did not answer within {config.UPSTREAM_LATENCY_BUDGET:g}s"
+                ) from e
+        metrics.UPSTREAM_REQUESTS.inc(kind=kind, status=response.status_code)
+        metrics.UPSTREAM_BYTES.inc(len(response.content), kind=kind)
+        return response
 
-                def get_data(key: str) -> str:
-                    td = row.find("td", attrs={"data-info": key})
-                    if td:
-                        return td.get_text(strip=True)
-                    return ""
+    with _upstream_call():
+        try:
+            response = await upstream_scheduler.request(url, send)
+        except httpx.TimeoutException as e:
+            upstream_breaker.record_failure()
+            raise UpstreamUnavailable(str(e) or "Upstream timed out") from e
+    _record_status(response.status_code)
+    return response
 
-                img_tag = foto_td.find("img")
-                link_tag = foto_td.find("a")
-                
-                if not img_tag or not link_tag:
-                    continue
-                    
-                raw_img = img_tag.get("data-src") or img_tag.get("src")
-                image_url = get_clean_image_url(raw_img)
-                
-                detail_url = link_tag.get("href")
-                
-                if detail_url and not detail_url.startswith("http"):
-                    detail_url = f"{BASE_URL}{detail_url}"
-                
-                prop_type = row.find("span", attrs={"data-info": "tipo"})
-                prop_type = prop_type.get_text(strip=True) if prop_type else ""
-                
-                loc_span = row.find("span", attrs={"data-info": "localizacion"})
-                location = loc_span.get_text(strip=True) if loc_span else ""
-                
-                price_span = row.find("span", attrs={"data-info": "precioVenta"})
-                price = price_span.get_text(strip=True) if price_span else ""
-                
-                size = get_data("superficie")
-                bedrooms = get_data("dormitorios")
-                bathrooms = get_data("banos")
-                
-                # Filter out rentals at source
-                # If there is no sale price, but there is a rental price, it is a rental.
-                price_rent_span = row.find("span", attrs={"data-info": "precioAlquiler"})
-                if (not price_span or not price) and price_rent_span:
-                    # It's a rental
-                    continue
-                
-                prop_id = detail_url.split("/")[-1] if detail_url else "unknown"
+async def _fetch_properties(client: Optional[httpx.AsyncClient]) -> List[Property]:
+    response = await _fetch(client, LISTING_URL, "listing")
+    response.raise_for_status()
 
-                properties.append(Property(
-                    id=prop_id,
-                    title=f"{prop_type} en {location}",
-                    price=price,
-                    location=location,
-                    image_url=image_url or "",
-                    detail_url=detail_url or "",
-                    size=size,
-                    bedrooms=bedrooms,
-                    bathrooms=bathrooms
-                ))
-            except Exception as e:
-                # print(f"Skipping row due to error: {e}")
-                continue
-                
-        return properties
+    rows, stats = await run_parse(parse_listing_with_stats, response.content)
+    metrics.record_parse("listing", stats)
+    with metrics.STAGE_SECONDS.time(kind="listing", stage="records"):
+        return [Property(**row) for row in rows]
+
+async def _parse_detail_response(content: bytes, prop_id: str, client: Optional[httpx.AsyncClient]) -> PropertyDetail:
+    data, stats = await run_parse(parse_detail_with_stats, content, prop_id)
+    metrics.record_parse("detail", stats)
+    data["images"] = await image_prober.gallery(data["images"], client, config.IMAGE_PROBE_BUDGET)
+    with metrics.STAGE_SECONDS.time(kind="detail", stage="records"):
+        return PropertyDetail(**data)
 
-async def get_property_detail(prop_id: str) -> Optional[PropertyDetail]:
+async def stream_properties(client: Optional[httpx.AsyncClient] = None) -> AsyncIterator[Property]:
+    # Yields each Property as soon as its row has arrived and been parsed.
+    # Not coalesced or cached: used when the full list is not wanted in memory.
+    client = client or get_client()
+    parser = ListingStreamParser()
+    fetched = 0
+    try:
+        # Holds a slot for the whole stream; rows may already be out, so no retries
+        with _upstream_call():
+            async with upstream_scheduler.for_url(LISTING_URL).slot() as slot, \
+                    client.stream("GET", LISTING_URL, headers=HEADERS) as response:
+                slot.done(response.status_code)
+                _record_status(response.status_code)
+                metrics.UPSTREAM_REQUESTS.inc(kind="listing", status=response.status_code)
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    fetched += len(chunk)
+                    # Each chunk is only a few KiB of incremental parsing, cheap
+                    # enough to run on the event loop
+                    parser.feed(chunk)
+                    for row in parser.read_rows():
+                        yield Property(**row)
+                parser.close()
+                for row in parser.read_rows():
+                    yield Property(**row)
+    finally:
+        metrics.UPSTREAM_BYTES.inc(fetched, kind="listing")
+        metrics.record_parse("listing", parser.stats)
+
+async def get_property_detail(prop_id: str, client: Optional[httpx.AsyncClient] = None) -> Optional[PropertyDetail]:
     # Construct URL. Assuming prop_id matches the end of the url
     # e.g. ref-1052 -> https://www.thewellcomehome.com/es/venta_o_alquiler/ref-1052
     url = f"{LISTING_URL}/{prop_id}"
-    
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.get(url, headers=HEADERS)
-        if response.status_code == 404:
-            return None
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html5lib')
-        
-        # Description
-        description = ""
-        desc_div = soup.find("div", class_="IDDescripcionBig")
-        if desc_div:
-            ps = desc_div.find_all("p")
-            raw_desc = "\n\n".join([p.get_text(strip=True) for p in ps if p.get_text(strip=True)])
-            description = clean_description(raw_desc)
-        
-        # Images
-        images = []
-        # 1. Primary Method: LightSlider
-        slider_items = soup.select("ul#lightSlider li.sliderImage")
-        if slider_items:
-             for li in slider_items:
-                 src = li.get("data-src")
-                 clean_src = get_clean_image_url(src)
-                 if clean_src and clean_src not in images:
-                     images.append(clean_src)
-        
-        # 2. Fallback: Any large images if slider not found
-        if not images:
-            candidate_imgs = soup.find_all("img")
-            for img in candidate_imgs:
-                src = img.get("data-src") or img.get("src")
-                if not src: continue
-                
-                # Filter logic
-                if (".jpg" in src or ".png" in src) and "logo" not in src.lower() and "icon" not in src.lower():
-                     clean_src = get_clean_image_url(src)
-                     if clean_src not in images and ("large" in src or "original" in clean_src): 
-                        images.append(clean_src)
-        
-        # Remove duplicates preserving order
-        seen = set()
-        unique_images = []
-        for x in images:
-            if x not in seen:
-                unique_images.append(x)
-                seen.add(x)
-        
-        # Remove the last image if it exists (often a floor plan)
-        if unique_images:
-            unique_images.pop()
+    return await upstream_flights.do(url, lambda: _fetch_property_detail(url, prop_id, client))
 
-        # Title & Price Extraction (Improved)
-        title = soup.title.string if soup.title else "Propiedad"
-        title = clean_description(title) # Apply the new cleaning function
-        title = title.replace("Mobiliaria", "")
-        title = re.sub(r'(?i)Ref\s*[:.]?\s*\d+', '', title)
-        if "|" in title: title = title.split("|")[0]
-        elif " - " in title: 
-            parts = title.split(" - ")
-            if len(parts) > 1: title = parts[0]
-        title = title.strip(" .-|")
+async def _fetch_property_detail(url: str, prop_id: str, client: Optional[httpx.AsyncClient]) -> Optional[PropertyDetail]:
+    response = await _fetch(client, url, "detail")
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
 
-        # Price Strategy: IDPrecioBig
-        price = "Consultar"
-        price_div = soup.find(class_="IDPrecioBig")
-        if price_div:
-            price = price_div.get_text(strip=True)
-        else:
-            # Fallback
-            price_tags = soup.find_all(string=re.compile(r"[\d\.]+\s*€"))
-            if price_tags:
-                for pt in price_tags:
-                    text = pt.strip()
-                    if any(c.isdigit() for c in text):
-                         price = text
-                         break
-        
-        # Specific Details (Size, Beds, Baths) from .bloqueIconosBig
-        size = None
-        bedrooms = None
-        bathrooms = None
-        
-        icon_block = soup.find("div", class_="bloqueIconosBig")
-        if icon_block:
-            items = icon_block.find_all("div", class_="spanIconosInmuebleBig")
-            for item in items:
-                text = item.get_text(strip=True)
-                lower_text = text.lower()
-                
-                if "m2" in lower_text or "m²" in lower_text:
-                    size = text
-                elif "habitaciones" in lower_text or "dormitorios" in lower_text:
-                     # Extract number
-                     nums = re.findall(r'\d+', text)
-                     if nums: bedrooms = nums[0]
-                elif "baños" in lower_text or "aseos" in lower_text:
-                     nums = re.findall(r'\d+', text)
-                     if nums: bathrooms = nums[0]
+    return await _parse_detail_response(response.content, prop_id, client)
 
-        # Features Extraction
-        features = {}
-        features_container = soup.find("div", class_="IDOtrosDatosBig2Columnas")
-        if features_container:
-            props = features_container.find_all("div", class_="IDPropiedadBig")
-            for p in props:
-                full_text = p.get_text(strip=True)
-                key_text = ""
-                value_text = ""
-                pull_right = p.find("span", class_="pull-right")
-                if pull_right:
-                    if pull_right.find("span", class_="fa-check"):
-                        value_text = "Sí"
-                    else:
-                        value_text = pull_right.get_text(strip=True)
-                
-                key_text = p.find(string=True, recursive=False)
-                if not key_text:
-                     if pull_right:
-                         val_in_dom = pull_right.get_text(strip=True)
-                         key_text = full_text.replace(val_in_dom, "")
-                     else:
-                         key_text = full_text
-                
-                if key_text:
-                    k = key_text.strip()
-                    v = value_text.strip()
-                    if k and v:
-                        features[k] = v
+@dataclass
+class DetailValidators:
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    body_hash: Optional[str] = None
 
-        # Coordinate Extraction
-        latitude = None
-        longitude = None
-        
-        # Look for coordinates in script tags
-        scripts = soup.find_all("script")
-        for script in scripts:
-            if script.string:
-                # 1. Google Maps style (legacy checks)
-                coords_match = re.search(r'LatLng\s*\(\s*([-+]?\d*\.\d+|\d+)\s*,\s*([-+]?\d*\.\d+|\d+)\s*\)', script.string)
-                if coords_match:
-                     try:
-                        latitude = float(coords_match.group(1))
-                        longitude = float(coords_match.group(2))
-                        break
-                     except ValueError:
-                        pass
-                
-                # 2. OpenLayers style: ol.proj.fromLonLat([-3.688, 40.425]) -> [lon, lat]
-                ol_match = re.search(r'fromLonLat\s*\(\s*\[\s*([-+]?\d*\.\d+|\d+)\s*,\s*([-+]?\d*\.\d+|\d+)\s*\]', script.string)
-                if ol_match:
-                     try:
-                        # OpenLayers uses [lon, lat] order in fromLonLat
-                        longitude = float(ol_match.group(1))
-                        latitude = float(ol_match.group(2))
-                        break
-                     except ValueError:
-                        pass
-                
-                # 3. Generic variable assignments (lat = ..., lon = ...)
-                # Case insensitive math for lat/lon variables
-                lat_match = re.search(r'(?:var|let|const)?\s*(?:lat|latitude)\s*[:=]\s*([-+]?\d*\.\d+|\d+)', script.string, re.IGNORECASE)
-                lng_match = re.search(r'(?:var|let|const)?\s*(?:lng|lon|longitude)\s*[:=]\s*([-+]?\d*\.\d+|\d+)', script.string, re.IGNORECASE)
-                    
-                if lat_match and lng_match:
-                    try:
-                        latitude = float(lat_match.group(1))
-                        longitude = float(lng_match.group(1))
-                        break
-                    except ValueError:
-                        continue
+@dataclass
+class DetailRefresh:
+    # status: "not_modified" (304), "unchanged" (same body hash, not parsed),
+    # "parsed" or "missing" (404)
+    status: str
+    validators: Optional[DetailValidators] = None
+    detail: Optional[PropertyDetail] = None
+
+async def refresh_property_detail(prop_id: str, validators: Optional[DetailValidators] = None,
+                                  client: Optional[httpx.AsyncClient] = None) -> DetailRefresh:
+    # Conditional re-fetch for periodic crawls: send the stored validators
+    # and only parse when the page body actually changed
+    url = f"{LISTING_URL}/{prop_id}"
+    headers = dict(HEADERS)
+    if validators is not None:
+        if validators.etag:
+            headers["If-None-Match"] = validators.etag
+        if validators.last_modified:
+            headers["If-Modified-Since"] = validators.last_modified
+
+    response = await _fetch(client, url, "detail", headers=headers)
+    if response.status_code == 304 and validators is not None:
+        return DetailRefresh("not_modified", validators)
+    if response.status_code == 404:
+        return DetailRefresh("missing")
+    response.raise_for_status()
+
+    fresh = DetailValidators(
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        body_hash=hashlib.sha256(response.content).hexdigest(),
+    )
+    if validators is not None and validators.body_hash == fresh.body_hash:
+        return DetailRefresh("unchanged", fresh)
+
+    detail = await _parse_detail_response(response.content, prop_id, client)
+    return DetailRefresh("parsed", fresh, detail)
+
+async def get_property_details(prop_ids: List[str], concurrency: Optional[int] = None,
+                               client: Optional[httpx.AsyncClient] = None) -> Tuple[Dict[str, PropertyDetail], Dict[str, str]]:
+    # Fetch several details concurrently, bounded by a semaphore.
+    # Returns (details by id, error message by id); one failure does not
+    # sink the whole batch.
+    unique_ids = list(dict.fromkeys(prop_ids))
+    semaphore = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+    details: Dict[str, PropertyDetail] = {}
+    errors: Dict[str, str] = {}
+
+    async def fetch_one(prop_id: str):
+        async with semaphore:
+            try:
+                detail = await get_property_detail(prop_id, client=client)
+            except Exception as e:
+                errors[prop_id] = str(e) or e.__class__.__name__
+                return
+        if detail is None:
+            errors[prop_id] = "Property not found"
+        else:
+            details[prop_id] = detail
 
-        return PropertyDetail(
-            id=prop_id,
-            title=title,
-            description=description,
-            price=price,
-            images=unique_images,
-            features=features,
-            size=size,
-            bedrooms=bedrooms,
-            bathrooms=bathrooms,
-            latitude=latitude,
-            longitude=longitude
-        )
+    await asyncio.gather(*[fetch_one(prop_id) for prop_id in unique_ids])
+    return details, errors
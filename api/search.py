@@ -0,0 +1,143 @@
+import hashlib
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from .scraper import PropertyDetail
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a al con de del el en es la las lo los o para por que se si sin su sus un una uno unos unas y
+e u ni mas muy este esta estos estas ese esa son ha han hay como entre sobre tras desde hasta
+""".split())
+
+# Longest first, so "amientos" wins over "os"
+SUFFIXES = sorted([
+    "amientos", "imientos", "amiento", "imiento", "aciones", "iciones", "acion", "icion",
+    "mente", "idades", "idad", "ables", "ibles", "able", "ible", "istas", "ista",
+    "osos", "osas", "oso", "osa", "ales", "al", "es", "as", "os", "s", "a", "o", "e",
+], key=len, reverse=True)
+
+def fold(text: str) -> str:
+    # "Ático con Piscina" -> "atico con piscina" ("ñ" folds to "n")
+    decomposed = unicodedata.normalize("NFD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Light Spanish stemmer: strips one plural/gender/derivational suffix.
+
+    Only meant to make "piscina"/"piscinas" or "terraza"/"terrazas" meet,
+    not to be linguistically exact. Short words and numbers are kept.
+    """
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    return [stem(t) for t in TOKEN_RE.findall(fold(text)) if t not in STOPWORDS]
+
+def document_text(detail: PropertyDetail) -> str:
+    # detail.description is already the clean_description() output, and the
+    # title carries the street / neighbourhood ("Local en venta en Serrano, Madrid")
+    parts = [detail.title, detail.description]
+    for key, value in detail.features.items():
+        # "Piscina: No" must not match a search for piscina
+        if fold(value.strip()) == "no":
+            continue
+        parts.append(f"{key} {value}")
+    return "\n".join(p for p in parts if p)
+
+class SearchIndex:
+    """In-memory inverted index ranked with BM25.
+
+    Documents are upserted one at a time; re-indexing an unchanged text is
+    a no-op, and a changed document only touches the postings of its own
+    terms.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._doc_hash: Dict[str, str] = {}
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_len
+
+    def doc_ids(self) -> List[str]:
+        return list(self._doc_len)
+
+    def upsert(self, doc_id: str, text: str) -> bool:
+        """Index (or re-index) one document. Returns False when unchanged."""
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        if self._doc_hash.get(doc_id) == digest:
+            return False
+        self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        length = sum(terms.values())
+        self._doc_terms[doc_id] = terms
+        self._doc_len[doc_id] = length
+        self._doc_hash[doc_id] = digest
+        self._total_len += length
+        return True
+
+    def remove(self, doc_id: str) -> None:
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self._postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id)
+        del self._doc_hash[doc_id]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """(doc_id, score) pairs, best first. Every query term must match."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._doc_len:
+            return []
+        postings = [self._postings.get(term) for term in terms]
+        if any(p is None for p in postings):
+            return []
+
+        # Intersect starting from the rarest term
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        n = len(self._doc_len)
+        k1, b = self.k1, self.b
+        doc_len, avg_len = self._doc_len, self._total_len / n
+        # Length normalisation is per document, not per term
+        norms = {doc_id: k1 * (1 - b + b * doc_len[doc_id] / avg_len) for doc_id in candidates}
+        scores = dict.fromkeys(candidates, 0.0)
+        for posting in postings:
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, norm in norms.items():
+                tf = posting[doc_id]
+                scores[doc_id] += idf * tf * (k1 + 1) / (tf + norm)
+
+        rank = lambda item: (-item[1], item[0])
+        if limit is None:
+            return sorted(scores.items(), key=rank)
+        return heapq.nsmallest(limit, scores.items(), key=rank)
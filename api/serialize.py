@@ -0,0 +1,23 @@
+"""JSON encoding for API bodies, snapshots and the crawler store.
+
+orjson writes the scraper's dataclass records, lists and dicts straight to
+UTF-8 bytes, without building an intermediate dict per row. The output is
+the same compact JSON pydantic produced, so stored digests and ETags of
+unchanged data do not move.
+"""
+from typing import Any, Union
+import orjson
+from starlette.responses import Response
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content)
+
+def loads(data: Union[bytes, str]) -> Any:
+    return orjson.loads(data)
+
+class ORJSONResponse(Response):
+    """Default response class for endpoints returning plain content."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
@@ -0,0 +1,85 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from .scraper import Property, PropertyDetail
+from .serialize import dumps, loads
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshot (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    digest BLOB NOT NULL,
+    saved_at REAL NOT NULL
+);
+"""
+
+LISTING_KEY = "listing"
+
+class SnapshotStore:
+    """Last-known-good copies of the listing and of every detail, in SQLite.
+
+    Written after each successful scrape and read only when upstream fails,
+    so a restart during an outage still has something to serve. Saving what
+    is already stored costs a hash and no write.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # key -> (digest, saved_at) of what is on disk
+        self._saved: Dict[str, Tuple[bytes, float]] = {
+            key: (digest, saved_at)
+            for key, digest, saved_at in self._conn.execute("SELECT key, digest, saved_at FROM snapshot")
+        }
+        # (saved_at, decoded rows) of the listing last read back
+        self._listing: Optional[Tuple[float, List[Property]]] = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _put(self, key: str, body: bytes) -> None:
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        saved = self._saved.get(key)
+        if saved is not None and saved[0] == digest:
+            return
+        saved_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshot (key, body, digest, saved_at) VALUES (?, ?, ?, ?)",
+                (key, body, digest, saved_at),
+            )
+        self._saved[key] = (digest, saved_at)
+
+    def _get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            row = self._conn.execute("SELECT body, saved_at FROM snapshot WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save_listing(self, properties: List[Property]) -> None:
+        self._put(LISTING_KEY, dumps(properties))
+
+    def listing(self) -> Optional[Tuple[List[Property], float]]:
+        """The last good listing and when it was saved (epoch seconds)."""
+        saved = self._saved.get(LISTING_KEY)
+        if saved is None:
+            return None
+        # Decoded once per saved version; the same list object is handed back
+        if self._listing is None or self._listing[0] != saved[1]:
+            body, saved_at = self._get(LISTING_KEY)
+            self._listing = (saved_at, [Property(**row) for row in loads(body)])
+        return self._listing[1], self._listing[0]
+
+    def save_detail(self, detail: PropertyDetail) -> None:
+        self._put(f"detail:{detail.id}", dumps(detail))
+
+    def detail(self, prop_id: str) -> Optional[Tuple[PropertyDetail, float]]:
+        saved = self._get(f"detail:{prop_id}")
+        if saved is None:
+            return None
+        return PropertyDetail(**loads(saved[0])), saved[1]
@@ -0,0 +1,131 @@
+"""Local stand-in for the upstream site, serving the recorded pages in api/fixtures.
+
+In-process (tests, benchmarks):
+
+    client = standin_client(latency=0.05, jitter=0.02)
+
+As a server, with the API pointed at it:
+
+    python -m api.standin --port 8001 --latency 0.05 --jitter 0.02 --rows 2000
+    UPSTREAM_BASE_URL=http://127.0.0.1:8001 uvicorn api.index:app
+
+Detail pages are served from detail_<id>.html. With --rows the listing is
+inflated to that many rows; ids without a recorded page then get one of the
+recorded pages with the id swapped, so every listed property has a detail.
+Responses carry an ETag and honour If-None-Match, like a well-behaved origin.
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import os
+import random
+import re
+from typing import Dict, Optional
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from .http_client import create_client
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+LISTING_PATH = "/es/venta_o_alquiler"
+REF_RE = re.compile(r"ref-\d+")
+ROW_RE = re.compile(r'<tr class="filaListado">.*?</tr>', re.S)
+
+def load_corpus(fixtures: str = FIXTURES):
+    with open(os.path.join(fixtures, "listing.html"), "rb") as f:
+        listing = f.read()
+    details: Dict[str, bytes] = {}
+    for path in sorted(glob.glob(os.path.join(fixtures, "detail_*.html"))):
+        prop_id = os.path.basename(path)[len("detail_"):-len(".html")]
+        with open(path, "rb") as f:
+            details[prop_id] = f.read()
+    return listing, details
+
+def inflate_listing(listing: bytes, rows: int) -> bytes:
+    # Repeat the recorded rows with fresh ids until the listing has `rows` rows
+    page = listing.decode("utf-8")
+    body_start = page.index("<tbody>") + len("<tbody>")
+    body_end = page.index("</tbody>")
+    template = ROW_RE.findall(page[body_start:body_end])
+
+    generated = []
+    for i in range(rows):
+        row = template[i % len(template)]
+        # Unique ids so the catalogue looks like the real one
+        generated.append(REF_RE.sub(f"ref-{10000 + i}", row))
+    return (page[:body_start] + "\n".join(generated) + page[body_end:]).encode("utf-8")
+
+def create_app(fixtures: str = FIXTURES, latency: float = 0.0, jitter: float = 0.0,
+               rows: Optional[int] = None, seed: Optional[int] = None) -> Starlette:
+    listing, details = load_corpus(fixtures)
+    if rows is not None:
+        listing = inflate_listing(listing, rows)
+    recorded = sorted(details)
+    rng = random.Random(seed)
+    hits: Dict[str, int] = {"listing": 0, "detail": 0, "not_modified": 0, "missing": 0}
+
+    async def delay():
+        wait = latency + rng.uniform(-jitter, jitter) if jitter else latency
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def page_response(request: Request, body: bytes) -> Response:
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if request.headers.get("if-none-match") == etag:
+            hits["not_modified"] += 1
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(body, media_type="text/html; charset=utf-8", headers={"ETag": etag})
+
+    async def listing_page(request: Request) -> Response:
+        await delay()
+        hits["listing"] += 1
+        return page_response(request, listing)
+
+    async def detail_page(request: Request) -> Response:
+        await delay()
+        prop_id = request.path_params["prop_id"]
+        body = details.get(prop_id)
+        if body is None and rows is not None and REF_RE.fullmatch(prop_id) and recorded:
+            source = recorded[int(prop_id[4:]) % len(recorded)]
+            body = details[source].replace(source.encode(), prop_id.encode())
+        if body is None:
+            hits["missing"] += 1
+            return Response("Not found", status_code=404)
+        hits["detail"] += 1
+        return page_response(request, body)
+
+    app = Starlette(routes=[
+        Route(LISTING_PATH, listing_page),
+        Route(LISTING_PATH + "/{prop_id}", detail_page),
+    ])
+    app.state.hits = hits
+    return app
+
+def standin_client(**options) -> httpx.AsyncClient:
+    """Pooled upstream client whose requests are answered by the stand-in.
+
+    Any host goes to the stand-in, so the scraper's URLs need no change.
+    """
+    return create_client(transport=httpx.ASGITransport(app=create_app(**options)))
+
+def main(argv=None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the recorded upstream pages locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random extra latency")
+    parser.add_argument("--rows", type=int, default=None, help="inflate the listing to this many rows")
+    parser.add_argument("--fixtures", default=FIXTURES)
+    args = parser.parse_args(argv)
+    app = create_app(args.fixtures, args.latency, args.jitter, args.rows)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from .scraper import DetailValidators, Property, PropertyDetail
+from .serialize import dumps, loads
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS properties (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    price TEXT NOT NULL,
+    location TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS properties_position ON properties(position);
+CREATE INDEX IF NOT EXISTS properties_location ON properties(location);
+
+CREATE TABLE IF NOT EXISTS details (
+    id TEXT PRIMARY KEY,
+    latitude REAL,
+    longitude REAL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS details_coords ON details(latitude, longitude);
+
+CREATE TABLE IF NOT EXISTS detail_validators (
+    id TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body_hash TEXT,
+    checked_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS crawl_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS crawl_queue (
+    run_id INTEGER NOT NULL,
+    prop_id TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (run_id, prop_id)
+);
+CREATE INDEX IF NOT EXISTS crawl_queue_pending ON crawl_queue(run_id, done);
+"""
+
+class PropertyStore:
+    """SQLite (WAL) store filled by the crawler and read by the API.
+
+    The crawler usually runs in another process. Reads are memoised on
+    PRAGMA data_version, so repeated reads of an unchanged database never
+    touch the disk or re-decode JSON.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._version: Optional[int] = None
+        self._generation = 0
+        self._listing: Optional[List[Property]] = None
+        self._details: Dict[str, PropertyDetail] = {}
+        self._coordinates: Optional[Dict[str, Tuple[float, float]]] = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _check_version(self) -> None:
+        # data_version changes whenever another connection commits
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            self._version = version
+            self._generation += 1
+            self._listing = None
+            self._details = {}
+            self._coordinates = None
+
+    def _invalidate(self) -> None:
+        # Our own commits do not bump data_version for this connection
+        self._version = None
+
+    # Reads
+
+    def list_properties(self) -> List[Property]:
+        with self._lock:
+            self._check_version()
+            if self._listing is None:
+                rows = self._conn.execute("SELECT data FROM properties ORDER BY position").fetchall()
+                self._listing = [Property(**loads(data)) for (data,) in rows]
+            return self._listing
+
+    def get_detail(self, prop_id: str) -> Optional[PropertyDetail]:
+        with self._lock:
+            self._check_version()
+            detail = self._details.get(prop_id)
+            if detail is None:
+                row = self._conn.execute("SELECT data FROM details WHERE id = ?", (prop_id,)).fetchone()
+                if row is None:
+                    return None
+                detail = self._details[prop_id] = PropertyDetail(**loads(row[0]))
+            return detail
+
+    def list_coordinates(self) -> Dict[str, Tuple[float, float]]:
+        # Same object until the next commit, like list_properties()
+        with self._lock:
+            self._check_version()
+            if self._coordinates is None:
+                rows = self._conn.execute(
+                    "SELECT id, latitude, longitude FROM details "
+                    "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+                ).fetchall()
+                self._coordinates = {prop_id: (lat, lon) for prop_id, lat, lon in rows}
+            return self._coordinates
+
+    def generation(self) -> int:
+        """Changes whenever the database was written, by us or another process."""
+        with self._lock:
+            self._check_version()
+            return self._generation
+
+    def details_since(self, updated_after: float) -> Tuple[List[PropertyDetail], float]:
+        # Details written at or after updated_after, and the newest timestamp seen
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data, updated_at FROM details WHERE updated_at >= ? ORDER BY updated_at",
+                (updated_after,),
+            ).fetchall()
+        newest = rows[-1][1] if rows else updated_after
+        return [PropertyDetail(**loads(data)) for data, _ in rows], newest
+
+    def detail_ids(self) -> Set[str]:
+        with self._lock:
+            return {prop_id for (prop_id,) in self._conn.execute("SELECT id FROM details")}
+
+    def iter_details(self) -> List[PropertyDetail]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM details ORDER BY id").fetchall()
+        return [PropertyDetail(**loads(data)) for (data,) in rows]
+
+    # Writes (crawler side)
+
+    def replace_listing(self, properties: List[Property]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM properties")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO properties (id, position, title, price, location, data, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (p.id, position, p.title, p.price, p.location, dumps(p).decode(), now)
+                        for position, p in enumerate(properties)
+                    ],
+                )
+                # Details of listings that disappeared are dropped as well
+                self._conn.execute("DELETE FROM details WHERE id NOT IN (SELECT id FROM properties)")
+                self._conn.execute("DELETE FROM detail_validators WHERE id NOT IN (SELECT id FROM properties)")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._invalidate()
+
+    def put_detail(self, detail: PropertyDetail) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO details (id, latitude, longitude, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (detail.id, detail.latitude, detail.longitude, dumps(detail).decode(), time.time()),
+            )
+            self._invalidate()
+
+    def delete_detail(self, prop_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM details WHERE id = ?", (prop_id,))
+            self._conn.execute("DELETE FROM detail_validators WHERE id = ?", (prop_id,))
+            self._invalidate()
+
+    def get_validators(self, prop_id: str) -> Optional[DetailValidators]:
+        # Only meaningful while we still hold the detail they validate
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT v.etag, v.last_modified, v.body_hash FROM detail_validators v "
+                "JOIN details d ON d.id = v.id WHERE v.id = ?",
+                (prop_id,),
+            ).fetchone()
+        return DetailValidators(*row) if row else None
+
+    def put_validators(self, prop_id: str, validators: DetailValidators) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detail_validators (id, etag, last_modified, body_hash, checked_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (prop_id, validators.etag, validators.last_modified, validators.body_hash, time.time()),
+            )
+
+    # Crawl bookkeeping, so an interrupted crawl resumes where it stopped
+
+    def unfinished_run(self) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM crawl_runs WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        return row[0] if row else None
+
+    def start_run(self, prop_ids: List[str]) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                run_id = self._conn.execute(
+                    "INSERT INTO crawl_runs (started_at) VALUES (?)", (time.time(),)
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO crawl_queue (run_id, prop_id) VALUES (?, ?)",
+                    [(run_id, prop_id) for prop_id in prop_ids],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return run_id
+
+    def pending(self, run_id: int) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT prop_id FROM crawl_queue WHERE run_id = ? AND done = 0 ORDER BY rowid", (run_id,)
+            ).fetchall()
+        return [prop_id for (prop_id,) in rows]
+
+    def mark_done(self, run_id: int, prop_id: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE crawl_queue SET done = 1, error = ? WHERE run_id = ? AND prop_id = ?",
+                (error, run_id, prop_id),
+            )
+
+    def finish_run(self, run_id: int) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE crawl_runs SET finished_at = ? WHERE id = ?", (time.time(), run_id))
+            # Older queues are no longer needed
+            self._conn.execute("DELETE FROM crawl_queue WHERE run_id < ?", (run_id,))
@@ -0,0 +1,37 @@
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+from api import index
+from api.test_helpers import isolate_app, make_property
+
+CATALOGUE = [
+    make_property("3450"),
+    make_property("9999"),
+    make_property("3492", title="Alquiler en Salamanca"),
+    make_property("3239", price="4.000 €/mes"),
+]
+
+class TestListProperties(unittest.TestCase):
+    def setUp(self):
+        isolate_app(self)
+        index.listing_cache.clear()
+        self.client = TestClient(index.app)
+
+    def test_modes_share_one_cached_scrape(self):
+        with mock.patch.object(index, "get_properties", mock.AsyncMock(return_value=CATALOGUE)) as scrape:
+            all_ids = [p["id"] for p in self.client.get("/api/properties?mode=all").json()]
+            limited_ids = [p["id"] for p in self.client.get("/api/properties").json()]
+        self.assertEqual(all_ids, ["ref-3450", "ref-9999"])
+        self.assertEqual(limited_ids, ["ref-3450"])
+        self.assertEqual(scrape.await_count, 1)
+
+    def test_body_matches_the_openapi_schema(self):
+        # Records are dataclasses now; the wire format must not change
+        with mock.patch.object(index, "get_properties", mock.AsyncMock(return_value=CATALOGUE)):
+            rows = self.client.get("/api/properties?mode=all").json()
+        schema = self.client.get("/openapi.json").json()["components"]["schemas"]["Property"]
+        self.assertEqual(list(rows[0]), list(schema["properties"]))
+        self.assertEqual(rows[0], vars(CATALOGUE[0]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import unittest
+import httpx
+from api import http_client, index
+from api.scraper import LISTING_URL, get_property_details
+from api.test_helpers import isolate_app
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+with open(os.path.join(FIXTURES, "detail_ref-3450.html"), "rb") as f:
+    DETAIL_PAGE = f.read()
+
+class Upstream:
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.paths = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if not str(request.url).startswith(LISTING_URL):
+            # Floor-plan probes of the gallery images
+            return httpx.Response(404)
+        self.paths.append(request.url.path)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        if request.url.path.endswith("/ref-0404"):
+            return httpx.Response(404)
+        if request.url.path.endswith("/ref-0500"):
+            return httpx.Response(500)
+        return httpx.Response(200, content=DETAIL_PAGE)
+
+class TestGetPropertyDetails(unittest.IsolatedAsyncioTestCase):
+    async def test_bounded_concurrency_and_partial_errors(self):
+        upstream = Upstream()
+        ids = [f"ref-{i}" for i in range(12)] + ["ref-0404", "ref-0500", "ref-3"]
+        async with http_client.create_client(transport=httpx.MockTransport(upstream)) as client:
+            details, errors = await get_property_details(ids, concurrency=3, client=client)
+
+        self.assertLessEqual(upstream.peak, 3)
+        # ref-3 was requested twice but fetched once
+        self.assertEqual(len(upstream.paths), 14)
+        self.assertEqual(len(details), 12)
+        self.assertEqual(details["ref-3"].id, "ref-3")
+        self.assertEqual(errors["ref-0404"], "Property not found")
+        self.assertIn("500", errors["ref-0500"])
+
+class TestBatchEndpoint(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        isolate_app(self)
+        http_client.set_client(http_client.create_client(transport=httpx.MockTransport(Upstream())))
+        self.api = httpx.AsyncClient(transport=httpx.ASGITransport(app=index.app), base_url="http://api.test")
+
+    async def asyncTearDown(self):
+        await self.api.aclose()
+        await http_client.close_client()
+
+    async def test_batch_keeps_request_order(self):
+        response = await self.api.get("/api/properties/batch?ids=ref-2, ref-1,ref-0404,ref-2,")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([p["id"] for p in body["properties"]], ["ref-2", "ref-1"])
+        self.assertEqual(body["errors"], {"ref-0404": "Property not found"})
+
+    async def test_batch_rejects_empty_and_oversized(self):
+        self.assertEqual((await self.api.get("/api/properties/batch?ids=,")).status_code, 400)
+        too_many = ",".join(f"ref-{i}" for i in range(index.config.BATCH_MAX_IDS + 1))
+        self.assertEqual((await self.api.get(f"/api/properties/batch?ids={too_many}")).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+from api.cache import TTLCache
+from api.test_helpers import FakeClock
+
+class TestTTLCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.calls = 0
+
+    async def loader(self):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return f"v{self.calls}"
+
+    async def test_fresh_entry_is_not_reloaded(self):
+        cache = TTLCache(ttl=10, clock=self.clock)
+        self.assertEqual(await cache.get("k", self.loader), "v1")
+        self.clock.now = 5
+        self.assertEqual(await cache.get("k", self.loader), "v1")
+        self.assertEqual(self.calls, 1)
+
+    async def test_least_recently_used_evicted(self):
+        cache = TTLCache(ttl=10, clock=self.clock, max_entries=2)
+        await cache.get("a", self.loader)
+        await cache.get("b", self.loader)
+        await cache.get("a", self.loader)
+        await cache.get("c", self.loader)
+        self.assertIsNone(cache.peek("b"))
+        self.assertEqual(cache.peek("a"), "v1")
+        self.assertEqual(cache.evictions, 1)
+
+    async def test_concurrent_misses_share_one_load(self):
+        cache = TTLCache(ttl=10, clock=self.clock)
+        results = await asyncio.gather(*[cache.get("k", self.loader) for _ in range(20)])
+        self.assertEqual(set(results), {"v1"})
+        self.assertEqual(self.calls, 1)
+
+    async def test_stale_entry_served_while_single_refresh_runs(self):
+        cache = TTLCache(ttl=10, clock=self.clock)
+        await cache.get("k", self.loader)
+        self.clock.now = 11
+        results = await asyncio.gather(*[cache.get("k", self.loader) for _ in range(5)])
+        self.assertEqual(results, ["v1"] * 5)
+        # Let the background refresh finish
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(await cache.get("k", self.loader), "v2")
+
+    async def test_too_old_entry_reloads_inline(self):
+        cache = TTLCache(ttl=10, max_stale=5, clock=self.clock)
+        await cache.get("k", self.loader)
+        self.clock.now = 20
+        self.assertEqual(await cache.get("k", self.loader), "v2")
+
+    async def test_failed_refresh_keeps_stale_value(self):
+        cache = TTLCache(ttl=10, clock=self.clock)
+        await cache.get("k", self.loader)
+
+        async def broken():
+            raise RuntimeError("upstream down")
+
+        self.clock.now = 11
+        self.assertEqual(await cache.get("k", broken), "v1")
+        await asyncio.sleep(0.01)
+        self.assertEqual(await cache.get("k", self.loader), "v1")
+        await asyncio.sleep(0.01)
+        self.assertEqual(await cache.get("k", self.loader), "v2")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+from api import index
+from api.catalogue import CatalogueIndex, decode_cursor, encode_cursor
+from api.test_helpers import isolate_app, make_property
+from api.utils import parse_count, parse_price_eur, parse_spanish_number
+
+CATALOGUE = [
+    make_property("1", 2_950_000),
+    make_property("2"),
+    make_property("3", 750_000),
+    make_property("4", 1_200_000),
+    make_property("5", 5_400_000),
+    make_property("6", 1_200_000),
+]
+
+def ids(page):
+    return [p.id.split("-")[1] for p in page]
+
+class TestNumberParsing(unittest.TestCase):
+    def test_spanish_formats(self):
+        self.assertEqual(parse_price_eur("1.250.000 €"), 1250000)
+        self.assertIsNone(parse_price_eur("Consultar"))
+        self.assertEqual(parse_spanish_number("245,5 m²"), 245.5)
+        self.assertEqual(parse_count("4 dormitorios"), 4)
+        self.assertIsNone(parse_count(None))
+
+class TestCatalogueIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = CatalogueIndex(CATALOGUE)
+
+    def test_unfiltered_keeps_upstream_order(self):
+        page, next_cursor, total = self.index.query()
+        self.assertEqual(ids(page), ["1", "2", "3", "4", "5", "6"])
+        self.assertIsNone(next_cursor)
+        self.assertEqual(total, 6)
+
+    def test_sorts_put_unpriced_last(self):
+        self.assertEqual(ids(self.index.query(sort="price_asc")[0]), ["3", "4", "6", "1", "5", "2"])
+        self.assertEqual(ids(self.index.query(sort="price_desc")[0]), ["5", "1", "6", "4", "3", "2"])
+
+    def test_price_range_drops_unpriced(self):
+        page, _, total = self.index.query(min_price=1_000_000, max_price=3_000_000)
+        self.assertEqual(ids(page), ["1", "4", "6"])
+        self.assertEqual(total, 3)
+
+    def test_price_floor_keeps_unpriced(self):
+        page, _, _ = self.index.query(price_floor=1_000_000, sort="price_desc")
+        self.assertEqual(ids(page), ["5", "1", "6", "4", "2"])
+
+    def test_filtered_pages_keep_upstream_order(self):
+        first, cursor, total = self.index.query(price_floor=1_000_000, limit=2)
+        rest, end, _ = self.index.query(price_floor=1_000_000, limit=2, cursor=cursor)
+        self.assertEqual((ids(first), ids(rest), total), (["1", "2"], ["4", "5"], 5))
+        self.assertIsNotNone(end)
+        with mock.patch("builtins.sorted", side_effect=AssertionError("sorted per query")):
+            self.assertEqual(ids(self.index.query(max_price=1_200_000)[0]), ["3", "4", "6"])
+
+    def test_cursor_walks_every_page_once(self):
+        seen, cursor = [], None
+        while True:
+            page, cursor, total = self.index.query(sort="price_asc", limit=4, cursor=cursor)
+            seen += ids(page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, ["3", "4", "6", "1", "5", "2"])
+        self.assertEqual(total, 6)
+
+    def test_bad_input(self):
+        self.assertEqual(decode_cursor(encode_cursor(7)), 7)
+        with self.assertRaises(ValueError):
+            self.index.query(sort="cheapest")
+        with self.assertRaises(ValueError):
+            self.index.query(cursor="not-a-cursor")
+
+class TestListPropertiesQuery(unittest.TestCase):
+    def setUp(self):
+        isolate_app(self)
+        index.listing_cache.clear()
+        self.client = TestClient(index.app)
+
+    def test_pagination_headers(self):
+        with mock.patch.object(index, "get_properties", mock.AsyncMock(return_value=CATALOGUE)):
+            first = self.client.get("/api/properties?mode=all&sort=price_desc&price_floor=1000000&limit=2")
+            second = self.client.get(
+                f"/api/properties?mode=all&sort=price_desc&price_floor=1000000&limit=2"
+                f"&cursor={first.headers['X-Next-Cursor']}"
+            )
+            bad = self.client.get("/api/properties?mode=all&sort=cheapest")
+
+        self.assertEqual([p["id"] for p in first.json()], ["ref-5", "ref-1"])
+        self.assertEqual(first.headers["X-Total-Count"], "5")
+        self.assertEqual([p["id"] for p in second.json()], ["ref-6", "ref-4"])
+        self.assertEqual(first.json()[0]["price_eur"], 5_400_000)
+        self.assertEqual(bad.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+from api import index
+from api.changes import ChangeFeed, ChangeGap
+from api.test_helpers import FakeClock, isolate_app, make_property
+
+class TestChangeFeed(unittest.TestCase):
+    def setUp(self):
+        self.feed = ChangeFeed(max_versions=3, clock=FakeClock(1_700_000_000.0, step=1))
+        self.v1 = self.feed.observe([make_property("1", 1_000_000), make_property("2", 1_000_000), make_property("3", 1_000_000)])
+
+    def test_unchanged_catalogue_keeps_version(self):
+        self.assertEqual(self.feed.observe([make_property("1", 1_000_000), make_property("2", 1_000_000), make_property("3", 1_000_000)]), self.v1)
+        self.assertEqual(self.feed.changes_since(self.v1), [])
+
+    def test_add_remove_update(self):
+        v2 = self.feed.observe([make_property("1", 900_000), make_property("3", 1_000_000), make_property("4", 1_000_000)])
+        self.assertGreater(v2, self.v1)
+        changes = {c["id"]: c for c in self.feed.changes_since(self.v1)}
+        self.assertEqual(changes["ref-1"], {"op": "update", "id": "ref-1", "changes": {
+            "price": "900000 €", "price_eur": 900_000,
+        }})
+        self.assertEqual(changes["ref-2"], {"op": "remove", "id": "ref-2"})
+        self.assertEqual(changes["ref-4"]["op"], "add")
+        self.assertEqual(changes["ref-4"]["property"]["price_eur"], 1_000_000)
+        self.assertNotIn("ref-3", changes)
+
+    def test_changes_collapse_per_id(self):
+        self.feed.observe([make_property("1", 900_000), make_property("2", 1_000_000), make_property("5", 1_000_000)])
+        self.feed.observe([make_property("1", 900_000, title="Ático"), make_property("5", 10)])
+        v4 = self.feed.observe([make_property("1", 900_000, title="Ático"), make_property("2", 7)])
+        changes = {c["id"]: c for c in self.feed.changes_since(self.v1)}
+        # Price then title changed: one update with both
+        self.assertEqual(changes["ref-1"]["changes"], {"price": "900000 €", "price_eur": 900_000, "title": "Ático"})
+        # Removed then back: the full row
+        self.assertEqual(changes["ref-2"]["op"], "add")
+        self.assertEqual(changes["ref-2"]["property"]["price_eur"], 7)
+        self.assertEqual(changes["ref-3"], {"op": "remove", "id": "ref-3"})
+        # Added and gone again in between
+        self.assertNotIn("ref-5", changes)
+        self.assertEqual(self.feed.changes_since(v4), [])
+
+    def test_gaps(self):
+        for price in (1, 2, 3, 4):
+            self.feed.observe([make_property("1", price)])
+        with self.assertRaises(ChangeGap):
+            self.feed.changes_since(self.v1)
+        with self.assertRaises(ChangeGap):
+            self.feed.changes_since(self.feed.version + 1)
+        # since=0 is a full resync
+        self.assertEqual([c["id"] for c in self.feed.changes_since(0)], ["ref-1"])
+
+class TestChangesEndpoint(unittest.TestCase):
+    def setUp(self):
+        isolate_app(self)
+        index.listing_cache.clear()
+        self.client = TestClient(index.app)
+        patcher = mock.patch.object(index, "change_feed", ChangeFeed())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_poll(self):
+        catalogue = [make_property("3450"), make_property("9999")]
+        with mock.patch.object(index, "get_properties", mock.AsyncMock(return_value=catalogue)):
+            full = self.client.get("/api/changes?mode=all").json()
+            limited = self.client.get("/api/changes").json()
+        self.assertEqual([c["id"] for c in full["changes"]], ["ref-3450", "ref-9999"])
+        self.assertEqual([c["id"] for c in limited["changes"]], ["ref-3450"])
+
+        index.listing_cache.clear()
+        with mock.patch.object(index, "get_properties", mock.AsyncMock(return_value=catalogue[:1])):
+            delta = self.client.get(f"/api/changes?mode=all&since={full['version']}").json()
+            gone = self.client.get("/api/changes?since=1")
+        self.assertEqual(delta["changes"], [{"op": "remove", "id": "ref-9999"}])
+        self.assertGreater(delta["version"], full["version"])
+        self.assertEqual(gone.status_code, 410)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import json
+import subprocess
+import sys
+import unittest
+from benchmarks.import_time import LAZY_MODULES, MODULE, PROBE
+
+class TestColdStart(unittest.TestCase):
+    def test_heavy_modules_load_on_first_use(self):
+        # A fresh interpreter, so modules other tests imported don't count
+        out = subprocess.run([sys.executable, "-c", PROBE.format(module=MODULE)],
+                             capture_output=True, text=True, check=True).stdout
+        modules = json.loads(out.strip().splitlines()[-1])["modules"]
+        eager = [lazy for lazy in LAZY_MODULES
+                 if any(name == lazy or name.startswith(lazy + ".") for name in modules)]
+        self.assertEqual(eager, [])
+
+    def test_gc_reenabled_after_import(self):
+        out = subprocess.run([sys.executable, "-c", f"import gc, {MODULE}; print(gc.isenabled())"],
+                             capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.strip(), "True")
+
+    def test_gc_reenabled_when_an_import_fails(self):
+        # A None entry in sys.modules makes that import raise ImportError
+        probe = (f"import gc, sys; sys.modules['api.search'] = None\n"
+                 f"try:\n    import {MODULE}\nexcept ImportError:\n    print(gc.isenabled())")
+        out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.strip(), "True")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import httpx
+from fastapi.testclient import TestClient
+from api import http_client, index, scraper
+from api.crawler import crawl
+from api.parsers import parse_detail
+from api.scraper import LISTING_URL, get_properties, upstream_scheduler
+from api.store import PropertyStore
+from api.test_helpers import isolate_app
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+LISTING_PAGE = read_fixture("listing.html")
+DETAIL_PAGE = read_fixture("detail_ref-3450.html")
+
+class Upstream:
+    def __init__(self):
+        self.detail_hits = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if str(request.url) == LISTING_URL:
+            return httpx.Response(200, content=LISTING_PAGE)
+        if not str(request.url).startswith(LISTING_URL):
+            # Floor-plan probes: nothing classifiable, so the last image goes
+            return httpx.Response(404)
+        prop_id = request.url.path.rsplit("/", 1)[-1]
+        self.detail_hits.append(prop_id)
+        if prop_id == "ref-3008":
+            return httpx.Response(404)
+        if prop_id == "ref-1052":
+            return httpx.Response(503)
+        return httpx.Response(200, content=DETAIL_PAGE)
+
+class StoreTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        isolate_app(self)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "properties.db")
+        self.store = PropertyStore(self.path)
+        # ref-1052's 503 is retried; keep the backoff short
+        self.scheduler_options = upstream_scheduler.options.copy()
+        upstream_scheduler.reset(backoff_base=0.001)
+
+    def tearDown(self):
+        upstream_scheduler.reset(**self.scheduler_options)
+        self.store.close()
+        self.tmp.cleanup()
+
+class TestCrawler(StoreTestCase):
+    async def test_full_crawl(self):
+        upstream = Upstream()
+        async with http_client.create_client(transport=httpx.MockTransport(upstream)) as client:
+            stats = await crawl(self.store, client=client, concurrency=2)
+
+        self.assertFalse(stats.resumed)
+        self.assertEqual(stats.listed, 8)
+        self.assertEqual((stats.fetched, stats.parsed, stats.missing, stats.failed), (6, 6, 1, 1))
+        self.assertEqual(len(self.store.list_properties()), 8)
+        self.assertEqual(self.store.get_detail("ref-3450").price, "2.950.000 €")
+        # Stored with the floor plans already dropped
+        gallery = parse_detail(DETAIL_PAGE, "ref-3450")["images"]
+        self.assertEqual(self.store.get_detail("ref-3450").images, gallery[:-1])
+        self.assertIsNone(self.store.get_detail("ref-3008"))
+        self.assertIsNone(self.store.unfinished_run())
+
+    async def test_interrupted_crawl_resumes(self):
+        upstream = Upstream()
+        # A previous crawl stored the listing and two details, then died
+        async with http_client.create_client(transport=httpx.MockTransport(upstream)) as client:
+            properties = await get_properties(client=client)
+            self.store.replace_listing(properties)
+            run_id = self.store.start_run([p.id for p in properties])
+            self.store.mark_done(run_id, "ref-3450")
+            self.store.mark_done(run_id, "ref-3492")
+
+            stats = await crawl(self.store, client=client)
+
+        self.assertTrue(stats.resumed)
+        self.assertEqual(stats.run_id, run_id)
+        self.assertNotIn("ref-3450", upstream.detail_hits)
+        # Five details plus ref-1052's first try and three retries of its 503
+        self.assertEqual(len(upstream.detail_hits), 9)
+        self.assertIsNone(self.store.unfinished_run())
+
+class ConditionalUpstream(Upstream):
+    # ref-3450 honours ETags, ref-3492 has none but never changes, the rest change every time
+    def __init__(self):
+        super().__init__()
+        self.version = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if str(request.url) == LISTING_URL:
+            return httpx.Response(200, content=LISTING_PAGE)
+        if not str(request.url).startswith(LISTING_URL):
+            return httpx.Response(404)
+        prop_id = request.url.path.rsplit("/", 1)[-1]
+        self.detail_hits.append(prop_id)
+        if prop_id == "ref-3450":
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, content=DETAIL_PAGE, headers={"ETag": '"v1"'})
+        if prop_id == "ref-3492":
+            return httpx.Response(200, content=DETAIL_PAGE)
+        page = DETAIL_PAGE.replace(b"2.950.000", f"{self.version}.000.000".encode())
+        return httpx.Response(200, content=page)
+
+class TestIncrementalRefresh(StoreTestCase):
+    async def test_second_crawl_skips_unchanged_pages(self):
+        upstream = ConditionalUpstream()
+        async with http_client.create_client(transport=httpx.MockTransport(upstream)) as client:
+            first = await crawl(self.store, client=client)
+            upstream.version = 1
+            second = await crawl(self.store, client=client)
+
+        self.assertEqual((first.fetched, first.parsed), (8, 8))
+        self.assertEqual(second.not_modified, 1)
+        self.assertEqual(second.unchanged, 1)
+        self.assertEqual((second.fetched, second.parsed), (7, 6))
+        self.assertEqual(self.store.get_detail("ref-1052").price, "1.000.000 €")
+        self.assertEqual(self.store.get_detail("ref-3450").price, "2.950.000 €")
+
+    async def test_validators_dropped_with_detail(self):
+        upstream = ConditionalUpstream()
+        async with http_client.create_client(transport=httpx.MockTransport(upstream)) as client:
+            await crawl(self.store, client=client)
+        self.assertIsNotNone(self.store.get_validators("ref-3450"))
+        self.store.delete_detail("ref-3450")
+        self.assertIsNone(self.store.get_validators("ref-3450"))
+
+class TestStoreReads(StoreTestCase):
+    async def test_reads_are_memoised_until_another_writer_commits(self):
+        upstream = Upstream()
+        async with http_client.create_client(transport=httpx.MockTransport(upstream)) as client:
+            await crawl(self.store, client=client)
+
+        reader = PropertyStore(self.path)
+        try:
+            first = reader.list_properties()
+            self.assertIs(reader.list_properties(), first)
+            self.store.replace_listing(first[:2])
+            self.assertEqual(len(reader.list_properties()), 2)
+        finally:
+            reader.close()
+
+class TestApiServesFromStore(StoreTestCase):
+    async def test_endpoints_never_scrape(self):
+        upstream = Upstream()
+        async with http_client.create_client(transport=httpx.MockTransport(upstream)) as client:
+            await crawl(self.store, client=client)
+
+        no_scraping = mock.AsyncMock(side_effect=AssertionError("scraped on the request path"))
+        with mock.patch.object(index, "store", self.store), \
+                mock.patch.object(scraper.image_prober, "probe", no_scraping), \
+                mock.patch.object(index, "get_properties", no_scraping), \
+                mock.patch.object(index, "get_property_detail", no_scraping), \
+                mock.patch.object(index, "get_property_details", no_scraping):
+            api = TestClient(index.app)
+            listing = api.get("/api/properties?mode=all").json()
+            detail = api.get("/api/properties/ref-3450").json()
+            batch = api.get("/api/properties/batch?ids=ref-3450,ref-3008").json()
+
+        # The "Alquiler temporal" row is filtered out like in scrape mode
+        self.assertEqual(len(listing), 7)
+        self.assertEqual(detail["id"], "ref-3450")
+        self.assertEqual(batch["errors"], {"ref-3008": "Property not found"})
+
+if __name__ == '__main__':
+    unittest.main()
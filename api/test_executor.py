@@ -0,0 +1,139 @@
+import asyncio
+import contextlib
+import os
+import unittest
+from unittest import mock
+import httpx
+from api import executor, http_client, index, scraper
+from api.parsers import parse_detail, parse_listing
+from api.test_helpers import isolate_app
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+def heavy_detail_page() -> bytes:
+    # Slow to parse but with a small response: the padding is markup the
+    # extractor ignores (related listings, footer links...)
+    page = read_fixture("detail_ref-1052.html").decode("utf-8")
+    filler = '<div class="relacionado"><a href="/es/ref-0">Piso en <span>Salamanca</span></a></div>\n' * 4000
+    return page.replace('<div id="pie">', filler + '<div id="pie">').encode("utf-8")
+
+class TestRunParse(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        executor.set_mode("thread")
+
+    async def test_modes_return_same_result(self):
+        page = read_fixture("listing.html")
+        expected = parse_listing(page)
+        for mode in executor.MODES:
+            executor.set_mode(mode, workers=2)
+            with self.subTest(mode=mode):
+                self.assertEqual(await executor.run_parse(parse_listing, page), expected)
+
+    async def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            executor.set_mode("gpu")
+
+class TestEventLoopStaysResponsive(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.page = heavy_detail_page()
+
+    async def asyncTearDown(self):
+        executor.set_mode("thread")
+
+    async def ticks_during_parse(self, mode: str) -> int:
+        # How many times a sleep(0) ticker got the loop while one parse ran
+        executor.set_mode(mode, workers=2)
+        await executor.run_parse(parse_detail, self.page, "ref-warmup")
+        ticks = 0
+        parsing = True
+
+        async def ticker():
+            nonlocal ticks
+            while parsing:
+                await asyncio.sleep(0)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0)
+        before = ticks
+        detail = await executor.run_parse(parse_detail, self.page, "ref-1052")
+        during = ticks - before
+        parsing = False
+        await task
+        self.assertEqual(detail["id"], "ref-1052")
+        return during
+
+    async def test_offloaded_parse_leaves_loop_running(self):
+        # Inline, the parse holds the loop for its whole duration
+        self.assertEqual(await self.ticks_during_parse("inline"), 0)
+        for mode in ("thread", "process"):
+            with self.subTest(mode=mode):
+                self.assertGreater(await self.ticks_during_parse(mode), 0)
+
+class TestApiStaysResponsive(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        isolate_app(self)
+        page = heavy_detail_page()
+
+        def upstream(request: httpx.Request) -> httpx.Response:
+            if not str(request.url).startswith(scraper.LISTING_URL):
+                return httpx.Response(404)  # floor-plan probes
+            return httpx.Response(200, content=page)
+
+        self.page = page
+        http_client.set_client(http_client.create_client(transport=httpx.MockTransport(upstream)))
+        self.api = httpx.AsyncClient(transport=httpx.ASGITransport(app=index.app), base_url="http://api.test")
+        index.detail_cache.clear()
+
+    async def asyncTearDown(self):
+        await self.api.aclose()
+        await http_client.close_client()
+        executor.set_mode("thread")
+        index.detail_cache.clear()
+
+    async def hellos_during_detail_parses(self, mode: str) -> int:
+        # /api/hello responses completed while one of ten detail parses ran
+        executor.set_mode(mode, workers=4)
+        # Start every worker outside the count
+        await asyncio.gather(*[executor.run_parse(parse_detail, self.page, "ref-warmup") for _ in range(4)])
+        index.detail_cache.clear()
+        parsing = during = 0
+
+        async def counted_parse(fn, *args):
+            nonlocal parsing
+            parsing += 1
+            try:
+                return await executor.run_parse(fn, *args)
+            finally:
+                parsing -= 1
+
+        async def hellos():
+            nonlocal during
+            while True:
+                response = await self.api.get("/api/hello")
+                self.assertEqual(response.status_code, 200)
+                if parsing:
+                    during += 1
+
+        with mock.patch.object(scraper, "run_parse", counted_parse):
+            ticker = asyncio.ensure_future(hellos())
+            details = await asyncio.gather(*[self.api.get(f"/api/properties/ref-{i}") for i in range(10)])
+            ticker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await ticker
+        self.assertEqual([r.status_code for r in details], [200] * 10)
+        return during
+
+    async def test_hello_answers_during_detail_parses(self):
+        # Inline, a parse holds the loop: no request can finish meanwhile
+        self.assertEqual(await self.hellos_during_detail_parses("inline"), 0)
+        for mode in ("thread", "process"):
+            with self.subTest(mode=mode):
+                self.assertGreater(await self.hellos_during_detail_parses(mode), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+from api import index
+from api.geo import GeoIndex, cluster, parse_bbox
+from api.test_helpers import isolate_app, make_detail, make_property
+from api.store import PropertyStore
+
+# Two in central Madrid, one in Pozuelo (~10 km away), one in Barcelona
+COORDS = {
+    "ref-1": (40.4168, -3.7038),
+    "ref-2": (40.4200, -3.7000),
+    "ref-3": (40.4350, -3.8130),
+    "ref-4": (41.3874, 2.1686),
+}
+
+def make_index() -> GeoIndex:
+    geo = GeoIndex(cell_deg=0.05)
+    for prop_id, (lat, lon) in COORDS.items():
+        geo.upsert(prop_id, lat, lon)
+    return geo
+
+class TestGeoIndex(unittest.TestCase):
+    def test_bbox(self):
+        geo = make_index()
+        found = sorted(p.id for p in geo.bbox(*parse_bbox("-3.75,40.40,-3.69,40.43")))
+        self.assertEqual(found, ["ref-1", "ref-2"])
+        self.assertEqual(len(geo.bbox(-180, -90, 180, 90)), 4)
+
+    def test_radius_nearest_first(self):
+        hits = make_index().radius(40.4168, -3.7038, 15)
+        self.assertEqual([p.id for p, _ in hits], ["ref-1", "ref-2", "ref-3"])
+        self.assertAlmostEqual(hits[0][1], 0.0)
+
+    def test_points_move_and_disappear(self):
+        geo = make_index()
+        geo.upsert("ref-4", 40.418, -3.702)
+        geo.remove("ref-1")
+        geo.upsert("ref-2", None, None)
+        self.assertEqual([p.id for p in geo.bbox(-3.75, 40.40, -3.69, 40.43)], ["ref-4"])
+        self.assertEqual(len(geo), 2)
+
+    def test_cluster_by_zoom(self):
+        points = make_index().bbox(-180, -90, 180, 90)
+        lone, clusters = cluster(points, zoom=5)
+        self.assertEqual([p.id for p in lone], ["ref-4"])
+        self.assertEqual([c["count"] for c in clusters], [3])
+        lone, clusters = cluster(points, zoom=16)
+        self.assertEqual((len(lone), clusters), (4, []))
+
+    def test_bad_bbox(self):
+        with self.assertRaises(ValueError):
+            parse_bbox("1,2,3")
+        with self.assertRaises(ValueError):
+            parse_bbox("-3,41,-2,40")
+        for bbox in ("nan,0,1,1", "-inf,0,inf,1", "-181,0,1,1"):
+            with self.assertRaises(ValueError):
+                parse_bbox(bbox)
+
+class TestGeoEndpoint(unittest.TestCase):
+    def setUp(self):
+        isolate_app(self)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = PropertyStore(os.path.join(self.tmp.name, "properties.db"))
+        self.store.replace_listing([make_property(prop_id, 1_500_000) for prop_id in COORDS])
+        for prop_id, (lat, lon) in COORDS.items():
+            self.store.put_detail(make_detail(prop_id, latitude=lat, longitude=lon))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_served_from_store_without_fetching_details(self):
+        no_fetch = mock.AsyncMock(side_effect=AssertionError("fetched a detail"))
+        with mock.patch.object(index, "store", self.store), \
+                mock.patch.object(index, "geo_index", GeoIndex()), \
+                mock.patch.object(index, "_store_coordinates", None), \
+                mock.patch.object(index, "get_property_detail", no_fetch), \
+                mock.patch.object(index, "get_property_details", no_fetch):
+            api = TestClient(index.app)
+            near = api.get("/api/properties/geo?mode=all&lat=40.4168&lon=-3.7038&radius_km=1").json()
+            zoomed_out = api.get("/api/properties/geo?mode=all&bbox=-10,35,5,44&zoom=5").json()
+            self.store.delete_detail("ref-2")
+            after_delete = api.get("/api/properties/geo?mode=all&lat=40.4168&lon=-3.7038&radius_km=1").json()
+            missing_params = api.get("/api/properties/geo?lat=40.4")
+            not_finite = [api.get(f"/api/properties/geo?bbox={bbox}").status_code
+                          for bbox in ("nan,0,1,1", "-inf,0,inf,1")]
+
+        self.assertEqual([p["id"] for p in near["points"]], ["ref-1", "ref-2"])
+        self.assertEqual(near["points"][0]["price_eur"], 1500000)
+        self.assertEqual([p["id"] for p in zoomed_out["points"]], ["ref-4"])
+        self.assertEqual(zoomed_out["clusters"][0]["count"], 3)
+        self.assertEqual([p["id"] for p in after_delete["points"]], ["ref-1"])
+        self.assertEqual(missing_params.status_code, 400)
+        self.assertEqual(not_finite, [400, 400])
+
+if __name__ == '__main__':
+    unittest.main()
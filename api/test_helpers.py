@@ -0,0 +1,74 @@
+"""Shared fixtures for the test modules (no tests in here)."""
+import os
+import tempfile
+import unittest
+from typing import Optional
+from unittest import mock
+import httpx
+from api import config, http_client, scraper
+from api.imageprobe import ImageProber
+from api.scraper import Property, PropertyDetail
+
+def make_property(num: str, price_eur: Optional[int] = None, **fields) -> Property:
+    """Listing row ref-<num> (or num itself when it already is an id)."""
+    prop_id = num if num.startswith("ref-") else f"ref-{num}"
+    row = dict(
+        id=prop_id, title="Piso en Salamanca",
+        price=f"{price_eur} €" if price_eur is not None else "Consultar",
+        location="Salamanca", image_url="", detail_url=f"https://example.test/{prop_id}",
+        price_eur=price_eur,
+    )
+    row.update(fields)
+    return Property(**row)
+
+def make_detail(prop_id: str, **fields) -> PropertyDetail:
+    row = dict(id=prop_id, title="Piso", description="", price="1.500.000 €", images=[], features={})
+    row.update(fields)
+    return PropertyDetail(**row)
+
+class FakeClock:
+    """Manual clock; with a step, every reading advances it first."""
+
+    def __init__(self, now: float = 0.0, step: float = 0.0):
+        self.now = now
+        self.step = step
+
+    def __call__(self) -> float:
+        self.now += self.step
+        return self.now
+
+_create_client = http_client.create_client
+
+def _refuse(request: httpx.Request) -> httpx.Response:
+    raise httpx.ConnectError("Tests do not reach the network", request=request)
+
+def offline_client(transport=None, **overrides) -> httpx.AsyncClient:
+    return _create_client(transport or httpx.MockTransport(_refuse), **overrides)
+
+def isolate_app(test: unittest.TestCase) -> None:
+    """Keeps index.app off the shared snapshot and image manifest files.
+
+    The snapshot is disabled and the manifest gets a file of its own for
+    the duration of the test, so nothing carries over between runs or
+    into a local server. Floor-plan probes start from an empty cache, and
+    the default upstream client (the one background image checks fall back
+    to) refuses every request instead of reaching the network.
+    """
+    from api import index
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    for patch in (
+        mock.patch.object(config, "SNAPSHOT_PATH", ""),
+        mock.patch.object(index, "snapshots", None),
+        mock.patch.object(config, "IMAGE_MANIFEST_PATH", os.path.join(tmp.name, "manifest.sqlite3")),
+        mock.patch.object(index, "image_manifest", None),
+        mock.patch.object(scraper, "image_prober", ImageProber(config.IMAGE_PROBE_BYTES)),
+        mock.patch.object(http_client, "create_client", offline_client),
+    ):
+        patch.start()
+        test.addCleanup(patch.stop)
+
+    def close_manifest():
+        if index.image_manifest is not None:
+            index.image_manifest.close()
+    test.addCleanup(close_manifest)
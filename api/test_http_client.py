@@ -0,0 +1,63 @@
+import unittest
+import httpx
+from fastapi.testclient import TestClient
+from api import http_client, index
+from api.scraper import get_properties, get_property_detail, LISTING_URL
+from api.test_helpers import isolate_app
+
+LISTING_HTML = b"""
+<html><body><table id="infoListado">
+<tr>
+  <td data-info="foto"><a href="/es/venta_o_alquiler/ref-3450"><img data-src="//media.test/Images/1/1-large.jpg"></a></td>
+  <td><span data-info="tipo">Piso</span> <span data-info="localizacion">Salamanca</span></td>
+  <td><span data-info="precioVenta">1.500.000 &euro;</span></td>
+  <td data-info="superficie">200 m2</td><td data-info="dormitorios">3</td><td data-info="banos">2</td>
+</tr>
+</table></body></html>
+"""
+
+DETAIL_HTML = b"""
+<html><head><title>Piso en Salamanca | Mobiliaria</title></head><body>
+<div class="IDPrecioBig">1.500.000 &euro;</div>
+</body></html>
+"""
+
+def upstream(request: httpx.Request) -> httpx.Response:
+    if str(request.url) == LISTING_URL:
+        return httpx.Response(200, content=LISTING_HTML)
+    if request.url.path.endswith("/ref-3450"):
+        return httpx.Response(200, content=DETAIL_HTML)
+    return httpx.Response(404)
+
+class TestInjectedClient(unittest.IsolatedAsyncioTestCase):
+    async def test_scraper_uses_injected_transport(self):
+        async with http_client.create_client(transport=httpx.MockTransport(upstream)) as client:
+            props = await get_properties(client=client)
+            detail = await get_property_detail("ref-3450", client=client)
+            missing = await get_property_detail("ref-0000", client=client)
+        self.assertEqual([p.id for p in props], ["ref-3450"])
+        self.assertEqual(detail.price, "1.500.000 €")
+        self.assertIsNone(missing)
+
+    async def test_shared_client_is_reused_within_a_loop(self):
+        try:
+            first = http_client.get_client()
+            self.assertIs(http_client.get_client(), first)
+        finally:
+            await http_client.close_client()
+        self.assertTrue(first.is_closed)
+
+class TestAppLifespan(unittest.TestCase):
+    def setUp(self):
+        isolate_app(self)
+
+    def test_client_follows_app_lifetime(self):
+        with TestClient(index.app):
+            client = http_client._client
+            self.assertIsNotNone(client)
+            self.assertFalse(client.is_closed)
+        self.assertTrue(client.is_closed)
+        self.assertIsNone(http_client._client)
+
+if __name__ == '__main__':
+    unittest.main()
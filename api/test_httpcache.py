@@ -0,0 +1,149 @@
+import gzip
+import unittest
+import zlib
+from unittest import mock
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from api import index
+from api.httpcache import CompressionMiddleware, etag_matches, negotiate
+from api.test_helpers import isolate_app, make_property
+
+CATALOGUE = [make_property(str(3000 + i), 1_500_000, title="Piso en Salamanca " * 5) for i in range(40)]
+
+class TestNegotiation(unittest.TestCase):
+    def test_negotiate(self):
+        self.assertEqual(negotiate("gzip, deflate, br", brotli=True), "br")
+        self.assertEqual(negotiate("gzip, deflate, br", brotli=False), "gzip")
+        self.assertEqual(negotiate("br;q=0, gzip;q=0.5", brotli=True), "gzip")
+        self.assertEqual(negotiate("*", brotli=False), "gzip")
+        self.assertIsNone(negotiate("identity", brotli=True))
+        self.assertIsNone(negotiate("", brotli=True))
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"a", "b"', '"b"'))
+        self.assertTrue(etag_matches('W/"b"', '"b"'))
+        self.assertTrue(etag_matches("*", '"b"'))
+        self.assertFalse(etag_matches('"bb"', '"b"'))
+        self.assertFalse(etag_matches(None, '"b"'))
+        # The encoded copies' ETags revalidate the same body
+        self.assertTrue(etag_matches('"b-gzip"', '"b"'))
+        self.assertTrue(etag_matches('W/"b-br"', '"b"'))
+        self.assertFalse(etag_matches('"b-gzip"', '"a"'))
+
+class TestCompressionMiddleware(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+
+        @app.get("/big")
+        def big():
+            return PlainTextResponse("x" * 5000, headers={"ETag": '"v1"'})
+
+        @app.get("/small")
+        def small():
+            return PlainTextResponse("tiny")
+
+        @app.get("/rows")
+        def rows():
+            return StreamingResponse((f'{{"row": {i}}}\n' for i in range(100)), media_type="application/x-ndjson")
+
+        app.add_middleware(CompressionMiddleware, minimum_size=1024)
+        self.client = TestClient(app)
+
+    def get(self, path: str, encoding: str = "gzip"):
+        # Raw bytes, so the test sees what went over the wire
+        with self.client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+            return response, b"".join(response.iter_raw())
+
+    def test_whole_body_is_gzipped(self):
+        response, raw = self.get("/big")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["vary"])
+        self.assertEqual(response.headers["etag"], '"v1-gzip"')
+        self.assertEqual(int(response.headers["content-length"]), len(raw))
+        self.assertEqual(gzip.decompress(raw), b"x" * 5000)
+
+    def test_small_and_identity_untouched(self):
+        response, raw = self.get("/small")
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(raw, b"tiny")
+        response, raw = self.get("/big", encoding="identity")
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.headers["etag"], '"v1"')
+        self.assertEqual(len(raw), 5000)
+
+    def test_vary_even_when_not_compressed(self):
+        cases = [("/small", "gzip"), ("/big", "identity"), ("/big", "")]
+        with mock.patch("api.httpcache.brotli_available", return_value=False):
+            self.setUp()  # a fresh app, whose middleware has no brotli
+            cases.append(("/big", "br"))
+            for path, encoding in cases:
+                response, _ = self.get(path, encoding)
+                self.assertNotIn("content-encoding", response.headers)
+                self.assertEqual(response.headers["vary"], "Accept-Encoding", (path, encoding))
+
+    def test_stream_is_compressed_incrementally(self):
+        response, raw = self.get("/rows")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertNotIn("content-length", response.headers)
+        lines = zlib.decompress(raw, 31).decode().splitlines()
+        self.assertEqual(lines[0], '{"row": 0}')
+        self.assertEqual(len(lines), 100)
+
+    def test_compressed_bodies_cached_per_etag(self):
+        with mock.patch("gzip.compress", wraps=gzip.compress) as compress:
+            first = self.get("/big")[1]
+            second = self.get("/big")[1]
+        self.assertEqual(first, second)
+        self.assertEqual(compress.call_count, 1)
+
+class TestConditionalRequests(unittest.TestCase):
+    def setUp(self):
+        isolate_app(self)
+        index.listing_cache.clear()
+        self.client = TestClient(index.app)
+        self.patch = mock.patch.object(index, "get_properties", mock.AsyncMock(return_value=CATALOGUE))
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        index.listing_cache.clear()
+
+    def test_listing_revalidates_to_304(self):
+        first = self.client.get("/api/properties?mode=all")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers["content-encoding"], "gzip")
+        self.assertIn("s-maxage=", first.headers["cache-control"])
+        self.assertIn("stale-while-revalidate=", first.headers["cache-control"])
+        self.assertIn("Accept-Encoding", first.headers["vary"])
+        etag = first.headers["etag"]
+        self.assertTrue(etag.endswith('-gzip"'))
+
+        again = self.client.get("/api/properties?mode=all", headers={"If-None-Match": etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+        self.assertEqual(again.headers["etag"], etag)
+        self.assertIn("Accept-Encoding", again.headers["vary"])
+
+        # An identity copy has the bare ETag and revalidates with it
+        plain = self.client.get("/api/properties?mode=all", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", plain.headers)
+        self.assertEqual(plain.headers["etag"], etag.replace('-gzip"', '"'))
+        again = self.client.get("/api/properties?mode=all",
+                                headers={"Accept-Encoding": "identity", "If-None-Match": plain.headers["etag"]})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.headers["etag"], plain.headers["etag"])
+
+        # Another query is another body, hence another ETag
+        page = self.client.get("/api/properties?mode=all&limit=5", headers={"If-None-Match": etag})
+        self.assertEqual(page.status_code, 200)
+        self.assertNotEqual(page.headers["etag"], etag)
+
+    def test_changes_always_revalidate(self):
+        first = self.client.get("/api/changes?mode=all")
+        self.assertEqual(first.headers["cache-control"], "no-cache")
+        again = self.client.get("/api/changes?mode=all", headers={"If-None-Match": first.headers["etag"]})
+        self.assertEqual(again.status_code, 304)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import asyncio
+import io
+import unittest
+from functools import lru_cache
+import httpx
+from PIL import Image, ImageDraw, ImageFilter
+from api.imageprobe import ImageProber, decode_probe
+
+MEDIA = "https://media.mobiliagestion.es/Portals/inmoweb/Images/1052"
+
+@lru_cache(maxsize=None)
+def floor_plan(fmt: str = "JPEG", progressive: bool = False) -> bytes:
+    image = Image.new("RGB", (1600, 1200), "white")
+    draw = ImageDraw.Draw(image)
+    for x in range(100, 1600, 300):
+        draw.line((x, 0, x, 1200), fill="black", width=6)
+    draw.rectangle((200, 200, 700, 600), outline=(60, 60, 60), width=6)
+    out = io.BytesIO()
+    image.save(out, fmt, quality=85, progressive=progressive)
+    return out.getvalue()
+
+@lru_cache(maxsize=None)
+def photo(progressive: bool = False) -> bytes:
+    image = Image.merge("RGB", [
+        Image.effect_noise((1600, 1200), sigma).filter(ImageFilter.GaussianBlur(4)) for sigma in (60, 40, 80)
+    ])
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=85, progressive=progressive)
+    return out.getvalue()
+
+class TestDecodeProbe(unittest.TestCase):
+    def test_classifies_from_first_bytes(self):
+        for progressive in (False, True):
+            with self.subTest(progressive=progressive):
+                plan = decode_probe(floor_plan(progressive=progressive)[:16384])
+                self.assertEqual((plan.width, plan.height), (1600, 1200))
+                self.assertTrue(plan.is_floor_plan)
+                self.assertFalse(decode_probe(photo(progressive)[:16384]).is_floor_plan)
+
+    def test_truncated_png_gives_dimensions_only(self):
+        data = floor_plan("PNG")
+        probe = decode_probe(data[:200])
+        self.assertEqual((probe.width, probe.height), (1600, 1200))
+        self.assertIsNone(probe.is_floor_plan)
+
+    def test_not_an_image(self):
+        self.assertIsNone(decode_probe(b"<html>Not found</html>"))
+
+class TestImageProber(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.images = {
+            f"{MEDIA}/1-original.jpg": photo(),
+            f"{MEDIA}/2-original.jpg": floor_plan(),
+            # Only the base file exists for this one
+            f"{MEDIA}/3.jpg": photo(progressive=True),
+        }
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(request)
+            body = self.images.get(str(request.url))
+            if body is None:
+                return httpx.Response(404)
+            first, last = request.headers["Range"][len("bytes="):].split("-")
+            return httpx.Response(206, content=body[int(first):int(last) + 1])
+
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_drops_floor_plans_wherever_they_are(self):
+        prober = ImageProber(probe_bytes=16384)
+        gallery = [f"{MEDIA}/1-original.jpg", f"{MEDIA}/2-original.jpg", f"{MEDIA}/3-original.jpg"]
+        self.assertEqual(await prober.gallery(gallery, self.client), [gallery[0], gallery[2]])
+        self.assertTrue(all(r.headers["Range"] == "bytes=0-16383" for r in self.requests))
+
+        # Cached per URL
+        count = len(self.requests)
+        await prober.gallery(gallery, self.client)
+        self.assertEqual(len(self.requests), count)
+
+    async def test_falls_back_to_dropping_the_last_image(self):
+        prober = ImageProber()
+        gallery = [f"{MEDIA}/8.jpg", f"{MEDIA}/9.jpg"]
+        self.assertEqual(await prober.gallery(gallery, self.client), [f"{MEDIA}/8.jpg"])
+
+    async def test_budget_keeps_what_was_probed_in_time(self):
+        prober = ImageProber()
+        known = [f"{MEDIA}/1-original.jpg", f"{MEDIA}/2-original.jpg"]
+        await prober.probe_many(known, self.client)
+
+        async def hangs(request):
+            await asyncio.sleep(60)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(hangs)) as slow, asyncio.timeout(5):
+            gallery = await prober.gallery(known + [f"{MEDIA}/slow.jpg"], slow, budget=0.05)
+        # The plan is still dropped; the image that never answered is kept
+        self.assertEqual(gallery, [known[0], f"{MEDIA}/slow.jpg"])
+
+    async def test_stops_reading_when_range_is_ignored(self):
+        big = photo()
+        url = f"{MEDIA}/big.jpg"
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=big)))
+        async with client:
+            probe = await ImageProber(probe_bytes=4096).probe(url, client)
+        self.assertEqual((probe.width, probe.height), (1600, 1200))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+import httpx
+from PIL import Image
+from api import http_client, index
+from api.images import DiskLRU, ImageProxy, allowed_source, resize_image, snap_width
+from api.test_helpers import isolate_app
+
+SRC = "https://media.mobiliagestion.es/Portals/inmoweb/Images/1052/photo.jpg"
+
+def jpeg(width: int, height: int) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (180, 120, 60)).save(out, "JPEG", quality=95)
+    return out.getvalue()
+
+class TestDiskLRU(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_evicts_least_recently_used(self):
+        cache = DiskLRU(self.tmp.name, max_bytes=250)
+        cache.put("a", b"a" * 100)
+        cache.put("b", b"b" * 100)
+        cache.get("a")
+        cache.put("c", b"c" * 100)
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.read("c"), b"c" * 100)
+        self.assertEqual(len(os.listdir(self.tmp.name)), 2)
+
+    def test_survives_restart(self):
+        cache = DiskLRU(self.tmp.name, max_bytes=1000)
+        _, etag = cache.put("a", b"payload")
+        cache.put("a", b"payload v2")
+
+        reopened = DiskLRU(self.tmp.name, max_bytes=1000)
+        path, new_etag = reopened.get("a")
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(reopened.read("a"), b"payload v2")
+        self.assertEqual(reopened.size, len(b"payload v2"))
+
+class TestHelpers(unittest.TestCase):
+    def test_resize_keeps_aspect_and_never_upscales(self):
+        with Image.open(io.BytesIO(resize_image(jpeg(2000, 1000), 320, "webp", 80))) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (320, 160)))
+        with Image.open(io.BytesIO(resize_image(jpeg(200, 100), 320, "jpeg", 80))) as image:
+            self.assertEqual(image.size, (200, 100))
+
+    def test_snap_width(self):
+        widths = (160, 320, 640)
+        self.assertEqual(snap_width(1, widths), 160)
+        self.assertEqual(snap_width(321, widths), 640)
+        self.assertEqual(snap_width(5000, widths), 640)
+
+    def test_allowed_source(self):
+        hosts = ("media.mobiliagestion.es",)
+        self.assertTrue(allowed_source(SRC, hosts))
+        self.assertFalse(allowed_source("https://evil.example/x.jpg", hosts))
+        self.assertFalse(allowed_source("file:///etc/passwd", hosts))
+
+class TestImageEndpoint(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        isolate_app(self)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.upstream_hits = 0
+        original = jpeg(2000, 1333)
+
+        def handler(request):
+            self.upstream_hits += 1
+            if request.url.path.endswith("missing.jpg"):
+                return httpx.Response(404)
+            return httpx.Response(200, content=original, headers={"Content-Type": "image/jpeg"})
+
+        http_client.set_client(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        proxy = ImageProxy(DiskLRU(self.tmp.name, 50 * 1024 * 1024))
+        patcher = mock.patch.object(index, "image_proxy", proxy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api = httpx.AsyncClient(transport=httpx.ASGITransport(app=index.app), base_url="http://api.test")
+
+    async def asyncTearDown(self):
+        await self.api.aclose()
+        await http_client.close_client()
+
+    async def test_resized_variant_is_cached(self):
+        response = await self.api.get("/api/images", params={"src": SRC, "w": 300})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "image/jpeg")
+        self.assertIn("immutable", response.headers["cache-control"])
+        with Image.open(io.BytesIO(response.content)) as image:
+            self.assertEqual(image.width, 320)
+
+        again = await self.api.get("/api/images", params={"src": SRC, "w": 320})
+        self.assertEqual(again.content, response.content)
+        self.assertEqual(again.headers["etag"], response.headers["etag"])
+
+        not_modified = await self.api.get(
+            "/api/images", params={"src": SRC, "w": 320},
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+        # Other variants come from the cached original
+        webp = await self.api.get("/api/images", params={"src": SRC, "w": 640}, headers={"Accept": "image/webp,*/*"})
+        self.assertEqual(webp.headers["content-type"], "image/webp")
+        self.assertIn("Accept", webp.headers["vary"])
+        self.assertEqual(self.upstream_hits, 1)
+
+    async def test_original_without_width(self):
+        response = await self.api.get("/api/images", params={"src": SRC})
+        self.assertEqual(response.status_code, 200)
+        with Image.open(io.BytesIO(response.content)) as image:
+            self.assertEqual(image.size, (2000, 1333))
+
+    async def test_rejects_bad_requests(self):
+        foreign = await self.api.get("/api/images", params={"src": "https://evil.example/a.jpg", "w": 320})
+        self.assertEqual(foreign.status_code, 400)
+        bad_format = await self.api.get("/api/images", params={"src": SRC, "w": 320, "format": "gif"})
+        self.assertEqual(bad_format.status_code, 400)
+        missing = await self.api.get("/api/images", params={"src": SRC.replace("photo", "missing"), "w": 320})
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(self.upstream_hits, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+import httpx
+from api import index
+from api.manifest import ImageManifest, candidates
+from api.test_helpers import make_detail
+
+BASE = "https://media.mobiliagestion.es/Portals/inmoweb/Images/1052/9018052"
+
+class ManifestTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "manifest.sqlite3")
+        self.existing = set()
+        self.requests = []
+
+        def handler(request):
+            self.requests.append((request.method, str(request.url)))
+            if request.method == "HEAD" and "refuse-head" in str(request.url):
+                return httpx.Response(405)
+            if str(request.url) in self.existing:
+                return httpx.Response(206 if request.method == "GET" else 200)
+            return httpx.Response(404)
+
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def manifest(self, **options) -> ImageManifest:
+        manifest = ImageManifest(self.path, options.get("ttl", 3600), options.get("negative_ttl", 60))
+        self.addCleanup(manifest.close)
+        return manifest
+
+class TestCandidates(unittest.TestCase):
+    def test_candidates(self):
+        self.assertEqual(candidates(f"{BASE}-original.jpg"), [
+            f"{BASE}-original.jpg", f"{BASE}-large.jpg", f"{BASE}.jpg",
+        ])
+        self.assertEqual(candidates(f"{BASE}.gif"), [f"{BASE}.gif"])
+
+class TestImageManifest(ManifestTestCase):
+    async def test_prefers_original_then_large_then_base(self):
+        manifest = self.manifest()
+        self.existing = {f"{BASE}-large.jpg", f"{BASE}.jpg"}
+        self.assertEqual(await manifest.resolve(f"{BASE}-original.jpg", self.client), f"{BASE}-large.jpg")
+        self.existing.add(f"{BASE}-original.png")
+        self.assertEqual(await manifest.resolve(f"{BASE}-original.png", self.client), f"{BASE}-original.png")
+
+    async def test_checked_once_per_ttl_including_misses(self):
+        manifest = self.manifest()
+        url = f"{BASE}-original.jpg"
+        self.assertEqual(await manifest.resolve_many([url, url], self.client), [url, url])
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(await manifest.resolve(url, self.client), url)
+        self.assertEqual(len(self.requests), 3)
+
+        with mock.patch("api.manifest.time.time", return_value=manifest._entries[url][1] + 61):
+            await manifest.resolve(url, self.client)
+        self.assertEqual(len(self.requests), 6)
+
+    async def test_persists_across_restarts(self):
+        self.existing = {f"{BASE}.jpg"}
+        await self.manifest().resolve(f"{BASE}-original.jpg", self.client)
+        reopened = self.manifest()
+        self.assertEqual(reopened.lookup(f"{BASE}-original.jpg"), f"{BASE}.jpg")
+        self.assertEqual(len(self.requests), 3)
+
+    async def test_ranged_get_when_head_is_refused(self):
+        url = "https://media.mobiliagestion.es/refuse-head/1-original.jpg"
+        self.existing = {url}
+        self.assertEqual(await self.manifest().resolve(url, self.client), url)
+        self.assertIn(("GET", url), self.requests)
+
+    async def test_network_errors_are_not_cached(self):
+        def broken(request):
+            raise httpx.ConnectError("down", request=request)
+
+        manifest = self.manifest()
+        url = f"{BASE}-original.jpg"
+        async with httpx.AsyncClient(transport=httpx.MockTransport(broken)) as client:
+            self.assertEqual(await manifest.resolve(url, client), url)
+        self.assertEqual(len(manifest), 0)
+
+    async def test_stops_at_the_first_candidate_that_exists(self):
+        manifest = self.manifest()
+        url = f"{BASE}-original.jpg"
+        self.existing = set(candidates(url))
+        self.assertEqual(await manifest.resolve(url, self.client), url)
+        self.assertEqual(self.requests, [("HEAD", url)])
+
+    async def test_slow_checks_give_up_uncached(self):
+        async def hangs(request):
+            await asyncio.sleep(60)
+
+        manifest = ImageManifest(self.path, 3600, 60, budget=0.05)
+        self.addCleanup(manifest.close)
+        url = f"{BASE}-original.jpg"
+        async with httpx.AsyncClient(transport=httpx.MockTransport(hangs)) as client, asyncio.timeout(5):
+            self.assertEqual(await manifest.resolve(url, client), url)
+        self.assertEqual(len(manifest), 0)
+
+    async def test_schedule_fills_lookup_in_background(self):
+        manifest = self.manifest()
+        url = f"{BASE}-original.jpg"
+        self.existing = {f"{BASE}.jpg"}
+        self.assertEqual(manifest.lookup(url), url)
+        manifest.schedule([url, url], self.client)
+        await manifest.wait_pending()
+        self.assertEqual(manifest.lookup(url), f"{BASE}.jpg")
+        self.assertEqual(len(self.requests), 3)
+
+class TestVerifiedResponses(ManifestTestCase):
+    async def test_detail_images_are_rewritten_without_mutating(self):
+        manifest = self.manifest()
+        self.existing = {f"{BASE}-large.jpg"}
+        detail = make_detail("ref-1052", images=[f"{BASE}-original.jpg", f"{BASE}-plan-original.png"])
+        with mock.patch.object(index, "image_manifest", manifest), \
+                mock.patch("api.manifest.get_client", return_value=self.client):
+            # Unknown yet: answered as-is while the checks run in the background
+            self.assertIs(index.verified_detail(detail), detail)
+            self.assertEqual(self.requests, [])
+            await manifest.wait_pending()
+            verified = index.verified_detail(detail)
+        # Floor plans were dropped at fetch time; nothing is probed here
+        self.assertEqual(verified.images, [f"{BASE}-large.jpg", f"{BASE}-plan-original.png"])
+        self.assertEqual(detail.images[0], f"{BASE}-original.jpg")
+
+if __name__ == "__main__":
+    unittest.main()
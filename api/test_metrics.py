@@ -0,0 +1,99 @@
+import os
+import unittest
+from unittest import mock
+import httpx
+from api import http_client, index, metrics, parsers
+from api.scraper import get_properties
+from api.test_helpers import isolate_app
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+with open(os.path.join(FIXTURES, "listing.html"), "rb") as f:
+    LISTING_PAGE = f.read()
+
+class MetricsTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        metrics.set_enabled(True)
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.set_enabled(True)
+        metrics.reset()
+
+class TestRegistry(MetricsTestCase):
+    def test_text_format(self):
+        counter = metrics.Counter("test_things_total", "Things", ("kind",))
+        histogram = metrics.Histogram("test_seconds", "Latency", ("kind",), buckets=(0.1, 1.0))
+        counter.inc(kind='a"b')
+        counter.inc(2, kind='a"b')
+        histogram.observe(0.05, kind="x")
+        histogram.observe(0.5, kind="x")
+
+        self.assertEqual(counter.render()[-1], 'test_things_total{kind="a\\"b"} 3')
+        self.assertEqual(histogram.render()[2:], [
+            'test_seconds_bucket{kind="x",le="0.1"} 1',
+            'test_seconds_bucket{kind="x",le="1"} 2',
+            'test_seconds_bucket{kind="x",le="+Inf"} 2',
+            'test_seconds_sum{kind="x"} 0.55',
+            'test_seconds_count{kind="x"} 2',
+        ])
+
+    def test_disabled_records_nothing(self):
+        metrics.set_enabled(False)
+        counter = metrics.Counter("test_disabled_total", "Nothing")
+        counter.inc()
+        histogram = metrics.Histogram("test_disabled_seconds", "Nothing")
+        with histogram.time():
+            pass
+        self.assertEqual(counter.value(), 0)
+        self.assertEqual(histogram.count(), 0)
+
+class TestHotPath(MetricsTestCase):
+    async def test_listing_stages_and_skipped_rows(self):
+        real_row = parsers._listing_row
+        calls = []
+
+        def flaky_row(fields, foto_td):
+            calls.append(1)
+            if len(calls) == 1:
+                raise AttributeError("broken row")
+            return real_row(fields, foto_td)
+
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=LISTING_PAGE))
+        with mock.patch.object(parsers, "_listing_row", flaky_row):
+            async with http_client.create_client(transport=transport) as client:
+                properties = await get_properties(client=client)
+
+        self.assertEqual(len(properties), 7)
+        self.assertEqual(metrics.LISTING_ROWS.value(outcome="parsed"), 7)
+        self.assertEqual(metrics.LISTING_ROWS.value(outcome="error"), 1)
+        self.assertEqual(metrics.UPSTREAM_BYTES.value(kind="listing"), len(LISTING_PAGE))
+        for stage in ("fetch", "build", "extract", "records"):
+            self.assertEqual(metrics.STAGE_SECONDS.count(kind="listing", stage=stage), 1, stage)
+
+class TestMetricsEndpoint(MetricsTestCase):
+    async def asyncSetUp(self):
+        isolate_app(self)
+        index.listing_cache.clear()
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=LISTING_PAGE))
+        http_client.set_client(http_client.create_client(transport=transport))
+        self.api = httpx.AsyncClient(transport=httpx.ASGITransport(app=index.app), base_url="http://api.test")
+
+    async def asyncTearDown(self):
+        await self.api.aclose()
+        await http_client.close_client()
+
+    async def test_prometheus_export(self):
+        await self.api.get("/api/properties?mode=all")
+        await self.api.get("/api/properties?mode=all")
+        body = (await self.api.get("/api/metrics")).text
+
+        self.assertIn('api_listing_cache_requests_total{result="hit"}', body)
+        self.assertIn('scraper_stage_seconds_count{kind="listing",stage="serialize"} 2', body)
+        self.assertIn('api_request_seconds_count{route="/api/properties",status="200"} 2', body)
+
+        metrics.set_enabled(False)
+        self.assertEqual((await self.api.get("/api/metrics")).status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import unittest
+from api.parsers import parse_detail, parse_listing
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+class TestListingParser(unittest.TestCase):
+    def setUp(self):
+        self.page = read_fixture("listing.html")
+
+    def test_lxml_matches_html5lib_reference(self):
+        self.assertEqual(parse_listing(self.page, "lxml"), parse_listing(self.page, "html5lib"))
+
+    def test_extracted_rows(self):
+        rows = parse_listing(self.page, "lxml")
+        self.assertEqual(
+            [r["id"] for r in rows],
+            ["ref-3450", "ref-3492", "ref-3282", "ref-3351", "ref-3514", "ref-3008", "ref-1052", "ref-2201"],
+        )
+        first = rows[0]
+        self.assertEqual(first["title"], "Piso en Recoletos, Madrid")
+        self.assertEqual(first["price"], "2.950.000 €")
+        self.assertEqual(first["size"], "245 m2")
+        self.assertEqual(first["detail_url"], "https://www.thewellcomehome.com/es/venta_o_alquiler/ref-3450")
+        self.assertEqual(
+            first["image_url"],
+            "https://media.mobiliagestion.es/Portals/inmothewellcomehome/Images/3450/9018052-original.jpg",
+        )
+        self.assertEqual(rows[1]["price"], "4.200.000€")
+        self.assertEqual(rows[1]["bathrooms"], "4")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            parse_listing(self.page, "regex")
+
+DETAIL_PAGES = ["ref-1052", "ref-3492", "ref-3450"]
+
+class TestDetailParser(unittest.TestCase):
+    def test_lxml_matches_html5lib_reference(self):
+        for prop_id in DETAIL_PAGES:
+            page = read_fixture(f"detail_{prop_id}.html")
+            with self.subTest(prop_id=prop_id):
+                self.assertEqual(parse_detail(page, prop_id, "lxml"), parse_detail(page, prop_id, "html5lib"))
+
+    def test_slider_page(self):
+        detail = parse_detail(read_fixture("detail_ref-1052.html"), "ref-1052", "lxml")
+        self.assertEqual(detail["title"], "Local en venta en Serrano, Madrid")
+        self.assertEqual(detail["price"], "5.400.000€")
+        # Duplicates removed, video slide ignored; the floor plan is kept for the API's probe
+        self.assertEqual(len(detail["images"]), 4)
+        self.assertTrue(all(url.endswith("-original.jpg") for url in detail["images"][:3]))
+        self.assertTrue(detail["images"][-1].endswith("-original.png"))
+        self.assertEqual(detail["features"]["Ascensor"], "Sí")
+        self.assertEqual(detail["features"]["Orientación"], "Este")
+        self.assertNotIn("Certificado energético", detail["features"])
+        self.assertEqual((detail["size"], detail["bedrooms"], detail["bathrooms"]), ("520 m2", "0", "2"))
+        self.assertEqual((detail["latitude"], detail["longitude"]), (40.4262, -3.6874))
+
+    def test_fallbacks_without_slider_or_price_block(self):
+        detail = parse_detail(read_fixture("detail_ref-3492.html"), "ref-3492", "lxml")
+        self.assertEqual(detail["price"], "Precio: 4.200.000 €")
+        self.assertEqual(len(detail["images"]), 4)
+        self.assertFalse(any("icon" in url or "logo" in url for url in detail["images"]))
+        self.assertEqual((detail["latitude"], detail["longitude"]), (40.441, -3.6905))
+
+if __name__ == '__main__':
+    unittest.main()
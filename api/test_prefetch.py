@@ -0,0 +1,149 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+import httpx
+from api import config, http_client, index, scraper
+from api.prefetch import Prefetcher
+from api.test_helpers import isolate_app
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+with open(os.path.join(FIXTURES, "detail_ref-3450.html"), "rb") as f:
+    DETAIL_PAGE = f.read()
+with open(os.path.join(FIXTURES, "listing.html"), "rb") as f:
+    LISTING_PAGE = f.read()
+
+class TestPrefetcher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.loaded = []
+        self.cached = {"cached"}
+        self.busy = False
+
+    async def load(self, key):
+        await asyncio.sleep(0)
+        if key == "broken":
+            raise RuntimeError("upstream error")
+        self.loaded.append(key)
+        self.cached.add(key)
+
+    def prefetcher(self, **options) -> Prefetcher:
+        return Prefetcher(self.load, self.cached.__contains__, lambda: self.busy, **options)
+
+    async def test_bounded_and_deduplicated(self):
+        prefetcher = self.prefetcher(queue_size=3, concurrency=1)
+        self.assertEqual(prefetcher.schedule(["a", "a", "cached", "b", "broken", "c"]), 3)
+        await prefetcher.join()
+        self.assertEqual(self.loaded, ["a", "b"])
+        self.assertEqual(prefetcher.stats(), {
+            "enqueued": 3, "dropped": 1, "skipped": 0, "fetched": 2, "failed": 1, "used": 0,
+        })
+
+    async def test_waits_while_upstream_is_busy(self):
+        prefetcher = self.prefetcher(idle_wait=0.001)
+        self.busy = True
+        prefetcher.schedule(["a"])
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.loaded, [])
+        self.busy = False
+        await prefetcher.join()
+        self.assertEqual(self.loaded, ["a"])
+
+    async def test_gives_up_while_busy_until_next_schedule(self):
+        prefetcher = self.prefetcher(idle_wait=0.001, max_idle_wait=0.002, give_up_after=0.01)
+        self.busy = True
+        prefetcher.schedule(["a"])
+        await prefetcher.join()
+        self.assertEqual((self.loaded, prefetcher.pending()), ([], 1))
+        self.busy = False
+        prefetcher.schedule([])
+        await prefetcher.join()
+        self.assertEqual(self.loaded, ["a"])
+
+    async def test_hit_ratio_counts_claims_once(self):
+        prefetcher = self.prefetcher()
+        prefetcher.schedule(["a", "b"])
+        await prefetcher.join()
+        self.assertTrue(prefetcher.claim("a"))
+        self.assertFalse(prefetcher.claim("a"))
+        self.assertFalse(prefetcher.claim("z"))
+        self.assertEqual(prefetcher.hit_ratio(), 0.5)
+
+class TestListingPrefetch(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        isolate_app(self)
+        self.detail_hits = []
+
+        async def upstream(request: httpx.Request) -> httpx.Response:
+            if str(request.url) == scraper.LISTING_URL:
+                return httpx.Response(200, content=LISTING_PAGE)
+            self.detail_hits.append(request.url.path.rsplit("/", 1)[-1])
+            return httpx.Response(200, content=DETAIL_PAGE)
+
+        self.prefetcher = Prefetcher(index.prefetch_detail, index.detail_cache.is_fresh, index.upstream_busy)
+        gallery = mock.AsyncMock(side_effect=lambda images, *args: images)
+        self.patches = [
+            mock.patch.object(config, "PREFETCH_TOP_N", 2),
+            mock.patch.object(index, "detail_prefetcher", self.prefetcher),
+            mock.patch.object(index, "image_manifest", None),
+            mock.patch.object(config, "IMAGE_MANIFEST_PATH", ""),
+            mock.patch.object(scraper.image_prober, "gallery", gallery),
+        ]
+        for patch in self.patches:
+            patch.start()
+        index.listing_cache.clear()
+        index.detail_cache.clear()
+        http_client.set_client(http_client.create_client(transport=httpx.MockTransport(upstream)))
+        self.api = httpx.AsyncClient(transport=httpx.ASGITransport(app=index.app), base_url="http://api.test")
+
+    async def asyncTearDown(self):
+        await self.api.aclose()
+        await self.prefetcher.close()
+        await http_client.close_client()
+        for patch in reversed(self.patches):
+            patch.stop()
+        index.listing_cache.clear()
+        index.detail_cache.clear()
+
+    async def test_first_cards_served_from_cache(self):
+        listing = await self.api.get("/api/properties?mode=all")
+        first, second = [row["id"] for row in listing.json()[:2]]
+        await self.prefetcher.join()
+        self.assertEqual(sorted(self.detail_hits), sorted([first, second]))
+
+        detail = await self.api.get(f"/api/properties/{first}")
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.json()["id"], first)
+        self.assertEqual(len(self.detail_hits), 2)
+        self.assertEqual(self.prefetcher.stats()["used"], 1)
+
+        # Already cached: listing again queues nothing
+        await self.api.get("/api/properties?mode=all")
+        await self.prefetcher.join()
+        self.assertEqual(self.prefetcher.stats()["enqueued"], 2)
+        self.assertEqual(len(self.detail_hits), 2)
+
+    async def test_idle_host_is_never_busy(self):
+        host = index.upstream_scheduler.for_url(scraper.LISTING_URL)
+        with mock.patch.object(host, "limit", 1.0), mock.patch.object(host, "in_flight", 0):
+            self.assertFalse(index.upstream_busy())
+            host.in_flight = 1
+            self.assertTrue(index.upstream_busy())
+        with mock.patch.object(host, "limit", 4.0), mock.patch.object(host, "in_flight", 2):
+            self.assertFalse(index.upstream_busy())
+            host.in_flight = 3
+            self.assertTrue(index.upstream_busy())
+
+    async def test_batch_serves_prefetched_details(self):
+        listing = (await self.api.get("/api/properties?mode=all")).json()
+        first, second, third = [row["id"] for row in listing[:3]]
+        await self.prefetcher.join()
+
+        batch = await self.api.get(f"/api/properties/batch?ids={first},{third},{second}")
+        self.assertEqual([p["id"] for p in batch.json()["properties"]], [first, third, second])
+        # Only the id that was not prefetched went upstream
+        self.assertEqual(sorted(self.detail_hits), sorted([first, second, third]))
+        self.assertEqual(self.prefetcher.stats()["used"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+import asyncio
+import unittest
+from email.utils import formatdate
+import httpx
+from api import http_client, scraper
+from api.scheduler import HostScheduler, Scheduler, TokenBucket, retry_after
+
+class FakeTime:
+    """Clock and sleep for the scheduler; sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+def responder(*statuses, headers=None):
+    queue = list(statuses)
+    calls = []
+
+    async def send() -> httpx.Response:
+        calls.append(1)
+        status = queue.pop(0) if queue else 200
+        return httpx.Response(status, headers=headers if status != 200 else None)
+    return send, calls
+
+class TestRetryAfter(unittest.TestCase):
+    def test_seconds_and_http_date(self):
+        self.assertEqual(retry_after(httpx.Response(429, headers={"Retry-After": "7"})), 7.0)
+        date = formatdate(1_000_030, usegmt=True)
+        self.assertEqual(retry_after(httpx.Response(503, headers={"Retry-After": date}), now=1_000_000), 30.0)
+        self.assertIsNone(retry_after(httpx.Response(503, headers={"Retry-After": "soon"})))
+        self.assertIsNone(retry_after(httpx.Response(503)))
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_paced(self):
+        time = FakeTime()
+        bucket = TokenBucket(rate=2.0, burst=2, clock=time.clock)
+        self.assertEqual([bucket.reserve() for _ in range(4)], [0.0, 0.0, 0.5, 1.0])
+        time.now = 10.0
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_zero_rate_is_unlimited(self):
+        bucket = TokenBucket(rate=0, burst=1)
+        self.assertEqual([bucket.reserve() for _ in range(100)], [0.0] * 100)
+
+class TestHostScheduler(unittest.IsolatedAsyncioTestCase):
+    def scheduler(self, **options) -> HostScheduler:
+        self.time = FakeTime()
+        options = {"rate": 0, "initial_concurrency": 4, "max_concurrency": 8, **options}
+        return HostScheduler("upstream.test", clock=self.time.clock, sleep=self.time.sleep, **options)
+
+    async def test_retry_after_is_honoured(self):
+        scheduler = self.scheduler()
+        send, calls = responder(429, 503, headers={"Retry-After": "3"})
+        response = await scheduler.request(send)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.time.sleeps, [3.0, 3.0])
+        self.assertEqual(scheduler.stats()["retries"], 2)
+        self.assertEqual(scheduler.stats()["throttled"], 1)
+
+    async def test_backoff_is_jittered_exponential(self):
+        scheduler = self.scheduler(max_retries=3, backoff_base=1.0)
+        send, calls = responder(502, 502, 502, 502)
+        response = await scheduler.request(send)
+        # Out of retries: the last failure is returned as-is
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(len(self.time.sleeps), 3)
+        for attempt, delay in enumerate(self.time.sleeps):
+            self.assertLessEqual(delay, 2 ** attempt)
+
+    async def test_plain_500_is_not_retried(self):
+        scheduler = self.scheduler()
+        send, calls = responder(500)
+        self.assertEqual((await scheduler.request(send)).status_code, 500)
+        self.assertEqual(len(calls), 1)
+
+    async def test_transport_errors_are_retried_then_raised(self):
+        scheduler = self.scheduler(max_retries=1)
+        calls = []
+
+        async def send():
+            calls.append(1)
+            raise httpx.ConnectError("refused")
+
+        with self.assertRaises(httpx.ConnectError):
+            await scheduler.request(send)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(scheduler.stats()["errors"], 2)
+        self.assertEqual(scheduler.in_flight, 0)
+
+    async def test_aimd(self):
+        scheduler = self.scheduler(initial_concurrency=4, target_latency=1.0)
+        send, _ = responder()
+        for _ in range(8):
+            await scheduler.request(send)
+        grown = scheduler.limit
+        self.assertGreater(grown, 5)
+
+        # A burst of throttling halves the limit once per cooldown
+        throttled, _ = responder(429, 429, 429, 429)
+        scheduler.max_retries = 0
+        for _ in range(4):
+            await scheduler.request(throttled)
+        self.assertAlmostEqual(scheduler.limit, grown / 2)
+
+        # Slow responses count as congestion too
+        self.time.now += 10
+
+        async def slow():
+            self.time.now += 5
+            return httpx.Response(200)
+        await scheduler.request(slow)
+        self.assertAlmostEqual(scheduler.limit, grown / 4)
+
+    async def test_limit_bounds_concurrency(self):
+        scheduler = self.scheduler(initial_concurrency=2, max_concurrency=2)
+        active = {"now": 0, "peak": 0}
+
+        async def send():
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.001)
+            active["now"] -= 1
+            return httpx.Response(200)
+
+        await asyncio.gather(*(scheduler.request(send) for _ in range(10)))
+        self.assertEqual(active["peak"], 2)
+        self.assertEqual(scheduler.stats()["peak_in_flight"], 2)
+
+    async def test_cancelled_while_rate_limited_frees_the_slot(self):
+        paced = asyncio.Event()
+
+        async def sleep(seconds):
+            # Rate-limited forever, until cancelled
+            paced.set()
+            await asyncio.Event().wait()
+
+        scheduler = HostScheduler("upstream.test", rate=1, burst=1, initial_concurrency=1, sleep=sleep)
+        send, calls = responder()
+        await scheduler.request(send)
+        waiting = asyncio.ensure_future(scheduler.request(send))
+        await paced.wait()
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(scheduler.in_flight, 0)
+        self.assertEqual(len(calls), 1)
+
+    async def test_hosts_get_separate_budgets(self):
+        registry = Scheduler(rate=0)
+        self.assertIs(registry.for_url("https://a.test/x"), registry.for_url("https://a.test/y"))
+        self.assertIsNot(registry.for_url("https://a.test/x"), registry.for_url("https://b.test/x"))
+        self.assertEqual(set(registry.stats()), {"a.test", "b.test"})
+
+class TestScraperSharesBudget(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.saved = scraper.upstream_scheduler.options.copy()
+        scraper.upstream_scheduler.reset(initial_concurrency=2, max_concurrency=2, rate=0, backoff_base=0.001)
+
+    async def asyncTearDown(self):
+        scraper.upstream_scheduler.reset(**self.saved)
+
+    async def test_detail_fetches_share_one_budget(self):
+        state = {"now": 0, "peak": 0, "throttled": False}
+
+        async def upstream(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/ref-1") and not state["throttled"]:
+                state["throttled"] = True
+                return httpx.Response(429, headers={"Retry-After": "0"})
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+            await asyncio.sleep(0.005)
+            state["now"] -= 1
+            return httpx.Response(404)
+
+        async with http_client.create_client(transport=httpx.MockTransport(upstream)) as client:
+            # Two callers, each allowed 4 at a time, still share the host's 2
+            results = await asyncio.gather(
+                scraper.get_property_details([f"ref-{i}" for i in range(6)], concurrency=4, client=client),
+                scraper.get_property_details([f"ref-{i}" for i in range(6, 12)], concurrency=4, client=client),
+            )
+
+        self.assertLessEqual(state["peak"], 2)
+        # ref-1 was throttled once, retried, and ended like the others
+        self.assertEqual(results[0][1]["ref-1"], "Property not found")
+        stats = scraper.upstream_scheduler.for_url(scraper.LISTING_URL).stats()
+        self.assertEqual(stats["retries"], 1)
+        self.assertEqual(stats["throttled"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,18 +1,53 @@
-import asyncio
-from scraper import get_properties
-
-async def main():
-    print("Testing Scraper...")
-    try:
-        props = await get_properties()
-        print(f"\nSuccessfully scraped {len(props)} properties!")
-        for p in props[:3]:
-            print(f"\nID: {p.id}")
-            print(f"Title: {p.title}")
-            print(f"Price: {p.price}")
-            print(f"Image: {p.image_url}")
-    except Exception as e:
-        print(f"Error: {e}")
-
-if __name__ == "__main__":
-    asyncio.run(main())
+import time
+import unittest
+import httpx
+from api.standin import create_app, standin_client
+from api.scraper import get_properties, get_property_detail, refresh_property_detail
+
+# Runs against the local stand-in (api/standin.py), never the live site
+
+class TestScraper(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = standin_client()
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_listing(self):
+        props = await get_properties(client=self.client)
+        self.assertEqual(len(props), 8)
+        self.assertEqual(props[0].id, "ref-3450")
+        self.assertTrue(props[0].price)
+        self.assertTrue(props[0].image_url.startswith("http"))
+
+    async def test_detail_coordinates(self):
+        detail = await get_property_detail("ref-1052", client=self.client)
+        self.assertEqual(detail.id, "ref-1052")
+        self.assertIsNotNone(detail.latitude)
+        self.assertIsNotNone(detail.longitude)
+        self.assertIsNone(await get_property_detail("ref-0000", client=self.client))
+
+    async def test_conditional_refresh(self):
+        first = await refresh_property_detail("ref-3450", client=self.client)
+        again = await refresh_property_detail("ref-3450", first.validators, client=self.client)
+        self.assertEqual((first.status, again.status), ("parsed", "not_modified"))
+
+class TestStandin(unittest.IsolatedAsyncioTestCase):
+    async def test_inflated_catalogue_has_every_detail(self):
+        async with standin_client(rows=50) as client:
+            props = await get_properties(client=client)
+            detail = await get_property_detail(props[-1].id, client=client)
+        self.assertGreater(len(props), 30)
+        self.assertEqual(detail.id, props[-1].id)
+
+    async def test_latency_and_hits(self):
+        app = create_app(latency=0.05, jitter=0.01, seed=1)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://upstream.test") as client:
+            started = time.perf_counter()
+            await client.get("/es/venta_o_alquiler")
+            elapsed = time.perf_counter() - started
+        self.assertGreaterEqual(elapsed, 0.04)
+        self.assertEqual(app.state.hits["listing"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+from api import index
+from api.search import SearchIndex, document_text, fold, stem, tokenize
+from api.store import PropertyStore
+from api.test_helpers import isolate_app, make_detail, make_property
+
+DETAILS = [
+    make_detail("ref-1", title="Ático en Salamanca, Madrid", description="Ático con terraza y piscina comunitaria.",
+                features={"Piscina": "Sí", "Ascensor": "Sí"}),
+    make_detail("ref-2", title="Chalet en La Moraleja", description="Chalet con jardín, piscinas y pista de pádel.",
+                features={"Piscina": "Privada"}),
+    make_detail("ref-3", title="Piso en Chamberí", description="Piso luminoso con dos terrazas.",
+                features={"Piscina": "No", "Terraza": "Sí"}),
+]
+
+def make_index() -> SearchIndex:
+    search = SearchIndex()
+    for detail in DETAILS:
+        search.upsert(detail.id, document_text(detail))
+    return search
+
+class TestTokenizer(unittest.TestCase):
+    def test_folding_and_stemming(self):
+        self.assertEqual(fold("Ático Chamberí Pádel"), "atico chamberi padel")
+        self.assertEqual(stem("piscinas"), stem("piscina"))
+        self.assertEqual(stem("terrazas"), stem("terraza"))
+        self.assertEqual(tokenize("Con la piscina"), ["piscin"])
+
+class TestSearchIndex(unittest.TestCase):
+    def test_ranked_results(self):
+        search = make_index()
+        self.assertEqual([doc for doc, _ in search.search("Piscinas")], ["ref-1", "ref-2"])
+        self.assertEqual([doc for doc, _ in search.search("terraza")], ["ref-3", "ref-1"])
+        self.assertEqual([doc for doc, _ in search.search("atico salamanca")], ["ref-1"])
+        self.assertEqual(search.search("garaje"), [])
+        self.assertEqual(search.search("de la"), [])
+
+    def test_incremental_update(self):
+        search = make_index()
+        self.assertFalse(search.upsert("ref-3", document_text(DETAILS[2])))
+        search.upsert("ref-3", "Piso en Chamberí con garaje")
+        self.assertEqual([doc for doc, _ in search.search("terraza")], ["ref-1"])
+        self.assertEqual([doc for doc, _ in search.search("garaje")], ["ref-3"])
+        search.remove("ref-1")
+        self.assertEqual(search.search("terraza"), [])
+        self.assertEqual(len(search), 2)
+
+class TestSearchEndpoint(unittest.TestCase):
+    def setUp(self):
+        isolate_app(self)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = PropertyStore(os.path.join(self.tmp.name, "properties.db"))
+        self.store.replace_listing([make_property(d.id) for d in DETAILS])
+        for detail in DETAILS:
+            self.store.put_detail(detail)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_index_follows_the_store(self):
+        with mock.patch.object(index, "store", self.store), \
+                mock.patch.object(index, "search_index", SearchIndex()), \
+                mock.patch.object(index, "_search_synced", (None, 0.0)):
+            api = TestClient(index.app)
+            first = api.get("/api/search?mode=all&q=piscina").json()
+            self.store.put_detail(make_detail("ref-3", title="Piso en Chamberí", description="Con piscina climatizada."))
+            self.store.delete_detail("ref-1")
+            second = api.get("/api/search?mode=all&q=piscina").json()
+            empty = api.get("/api/search?q=")
+
+        self.assertEqual([r["id"] for r in first["results"]], ["ref-1", "ref-2"])
+        self.assertIn("score", first["results"][0])
+        self.assertEqual(sorted(r["id"] for r in second["results"]), ["ref-2", "ref-3"])
+        self.assertEqual(empty.status_code, 422)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import unittest
+import httpx
+from api import http_client, scraper
+from api.singleflight import SingleFlight
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "page"
+
+        results = await asyncio.gather(*[flight.do("url", work) for _ in range(25)])
+        self.assertEqual(results, ["page"] * 25)
+        self.assertEqual(calls, 1)
+        self.assertEqual(flight.stats(), {"executed": 1, "coalesced": 24, "in_flight": 0})
+
+        # Once finished, the next call runs again
+        await flight.do("url", work)
+        self.assertEqual(calls, 2)
+
+    async def test_errors_reach_every_waiter(self):
+        flight = SingleFlight()
+
+        async def broken():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream 502")
+
+        results = await asyncio.gather(*[flight.do("url", broken) for _ in range(3)], return_exceptions=True)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(flight.in_flight(), 0)
+
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "page"
+
+        first = asyncio.ensure_future(flight.do("url", work))
+        second = asyncio.ensure_future(flight.do("url", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual(await second, "page")
+        self.assertTrue(first.cancelled())
+
+    async def test_last_waiter_cancelling_stops_the_work(self):
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.ensure_future(flight.do("url", work))
+        await started.wait()
+        waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        self.assertEqual(flight.in_flight(), 0)
+
+class TestScraperCoalescing(unittest.IsolatedAsyncioTestCase):
+    async def test_identical_detail_requests_hit_upstream_once(self):
+        with open(os.path.join(FIXTURES, "detail_ref-3450.html"), "rb") as f:
+            page = f.read()
+        hits = 0
+
+        async def upstream(request):
+            nonlocal hits
+            hits += 1
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, content=page)
+
+        before = scraper.upstream_flights.coalesced
+        async with http_client.create_client(transport=httpx.MockTransport(upstream)) as client:
+            details = await asyncio.gather(*[scraper.get_property_detail("ref-3450", client=client) for _ in range(30)])
+        self.assertEqual(hits, 1)
+        self.assertEqual({d.price for d in details}, {"2.950.000 €"})
+        self.assertEqual(scraper.upstream_flights.coalesced - before, 29)
+
+if __name__ == '__main__':
+    unittest.main()
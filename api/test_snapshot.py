@@ -0,0 +1,218 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+import httpx
+from api import config, http_client, index, scraper
+from api.breaker import CircuitBreaker, UpstreamUnavailable
+from api.snapshot import SnapshotStore
+from api.test_helpers import FakeClock, make_detail, make_property
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+with open(os.path.join(FIXTURES, "detail_ref-3450.html"), "rb") as f:
+    DETAIL_PAGE = f.read()
+with open(os.path.join(FIXTURES, "listing.html"), "rb") as f:
+    LISTING_PAGE = f.read()
+
+CATALOGUE = [make_property("3450"), make_property("9999")]
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_probes_and_closes(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+        clock.now = 10
+        self.assertTrue(breaker.probe_due())
+        # Exactly one trial call while half-open
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, "half_open")
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.probe_due())
+
+        clock.now = 20
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+    def test_abandoned_trial_is_released(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=1, clock=clock)
+        breaker.record_failure()
+        clock.now = 1
+        self.assertTrue(breaker.allow())
+        breaker.release()
+        self.assertTrue(breaker.allow())
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "snapshot.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_survives_reopen(self):
+        snapshots = SnapshotStore(self.path)
+        snapshots.save_listing(CATALOGUE)
+        detail = make_detail("ref-3450")
+        snapshots.save_detail(detail)
+        snapshots.close()
+
+        reopened = SnapshotStore(self.path)
+        listing, saved_at = reopened.listing()
+        self.assertEqual([p.id for p in listing], ["ref-3450", "ref-9999"])
+        self.assertGreater(saved_at, 0)
+        # Decoded once per saved version
+        self.assertIs(reopened.listing()[0], listing)
+        self.assertEqual(reopened.detail("ref-3450")[0], detail)
+        self.assertIsNone(reopened.detail("ref-0000"))
+        reopened.close()
+
+class TestLatencyBudget(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.scheduler_options = scraper.upstream_scheduler.options.copy()
+        self.attempts = 0
+
+    async def asyncTearDown(self):
+        scraper.upstream_breaker.reset()
+        scraper.upstream_scheduler.reset(**self.scheduler_options)
+
+    async def test_slow_upstream_fails_fast_then_opens(self):
+        async def slow(request: httpx.Request) -> httpx.Response:
+            self.attempts += 1
+            await asyncio.sleep(5)
+            return httpx.Response(200)
+
+        scraper.upstream_scheduler.reset(max_retries=1, backoff_base=0.001)
+        with mock.patch.object(config, "UPSTREAM_LATENCY_BUDGET", 0.02), \
+                mock.patch.object(scraper, "upstream_breaker", CircuitBreaker(failure_threshold=2)) as breaker:
+            async with http_client.create_client(transport=httpx.MockTransport(slow)) as client:
+                for _ in range(2):
+                    with self.assertRaisesRegex(UpstreamUnavailable, "within"):
+                        await scraper.get_property_detail("ref-3450", client=client)
+                # Each attempt had its own budget; one failure per fetch
+                self.assertEqual(self.attempts, 4)
+                self.assertEqual(breaker.state, "open")
+                with self.assertRaisesRegex(UpstreamUnavailable, "circuit is open"):
+                    await scraper.get_property_detail("ref-3450", client=client)
+
+    async def test_queueing_does_not_count_against_the_budget(self):
+        async def steady(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.03)
+            return httpx.Response(200, content=DETAIL_PAGE)
+
+        # One request at a time: the last of six waits ~5 budgets in the queue
+        scraper.upstream_scheduler.reset(min_concurrency=1, max_concurrency=1, initial_concurrency=1)
+        with mock.patch.object(config, "UPSTREAM_LATENCY_BUDGET", 0.05), \
+                mock.patch.object(scraper, "upstream_breaker", CircuitBreaker(failure_threshold=1)) as breaker:
+            async with http_client.create_client(transport=httpx.MockTransport(steady)) as client:
+                details, errors = await scraper.get_property_details(
+                    [f"ref-{i}" for i in range(6)], concurrency=6, client=client,
+                )
+        self.assertEqual(errors, {})
+        self.assertEqual(len(details), 6)
+        self.assertEqual(breaker.state, "closed")
+
+class TestSnapshotServing(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.snapshots = SnapshotStore(os.path.join(self.tmp.name, "snapshot.db"))
+        self.breaker = scraper.upstream_breaker
+        self.breaker.reset()
+        self.scheduler_options = scraper.upstream_scheduler.options.copy()
+        scraper.upstream_scheduler.reset(max_retries=0)
+        self.patches = [
+            mock.patch.object(index, "snapshots", self.snapshots),
+            mock.patch.object(index, "_snapshot_listing", (None, [])),
+            mock.patch.object(index, "image_manifest", None),
+            mock.patch.object(config, "IMAGE_MANIFEST_PATH", ""),
+            mock.patch.object(self.breaker, "failure_threshold", 1),
+            mock.patch.object(self.breaker, "reset_timeout", 60),
+        ]
+        for patch in self.patches:
+            patch.start()
+        index.listing_cache.clear()
+        index.detail_cache.clear()
+        self.up = True
+        self.listing_hits = 0
+
+        async def upstream(request: httpx.Request) -> httpx.Response:
+            if not self.up:
+                raise httpx.ConnectError("upstream is down")
+            if str(request.url) == scraper.LISTING_URL:
+                self.listing_hits += 1
+                return httpx.Response(200, content=LISTING_PAGE)
+            return httpx.Response(200, content=DETAIL_PAGE)
+
+        http_client.set_client(http_client.create_client(transport=httpx.MockTransport(upstream)))
+        self.api = httpx.AsyncClient(transport=httpx.ASGITransport(app=index.app), base_url="http://api.test")
+
+    async def asyncTearDown(self):
+        await self.api.aclose()
+        await http_client.close_client()
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.breaker.reset()
+        scraper.upstream_scheduler.reset(**self.scheduler_options)
+        index.listing_cache.clear()
+        index.detail_cache.clear()
+        self.snapshots.close()
+        self.tmp.cleanup()
+
+    async def test_outage_serves_snapshot_then_recovers(self):
+        live = await self.api.get("/api/properties?mode=all")
+        self.assertEqual(live.status_code, 200)
+        self.assertNotIn("X-Snapshot-Age", live.headers)
+        detail = await self.api.get("/api/properties/ref-3450")
+        self.assertEqual(detail.status_code, 200)
+        self.assertNotIn("X-Snapshot-Age", detail.headers)
+
+        # Upstream goes down and the in-memory caches are gone (a restart)
+        self.up = False
+        index.listing_cache.clear()
+        index.detail_cache.clear()
+        detail = await self.api.get("/api/properties/ref-3450")
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.headers["X-Snapshot-Age"], "0")
+        self.assertEqual(self.breaker.state, "open")
+
+        listing = await self.api.get("/api/properties?mode=all")
+        self.assertEqual(listing.status_code, 200)
+        self.assertEqual(listing.json(), live.json())
+        self.assertIn("X-Snapshot-Age", listing.headers)
+        ndjson = await self.api.get("/api/properties?mode=all&format=ndjson")
+        self.assertEqual(len(ndjson.text.splitlines()), len(live.json()))
+        self.assertIn("X-Snapshot-Age", ndjson.headers)
+
+        # No snapshot to fall back on
+        missing = await self.api.get("/api/properties/ref-0001")
+        self.assertEqual(missing.status_code, 503)
+        self.assertEqual(self.listing_hits, 1)
+
+        # After the reset timeout a request still gets the snapshot and
+        # starts a background probe, which closes the circuit
+        self.up = True
+        self.breaker.opened_at -= 60
+        listing = await self.api.get("/api/properties?mode=all")
+        self.assertIn("X-Snapshot-Age", listing.headers)
+        if index._upstream_probe is not None:
+            await index._upstream_probe
+        self.assertEqual(self.listing_hits, 2)
+        self.assertEqual(self.breaker.state, "closed")
+        listing = await self.api.get("/api/properties?mode=all")
+        self.assertNotIn("X-Snapshot-Age", listing.headers)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import os
+import unittest
+import httpx
+from api import http_client, index
+from api.parsers import ListingStreamParser, parse_listing
+from api.scraper import stream_properties
+from api.test_helpers import isolate_app
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+with open(os.path.join(FIXTURES, "listing.html"), "rb") as f:
+    LISTING_PAGE = f.read()
+
+# Past the first listing row, well before the last one
+SPLIT = LISTING_PAGE.index(b"ref-3351")
+
+class GatedUpstream:
+    # Sends the first part of the listing, then waits for the test to let the rest through
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def body(self):
+        yield LISTING_PAGE[:SPLIT]
+        await self.release.wait()
+        yield LISTING_PAGE[SPLIT:]
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=self.body())
+
+class TestListingStreamParser(unittest.TestCase):
+    def test_same_rows_whatever_the_chunking(self):
+        expected = parse_listing(LISTING_PAGE, "lxml")
+        for size in (1, 64, 1024, len(LISTING_PAGE)):
+            with self.subTest(size=size):
+                parser, rows = ListingStreamParser(), []
+                for i in range(0, len(LISTING_PAGE), size):
+                    parser.feed(LISTING_PAGE[i:i + size])
+                    rows += parser.read_rows()
+                parser.close()
+                rows += parser.read_rows()
+                self.assertEqual(rows, expected)
+
+class TestStreamProperties(unittest.IsolatedAsyncioTestCase):
+    async def test_rows_arrive_before_the_page_ends(self):
+        upstream = GatedUpstream()
+        async with http_client.create_client(transport=httpx.MockTransport(upstream)) as client:
+            rows = stream_properties(client=client)
+            first = await asyncio.wait_for(anext(rows), timeout=5)
+            upstream.release.set()
+            rest = [prop async for prop in rows]
+
+        self.assertEqual(first.id, "ref-3450")
+        self.assertEqual(len(rest), 7)
+
+class TestNdjsonEndpoint(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        isolate_app(self)
+        index.listing_cache.clear()
+        self.upstream = GatedUpstream()
+        self.upstream.release.set()
+        http_client.set_client(http_client.create_client(transport=httpx.MockTransport(self.upstream)))
+        self.api = httpx.AsyncClient(transport=httpx.ASGITransport(app=index.app), base_url="http://api.test")
+
+    async def asyncTearDown(self):
+        await self.api.aclose()
+        await http_client.close_client()
+
+    async def test_filters_applied_inline(self):
+        response = await self.api.get("/api/properties?mode=all&format=ndjson")
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        # Same rows as the JSON array, rentals dropped
+        self.assertEqual(len(rows), 7)
+        self.assertNotIn("ref-2201", [row["id"] for row in rows])
+
+        limited = await self.api.get("/api/properties?format=ndjson&limit=2")
+        self.assertEqual([json.loads(line)["id"] for line in limited.text.splitlines()], ["ref-3450", "ref-3492"])
+
+    async def test_sort_is_rejected(self):
+        response = await self.api.get("/api/properties?format=ndjson&sort=price_asc")
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,10 @@
 import re
+from typing import Optional
+try:
+    from .config import BASE_URL
+except ImportError:
+    # Imported as a top-level module (api/ on sys.path), as the older tests do
+    from config import BASE_URL
 
 def clean_description(text: str) -> str:
     if not text: return ""
@@ -12,3 +18,52 @@ def clean_description(text: str) -> str:
     text = re.sub(r'[ \t]+', ' ', text)
     
     return text.strip()
+
+def get_clean_image_url(src: str) -> str:
+    if not src: return ""
+    
+    # Ensure absolute URL
+    if not src.startswith("http"):
+        src = f"https:{src}" if src.startswith("//") else f"{BASE_URL}{src}"
+    
+    # Watermark Removal Logic
+    # 1. Strip common suffixes to get to the base filename
+    src = src.replace("-large.jpg", ".jpg")
+    src = src.replace("-thumb.jpg", ".jpg")
+    src = src.replace("-large.png", ".png")
+    src = src.replace("-thumb.png", ".png")
+    
+    # 2. Inject -original to access the clean version
+    # Avoid double -original
+    if "-original" not in src:
+         if src.lower().endswith(".jpg"):
+             src = src[:-4] + "-original.jpg"
+         elif src.lower().endswith(".jpeg"):
+             src = src[:-5] + "-original.jpeg"
+         elif src.lower().endswith(".png"):
+             src = src[:-4] + "-original.png"
+             
+    return src
+
+def parse_spanish_number(text: str) -> Optional[float]:
+    # "1.250.000" -> 1250000, "245,5" -> 245.5, "Consultar" -> None
+    if not text: return None
+    match = re.search(r'\d[\d.]*(?:,\d+)?', text)
+    if not match: return None
+    number = match.group(0).rstrip(".")
+    integer, _, decimals = number.partition(",")
+    integer = integer.replace(".", "")
+    try:
+        return float(f"{integer}.{decimals}" if decimals else integer)
+    except ValueError:
+        return None
+
+def parse_price_eur(price: str) -> Optional[int]:
+    if not price or "consultar" in price.lower(): return None
+    value = parse_spanish_number(price)
+    return int(value) if value is not None else None
+
+def parse_count(text: str) -> Optional[int]:
+    if not text: return None
+    match = re.search(r'\d+', text)
+    return int(match.group(0)) if match else None
@@ -0,0 +1,44 @@
+"""Detail parser benchmark on the saved detail pages.
+
+Compares the original multi-scan html5lib extractor with the single-pass
+lxml extractor on every api/fixtures/detail_*.html page.
+
+    python -m benchmarks.bench_detail_parser --number 20
+"""
+import argparse
+import glob
+import os
+import timeit
+
+from api.parsers import parse_detail
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "api", "fixtures")
+
+def load_pages():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "detail_*.html"))):
+        prop_id = os.path.basename(path)[len("detail_"):-len(".html")]
+        with open(path, "rb") as f:
+            pages.append((prop_id, f.read()))
+    return pages
+
+def main(number: int, repeat: int):
+    pages = load_pages()
+    for prop_id, page in pages:
+        timings = {}
+        for backend in ("html5lib", "lxml"):
+            runs = timeit.repeat(lambda: parse_detail(page, prop_id, backend), number=number, repeat=repeat)
+            timings[backend] = min(runs) / number
+        print(
+            f"{prop_id:10s} {len(page) / 1024:5.1f} KiB  "
+            f"html5lib {timings['html5lib'] * 1000:7.3f} ms  "
+            f"lxml {timings['lxml'] * 1000:7.3f} ms  "
+            f"{timings['html5lib'] / timings['lxml']:5.1f}x"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.number, args.repeat)
@@ -0,0 +1,53 @@
+"""Map query benchmark on a synthetic catalogue spread over Spain.
+
+Times bounding-box and radius queries on the grid index against a linear
+scan of every point, for growing catalogue sizes.
+
+    python -m benchmarks.bench_geo --sizes 1000 10000 100000
+"""
+import argparse
+import random
+import timeit
+
+from api.geo import GeoIndex, haversine_km
+
+# Madrid, Barcelona, Marbella, Valencia, Mallorca
+CITIES = [(40.42, -3.70), (41.39, 2.17), (36.51, -4.88), (39.47, -0.38), (39.57, 2.65)]
+
+def make_points(n: int, seed: int = 1):
+    rng = random.Random(seed)
+    points = []
+    for i in range(n):
+        lat, lon = rng.choice(CITIES)
+        points.append((f"ref-{i}", lat + rng.gauss(0, 0.15), lon + rng.gauss(0, 0.15)))
+    return points
+
+def main(sizes, number: int):
+    # A city-district viewport and a 2 km search around central Madrid
+    bbox = (-3.72, 40.40, -3.68, 40.44)
+    center, radius = (40.42, -3.70), 2.0
+    for n in sizes:
+        points = make_points(n)
+        index = GeoIndex()
+        for prop_id, lat, lon in points:
+            index.upsert(prop_id, lat, lon)
+
+        west, south, east, north = bbox
+        scan_bbox = lambda: [p for p in points if south <= p[1] <= north and west <= p[2] <= east]
+        scan_radius = lambda: [p for p in points if haversine_km(center[0], center[1], p[1], p[2]) <= radius]
+        timings = {
+            "bbox grid": min(timeit.repeat(lambda: index.bbox(*bbox), number=number, repeat=3)),
+            "bbox scan": min(timeit.repeat(scan_bbox, number=1, repeat=3)) * number,
+            "radius grid": min(timeit.repeat(lambda: index.radius(*center, radius), number=number, repeat=3)),
+            "radius scan": min(timeit.repeat(scan_radius, number=1, repeat=3)) * number,
+        }
+        print(f"{n:7d} points  " + "  ".join(
+            f"{name} {t / number * 1000:8.3f} ms" for name, t in timings.items()
+        ))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+    main(args.sizes, args.number)
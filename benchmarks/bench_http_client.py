@@ -0,0 +1,110 @@
+"""Handshake savings of the pooled client under concurrent detail requests.
+
+Starts a local HTTPS stand-in (self-signed cert via the openssl CLI, plain
+HTTP if openssl is unavailable) and compares one AsyncClient per request,
+the old scraper behaviour, with the shared pooled client.
+
+    python -m benchmarks.bench_http_client --requests 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import time
+
+import httpx
+
+from api.http_client import create_client
+
+BODY = b"<html><body>" + b"<div class='IDPrecioBig'>1.500.000 &euro;</div>" * 200 + b"</body></html>"
+
+class StandIn:
+    def __init__(self):
+        self.connections = 0
+        self.server = None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                if not head:
+                    break
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n"
+                    + f"Content-Length: {len(BODY)}\r\n\r\n".encode()
+                    + BODY
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, ssl_context):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0, ssl=ssl_context)
+        return self.server.sockets[0].getsockname()[1]
+
+def make_ssl_context(workdir: str):
+    if not shutil.which("openssl"):
+        return None
+    cert = os.path.join(workdir, "cert.pem")
+    key = os.path.join(workdir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+async def run_per_request(url: str, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            async with httpx.AsyncClient(timeout=30.0, verify=False) as client:
+                (await client.get(f"{url}/ref-{i}")).raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    return time.perf_counter() - start
+
+async def run_pooled(url: str, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    async with create_client(verify=False) as client:
+        async def one(i: int):
+            async with semaphore:
+                (await client.get(f"{url}/ref-{i}")).raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(total)])
+        return time.perf_counter() - start
+
+async def main(total: int, concurrency: int):
+    with tempfile.TemporaryDirectory() as workdir:
+        ssl_context = make_ssl_context(workdir)
+        scheme = "https" if ssl_context else "http"
+
+        for label, runner in (("client per request", run_per_request), ("shared pooled client", run_pooled)):
+            standin = StandIn()
+            port = await standin.start(ssl_context)
+            url = f"{scheme}://127.0.0.1:{port}/es/venta_o_alquiler"
+            elapsed = await runner(url, total, concurrency)
+            standin.server.close()
+            await standin.server.wait_closed()
+            print(
+                f"{label:22s} {scheme}  {total} requests  {elapsed * 1000:8.1f} ms  "
+                f"{total / elapsed:8.1f} req/s  {standin.connections:4d} connections"
+            )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,33 @@
+"""Listing parser micro-benchmark: html5lib reference vs lxml single pass.
+
+Inflates the recorded listing fixture to a catalogue of --rows rows and
+times parse_listing for each backend.
+
+    python -m benchmarks.bench_listing_parser --rows 600
+"""
+import argparse
+import timeit
+
+from api import standin
+from api.parsers import parse_listing
+
+def inflate_listing(rows: int) -> bytes:
+    listing, _ = standin.load_corpus()
+    return standin.inflate_listing(listing, rows)
+
+def main(rows: int, repeat: int):
+    page = inflate_listing(rows)
+    print(f"listing: {rows} rows, {len(page) / 1024:.0f} KiB")
+    baseline = None
+    for backend in ("html5lib", "lxml"):
+        parsed = len(parse_listing(page, backend))
+        best = min(timeit.repeat(lambda: parse_listing(page, backend), number=1, repeat=repeat))
+        baseline = baseline or best
+        print(f"{backend:9s} {best * 1000:8.2f} ms  {parsed} properties  {baseline / best:5.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
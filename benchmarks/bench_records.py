@@ -0,0 +1,71 @@
+"""Listing record benchmark: pydantic models vs dataclasses + orjson.
+
+Parses an inflated listing once, then builds the catalogue's records and
+serializes the mode=all body both ways. "pydantic" is the previous path:
+a BaseModel validated per row, dumped through a TypeAdapter. Allocation is
+the memory still held per row after building the records (tracemalloc).
+
+    python -m benchmarks.bench_records --rows 5000
+"""
+import argparse
+import dataclasses
+import timeit
+import tracemalloc
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter, create_model
+
+from api.parsers import parse_listing
+from api.scraper import Property
+from benchmarks.bench_listing_parser import inflate_listing
+
+# Same fields and defaults as Property, as the BaseModel it used to be
+PydanticProperty = create_model("PydanticProperty", **{
+    f.name: (f.type, ... if f.default is dataclasses.MISSING else f.default)
+    for f in dataclasses.fields(Property)
+})
+PYDANTIC_LIST = TypeAdapter(List[PydanticProperty])
+
+def held_per_row(build, rows) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build(rows)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del records
+    return held / len(rows)
+
+def main(rows: int, repeat: int):
+    parsed = parse_listing(inflate_listing(rows))
+    print(f"catalogue: {len(parsed)} rows")
+
+    def build_pydantic(rows):
+        return [PydanticProperty(**row) for row in rows]
+
+    def build_records(rows):
+        return [Property(**row) for row in rows]
+
+    cases = [
+        ("pydantic", build_pydantic, PYDANTIC_LIST.dump_json),
+        ("dataclass", build_records, orjson.dumps),
+    ]
+    baseline = None
+    print(f"{'':10s} {'build ms':>9s} {'bytes/row':>10s} {'serialize ms':>13s} {'total ms':>9s}")
+    for name, build, serialize in cases:
+        records = build(parsed)
+        build_s = min(timeit.repeat(lambda: build(parsed), number=1, repeat=repeat))
+        serialize_s = min(timeit.repeat(lambda: serialize(records), number=1, repeat=repeat))
+        total = build_s + serialize_s
+        baseline = baseline or total
+        print(f"{name:10s} {build_s * 1000:9.2f} {held_per_row(build, parsed):10.0f} "
+              f"{serialize_s * 1000:13.2f} {total * 1000:9.2f}  {baseline / total:4.1f}x")
+    # Both paths must produce the same body
+    assert orjson.dumps(build_records(parsed)) == PYDANTIC_LIST.dump_json(build_pydantic(parsed))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,94 @@
+"""Full-text search benchmark on a synthetic catalogue.
+
+Builds documents from sentences and features of the saved detail pages,
+random amenities and neighbourhoods, padded with filler words so the
+vocabulary grows with the catalogue, then times index build, incremental updates
+and query latency on the inverted index against a linear scan of the
+folded texts (what the client does today).
+
+    python -m benchmarks.bench_search --docs 5000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from api.parsers import parse_detail
+from api.scraper import PropertyDetail
+from api.search import SearchIndex, document_text, fold
+from benchmarks.bench_detail_parser import load_pages
+
+NEIGHBOURHOODS = [
+    "Salamanca", "Chamberí", "Retiro", "La Moraleja", "Pozuelo", "Aravaca",
+    "Chamartín", "Justicia", "Almagro", "El Viso", "Sotogrande", "Marbella",
+]
+EXTRAS = [
+    "piscina", "terraza", "jardín", "garaje", "trastero", "ascensor", "portería",
+    "chimenea", "vistas", "gimnasio", "bodega", "domótica", "pádel",
+]
+QUERIES = ["piscina", "terraza Salamanca", "ático con vistas", "garaje trastero", "chalet jardín piscina"]
+
+def make_documents(n: int, seed: int = 1):
+    rng = random.Random(seed)
+    sentences, features = [], []
+    for prop_id, page in load_pages():
+        detail = parse_detail(page, prop_id)
+        sentences += [s for s in detail["description"].replace("\n", " ").split(". ") if s]
+        features += list(detail["features"].items())
+    filler = [f"palabra{i}" for i in range(3000)]
+    docs = []
+    for i in range(n):
+        detail = PropertyDetail(
+            id=f"ref-{i}",
+            title=f"{rng.choice(['Piso', 'Ático', 'Chalet', 'Dúplex'])} en {rng.choice(NEIGHBOURHOODS)}, Madrid",
+            description=". ".join(rng.sample(sentences, min(len(sentences), 2)))
+            + " Con " + ", ".join(rng.sample(EXTRAS, 2)) + ". " + " ".join(rng.sample(filler, 40)),
+            price="1.000.000 €",
+            images=[],
+            features=dict(rng.sample(features, min(len(features), 3))),
+        )
+        docs.append((detail.id, document_text(detail)))
+    return docs
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+def main(n: int, rounds: int):
+    docs = make_documents(n)
+
+    started = time.perf_counter()
+    index = SearchIndex()
+    for doc_id, text in docs:
+        index.upsert(doc_id, text)
+    print(f"build {n} docs: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    started = time.perf_counter()
+    for doc_id, text in docs[:100]:
+        index.upsert(doc_id, text + " Reformado.")
+    print(f"update: {(time.perf_counter() - started) * 1000 / 100:.3f} ms per document")
+
+    folded = [(doc_id, fold(text)) for doc_id, text in docs]
+    for query in QUERIES:
+        words = fold(query).split()
+        indexed, scanned = [], []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            hits = index.search(query, limit=20)
+            indexed.append(time.perf_counter() - started)
+        for _ in range(max(1, rounds // 20)):
+            started = time.perf_counter()
+            [doc_id for doc_id, text in folded if all(w in text for w in words)]
+            scanned.append(time.perf_counter() - started)
+        print(
+            f"{query:24s} {len(index.search(query)):5d} hits  "
+            f"index p50 {percentile(indexed, 0.5) * 1000:6.3f} ms  p99 {percentile(indexed, 0.99) * 1000:6.3f} ms  "
+            f"scan p50 {statistics.median(scanned) * 1000:7.3f} ms"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    main(args.docs, args.rounds)
@@ -0,0 +1,80 @@
+"""Time to first row and peak memory: JSON array vs format=ndjson.
+
+Serves an inflated listing from a fake upstream that trickles the page
+in 16 KiB chunks, and calls /api/properties?mode=all on the ASGI app
+directly (httpx's ASGITransport buffers the whole body) in both formats.
+
+    python -m benchmarks.bench_stream --rows 5000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import httpx
+
+from api import http_client, index
+from benchmarks.bench_listing_parser import inflate_listing
+
+CHUNK = 16 * 1024
+
+def upstream(page: bytes, delay: float):
+    async def body():
+        for i in range(0, len(page), CHUNK):
+            await asyncio.sleep(delay)
+            yield page[i:i + CHUNK]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=body())
+    return handler
+
+async def call(path: str, query: str):
+    # Minimal ASGI driver: time when the first and last body chunks are sent
+    started = time.perf_counter()
+    timings = {"first": None, "size": 0}
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "headers": [(b"host", b"api.test")], "server": ("api.test", 80), "client": ("127.0.0.1", 1234),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            if timings["first"] is None:
+                timings["first"] = time.perf_counter() - started
+            timings["size"] += len(message["body"])
+
+    await index.app(scope, receive, send)
+    return timings["first"], time.perf_counter() - started, timings["size"]
+
+async def measure(page: bytes, delay: float, fmt: str):
+    index.listing_cache.clear()
+    http_client.set_client(http_client.create_client(transport=httpx.MockTransport(upstream(page, delay))))
+    tracemalloc.start()
+    try:
+        first, total, size = await call("/api/properties", f"mode=all&format={fmt}")
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        await http_client.close_client()
+    return first, total, peak, size
+
+async def main(rows: int, delay: float):
+    page = inflate_listing(rows)
+    print(f"listing: {rows} rows, {len(page) / 1024:.0f} KiB, {delay * 1000:.0f} ms per {CHUNK // 1024} KiB chunk")
+    for fmt in ("json", "ndjson"):
+        first, total, peak, size = await measure(page, delay, fmt)
+        print(
+            f"{fmt:7s} first byte {first * 1000:8.1f} ms  total {total * 1000:8.1f} ms  "
+            f"peak traced memory {peak / 1024 / 1024:6.1f} MiB  body {size / 1024:.0f} KiB"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--delay", type=float, default=0.002)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.delay))
@@ -0,0 +1,97 @@
+"""Cold-start import profile of the serverless entry point (api/index.py).
+
+Imports the app in fresh interpreters, reports the median import time and
+the slowest modules (python -X importtime), and exits non-zero when the
+median is over --max-ms or when a module that must stay lazy was imported.
+
+    python -m benchmarks.import_time                    # default budget
+    python -m benchmarks.import_time --max-ms 300 --runs 15 --top 25
+    PROPERTY_STORE_PATH=x.db python -m benchmarks.import_time --allow sqlite3
+
+Only the import is measured: the interpreter's own startup is the same for
+every commit and the first request's work shows up in benchmarks/suite.py.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+MODULE = "api.index"
+
+# Imported on first use only: parsers, images, the crawler and snapshot
+# stores (and sqlite3 with them), the process pool and the dev-only packages
+LAZY_MODULES = ("lxml", "bs4", "html5lib", "PIL", "requests", "uvicorn", "multiprocessing", "api.store",
+                "api.snapshot", "sqlite3")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"ms": elapsed * 1000, "modules": sorted(sys.modules)}}))
+"""
+
+def measure(runs: int) -> Tuple[List[float], List[str]]:
+    samples, modules = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=MODULE)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        samples.append(result["ms"])
+        modules = result["modules"]
+    return samples, modules
+
+def slowest_modules(top: int) -> List[Tuple[str, float, float]]:
+    # (module, self ms, cumulative ms) from one -X importtime run
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        capture_output=True, text=True, check=True,
+    ).stderr
+    rows: Dict[str, Tuple[float, float]] = {}
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows[name.strip()] = (int(own) / 1000, int(cumulative) / 1000)
+    ranked = sorted(rows.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return [(name, own, cumulative) for name, (own, cumulative) in ranked]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Profile the API's cold-start imports")
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument("--max-ms", type=float, default=450.0,
+                        help="fail when the median import time is above this")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list (by self time)")
+    parser.add_argument("--allow", action="append", default=[], help="lazy module allowed this time")
+    args = parser.parse_args(argv)
+
+    samples, modules = measure(args.runs)
+    median = statistics.median(samples)
+    print(f"import {MODULE}: median {median:.0f} ms, min {min(samples):.0f} ms, "
+          f"max {max(samples):.0f} ms over {args.runs} runs, {len(modules)} modules loaded")
+
+    print(f"\n{'module':48} {'self ms':>9} {'cumul ms':>9}")
+    for name, own, cumulative in slowest_modules(args.top):
+        print(f"{name:48} {own:9.1f} {cumulative:9.1f}")
+
+    failed = False
+    eager = [
+        lazy for lazy in LAZY_MODULES if lazy not in args.allow
+        and any(name == lazy or name.startswith(lazy + ".") for name in modules)
+    ]
+    if eager:
+        print(f"\nFAIL: imported at startup but meant to load on first use: {', '.join(eager)}")
+        failed = True
+    if median > args.max_ms:
+        print(f"\nFAIL: median import time {median:.0f} ms is over the {args.max_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print(f"\nOK: within the {args.max_ms:.0f} ms budget")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
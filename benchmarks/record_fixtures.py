@@ -0,0 +1,48 @@
+"""Record the upstream listing and detail pages into the fixture corpus.
+
+    python -m benchmarks.record_fixtures --details 20 --out api/fixtures
+
+Writes listing.html and detail_<id>.html, the files api/standin.py serves.
+This is the only script meant to touch the live site (or whatever
+UPSTREAM_BASE_URL points at).
+"""
+import argparse
+import asyncio
+import os
+
+from api.http_client import create_client
+from api.parsers import parse_listing
+from api.scraper import HEADERS, LISTING_URL
+from api.standin import FIXTURES
+
+async def main(details: int, out: str, concurrency: int):
+    os.makedirs(out, exist_ok=True)
+    async with create_client() as client:
+        response = await client.get(LISTING_URL, headers=HEADERS)
+        response.raise_for_status()
+        with open(os.path.join(out, "listing.html"), "wb") as f:
+            f.write(response.content)
+        prop_ids = [row["id"] for row in parse_listing(response.content)][:details]
+        print(f"listing.html: {len(response.content) / 1024:.0f} KiB, recording {len(prop_ids)} details")
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def record(prop_id: str):
+            async with semaphore:
+                detail = await client.get(f"{LISTING_URL}/{prop_id}", headers=HEADERS)
+            if detail.status_code != 200:
+                print(f"{prop_id}: HTTP {detail.status_code}, skipped")
+                return
+            with open(os.path.join(out, f"detail_{prop_id}.html"), "wb") as f:
+                f.write(detail.content)
+            print(f"detail_{prop_id}.html: {len(detail.content) / 1024:.0f} KiB")
+
+        await asyncio.gather(*[record(prop_id) for prop_id in prop_ids])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--details", type=int, default=20)
+    parser.add_argument("--out", default=FIXTURES)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.details, args.out, args.concurrency))
@@ -0,0 +1,172 @@
+"""Benchmark suite: parsers and end-to-end API calls against the local stand-in.
+
+Reports throughput and p50/p99 latency for each case and saves the results
+as JSON, so runs can be compared across commits.
+
+    python -m benchmarks.suite                          # writes benchmarks/results/<commit>.json
+    python -m benchmarks.suite --latency 0.05 --jitter 0.02 --rows 2000
+    python -m benchmarks.suite --compare benchmarks/results/abc1234.json
+
+Upstream is always api/standin.py in-process; nothing touches the live site.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import httpx
+
+from api import config, http_client, index, scraper
+from api.parsers import parse_detail, parse_listing
+from api.standin import inflate_listing, load_corpus, standin_client
+
+RESULTS = os.path.join(os.path.dirname(__file__), "results")
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+def summarize(samples: List[float], wall: float) -> Dict[str, float]:
+    return {
+        "runs": len(samples),
+        "throughput_per_s": len(samples) / wall if wall else 0.0,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+def bench_sync(fn: Callable[[int], object], runs: int) -> Dict[str, float]:
+    fn(0)  # warm-up
+    samples = []
+    started = time.perf_counter()
+    for i in range(runs):
+        t = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t)
+    return summarize(samples, time.perf_counter() - started)
+
+async def bench_async(fn: Callable[[int], object], runs: int) -> Dict[str, float]:
+    await fn(0)  # warm-up
+    samples = []
+    started = time.perf_counter()
+    for i in range(runs):
+        t = time.perf_counter()
+        await fn(i)
+        samples.append(time.perf_counter() - t)
+    return summarize(samples, time.perf_counter() - started)
+
+async def run_suite(args) -> Dict[str, Dict[str, float]]:
+    listing, details = load_corpus()
+    page = inflate_listing(listing, args.rows)
+    detail_pages = sorted(details.items())
+    results = {}
+
+    results["listing_parse"] = bench_sync(lambda i: parse_listing(page), args.runs)
+    results["detail_parse"] = bench_sync(
+        lambda i: parse_detail(detail_pages[i % len(detail_pages)][1], detail_pages[i % len(detail_pages)][0]),
+        args.runs * 5,
+    )
+
+    scraper.upstream_scheduler.reset(rate=args.upstream_rate)
+    http_client.set_client(standin_client(latency=args.latency, jitter=args.jitter, rows=args.rows, seed=1))
+    api = httpx.AsyncClient(transport=httpx.ASGITransport(app=index.app), base_url="http://api.test")
+    try:
+        ids = [p["id"] for p in (await api.get("/api/properties?mode=all")).json()]
+
+        async def listing_cold(i):
+            index.listing_cache.clear()
+            (await api.get("/api/properties?mode=all")).raise_for_status()
+
+        async def listing_warm(i):
+            (await api.get("/api/properties?mode=all&sort=price_desc&limit=50")).raise_for_status()
+
+        async def detail(i):
+            (await api.get(f"/api/properties/{ids[i % len(ids)]}")).raise_for_status()
+
+        async def batch(i):
+            chunk = [ids[(i * 10 + k) % len(ids)] for k in range(10)]
+            (await api.get("/api/properties/batch?ids=" + ",".join(chunk))).raise_for_status()
+
+        results["api_listing_cold"] = await bench_async(listing_cold, args.runs)
+        results["api_listing_warm"] = await bench_async(listing_warm, args.runs * 5)
+        results["api_detail"] = await bench_async(detail, args.runs)
+        results["api_batch_10"] = await bench_async(batch, max(1, args.runs // 2))
+
+        if args.prefetch:
+            # A click on one of the first cards, once the listing's prefetch is done
+            config.PREFETCH_TOP_N = args.prefetch
+            index.detail_cache.clear()
+            (await api.get(f"/api/properties?mode=all&limit={args.prefetch}")).raise_for_status()
+            await index.detail_prefetcher.join()
+
+            async def detail_prefetched(i):
+                (await api.get(f"/api/properties/{ids[i % args.prefetch]}")).raise_for_status()
+
+            results["api_detail_prefetched"] = await bench_async(detail_prefetched, args.runs)
+    finally:
+        await api.aclose()
+        await http_client.close_client()
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]] = None):
+    for name, r in results.items():
+        line = (
+            f"{name:22s} {r['throughput_per_s']:9.1f}/s  "
+            f"p50 {r['p50_ms']:8.3f} ms  p99 {r['p99_ms']:8.3f} ms"
+        )
+        old = (baseline or {}).get(name)
+        if old:
+            line += f"  p50 {r['p50_ms'] / old['p50_ms']:5.2f}x  p99 {r['p99_ms'] / old['p99_ms']:5.2f}x vs baseline"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=500, help="listing size served by the stand-in")
+    parser.add_argument("--latency", type=float, default=0.0, help="stand-in latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--upstream-rate", type=float, default=0.0,
+                        help="scheduler requests/s per host; 0 (default) times the API, not the politeness limit")
+    parser.add_argument("--prefetch", type=int, default=4,
+                        help="PREFETCH_TOP_N for the api_detail_prefetched case (0 skips it)")
+    parser.add_argument("--output", help="JSON file to write (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_suite(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {
+                "commit": commit,
+                "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "params": {k: getattr(args, k) for k in ("runs", "rows", "latency", "jitter")},
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"saved {output}")
+
+if __name__ == "__main__":
+    main()
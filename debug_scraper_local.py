@@ -1,9 +1,15 @@
-
+import argparse
 import asyncio
+from api import http_client
 from api.scraper import get_properties
+from api.standin import standin_client
+
+# Runs against the recorded pages (api/standin.py) unless --live is given.
 
-async def main():
-    print("Fetching properties with html.parser...")
+async def main(live: bool):
+    print("Fetching properties...")
+    if not live:
+        http_client.set_client(standin_client())
     try:
         props = await get_properties()
         print(f"Found {len(props)} properties.")
@@ -11,6 +17,10 @@ async def main():
             print(f"ID: {p.id}, Title: {p.title}")
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        await http_client.close_client()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", action="store_true", help="hit the real upstream site")
+    asyncio.run(main(parser.parse_args().live))
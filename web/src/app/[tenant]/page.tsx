@@ -6,6 +6,8 @@ import { useParams } from "next/navigation";
 import { Property } from "@/types/property";
 import { PropertyCard } from "@/components/PropertyCard";
 
+const PAGE_SIZE = 24;
+
 export default function Home() {
   const params = useParams();
   const tenant = params.tenant as string;
@@ -21,96 +23,68 @@ export default function Home() {
   const [maxPrice, setMaxPrice] = useState("");
   const [sortOrder, setSortOrder] = useState<'asc' | 'desc'>('asc');
 
-  const filteredProperties = useMemo(() => {
-    return properties.filter(prop => {
-      // 1. Exclude Rentals explicitly
-      // Use normalization to handle accents (Ático -> Atico)
-      const cleanTitle = prop.title?.toLowerCase().normalize("NFD").replace(/[\u0300-\u036f]/g, "") || "";
-      const cleanPrice = prop.price?.toLowerCase() || "";
-
-      if (cleanTitle.includes("alquiler")) return false;
-      if (cleanPrice.includes("/mes") || cleanPrice.includes("mensual")) return false;
-
-      const parsePrice = (priceStr: string) => {
-        if (!priceStr || priceStr.toLowerCase().includes("consultar")) return -1;
-        const num = parseInt(priceStr.replace(/[^0-9]/g, ''));
-        return isNaN(num) ? -1 : num;
-      };
-
-      const price = parsePrice(prop.price);
-
-      // 2. Strict Price Filter: No houses < 1.000.000€
-      // Note: "Consultar" properties (price == -1) are kept unless filtered by min/max manually?
-      // User said "NO se muestren casas con precio inferior a 1.000.000".
-      // Usually "Consultar" implies high price, so we keep them unless logic dictates otherwise.
-      if (price !== -1 && price < 1000000) return false;
-
-      // 3. User Interface Filter (Min/Max)
-      const cleanMin = minPrice.replace(/\./g, '');
-      const cleanMax = maxPrice.replace(/\./g, '');
-      const min = cleanMin ? parseInt(cleanMin) : 0;
-      const max = cleanMax ? parseInt(cleanMax) : Infinity;
-
-      if (price === -1) {
-        // If price is hidden, we usually show it unless user sets a specific max filter that might exclude it?
-        // Let's keep "Consultar" visible unless user tries to filter strictly.
-        if (minPrice || maxPrice) return false;
-        return true;
-      }
-
-      return price >= min && price <= max;
-    }).sort((a, b) => {
-      const getVal = (p: string) => {
-        if (!p || p.toLowerCase().includes("consultar")) return sortOrder === 'asc' ? Infinity : -Infinity;
-        const num = parseInt(p.replace(/[^0-9]/g, ''));
-        return isNaN(num) ? (sortOrder === 'asc' ? Infinity : -Infinity) : num;
-      };
-
-      const valA = getVal(a.price);
-      const valB = getVal(b.price);
-
-      return sortOrder === 'asc' ? valA - valB : valB - valA;
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [prefsLoaded, setPrefsLoaded] = useState(false);
+
+  // Filtering, sorting and paging happen server-side on the normalized price_eur.
+  // No houses < 1.000.000€ (price_floor); "Consultar" listings are kept unless
+  // the user sets a min/max.
+  const query = useMemo(() => {
+    const params = new URLSearchParams({
+      mode: filterMode,
+      sort: sortOrder === 'asc' ? 'price_asc' : 'price_desc',
+      price_floor: "1000000",
+      limit: String(PAGE_SIZE),
     });
-  }, [properties, minPrice, maxPrice, sortOrder]);
-
-  // Effect to load state from session storage on mount/tenant change
+    const cleanMin = minPrice.replace(/\./g, '');
+    const cleanMax = maxPrice.replace(/\./g, '');
+    if (cleanMin) params.set("min_price", cleanMin);
+    if (cleanMax) params.set("max_price", cleanMax);
+    return params.toString();
+  }, [filterMode, sortOrder, minPrice, maxPrice]);
+
+  // Effect to load UI state from session storage on mount/tenant change
   useEffect(() => {
-    const cacheKeyProps = `properties-v2-${filterMode}`;
-    const cacheKeySort = `prefs-sort-${tenant}`;
-    const cacheKeyMin = `prefs-min-${tenant}`;
-    const cacheKeyMax = `prefs-max-${tenant}`;
-
-    // Restore UI State
     try {
-      const s = sessionStorage.getItem(cacheKeySort);
-      const mn = sessionStorage.getItem(cacheKeyMin);
-      const mx = sessionStorage.getItem(cacheKeyMax);
+      const s = sessionStorage.getItem(`prefs-sort-${tenant}`);
+      const mn = sessionStorage.getItem(`prefs-min-${tenant}`);
+      const mx = sessionStorage.getItem(`prefs-max-${tenant}`);
       if (s) setSortOrder(s as 'asc' | 'desc');
       if (mn) setMinPrice(mn);
       if (mx) setMaxPrice(mx);
     } catch { }
+    setPrefsLoaded(true);
+  }, [tenant]);
+
+  // Fetch the first page whenever the query changes
+  useEffect(() => {
+    if (!prefsLoaded) return;
+    const cacheKeyProps = `properties-v3-${query}`;
 
-    // Restore Properties & Fetch
     async function loadData() {
       let hasCache = false;
       try {
         const cached = sessionStorage.getItem(cacheKeyProps);
         if (cached) {
-          setProperties(JSON.parse(cached));
+          const { items, cursor } = JSON.parse(cached);
+          setProperties(items);
+          setNextCursor(cursor);
           setLoading(false);
           hasCache = true;
         }
       } catch (e) { }
 
       try {
-        const res = await fetch(`/api/properties?mode=${filterMode}`);
+        const res = await fetch(`/api/properties?${query}`);
         if (!res.ok) throw new Error("Failed to fetch properties");
         const data = await res.json();
+        const cursor = res.headers.get("X-Next-Cursor");
 
-        // Only update if different or no cache (simple check: length)
-        // Actually always update to be fresh, but we already showed cached data so it's fine.
+        // Always update to be fresh, but we already showed cached data so it's fine.
         setProperties(data);
-        sessionStorage.setItem(cacheKeyProps, JSON.stringify(data));
+        setNextCursor(cursor);
+        sessionStorage.setItem(cacheKeyProps, JSON.stringify({ items: data, cursor }));
 
         if (!hasCache) setLoading(false);
       } catch (err: any) {
@@ -132,7 +106,26 @@ export default function Home() {
     }
 
     loadData();
-  }, [filterMode, tenant]);
+  }, [query, prefsLoaded]);
+
+  async function loadMore() {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const res = await fetch(`/api/properties?${query}&cursor=${encodeURIComponent(nextCursor)}`);
+      if (!res.ok) throw new Error("Failed to fetch properties");
+      const data: Property[] = await res.json();
+      const cursor = res.headers.get("X-Next-Cursor");
+      const items = [...properties, ...data];
+      setProperties(items);
+      setNextCursor(cursor);
+      sessionStorage.setItem(`properties-v3-${query}`, JSON.stringify({ items, cursor }));
+    } catch (err: any) {
+      setError(err.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  }
 
   // Effect to save UI state changes
   useEffect(() => {
@@ -261,11 +254,23 @@ export default function Home() {
           </div>
         ) : (
           <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-8 md:gap-12">
-            {filteredProperties.map((prop) => (
+            {properties.map((prop) => (
               <PropertyCard key={prop.id} property={prop} showDualCurrency={showDualCurrency} />
             ))}
           </div>
         )}
+
+        {!loading && !error && nextCursor && (
+          <div className="text-center mt-12">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="text-xs uppercase tracking-widest border border-black px-6 py-2 hover:bg-black hover:text-white disabled:opacity-50"
+            >
+              {loadingMore ? "Cargando..." : "Cargar más"}
+            </button>
+          </div>
+        )}
       </section>
 
       {/* Simple Footer */}
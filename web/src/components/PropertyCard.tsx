@@ -2,6 +2,7 @@ import { Property } from "@/types/property";
 import Image from "next/image";
 import Link from "next/link";
 import { formatPriceDual } from "@/lib/utils";
+import imageLoader from "@/lib/imageLoader";
 
 interface PropertyCardProps {
     property: Property;
@@ -27,9 +28,10 @@ export function PropertyCard({ property, showDualCurrency = true }: PropertyCard
                     <Image
                         src={property.image_url || "/placeholder.jpg"}
                         alt={property.title}
+                        loader={imageLoader}
                         fill
+                        sizes="(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw"
                         className="object-cover transition-transform duration-700 group-hover:scale-105"
-                        unoptimized
                     />
                     {/* Overlay cue on hover */}
                     <div className="absolute inset-0 bg-black/0 group-hover:bg-black/10 transition-colors duration-300" />
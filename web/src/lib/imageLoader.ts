@@ -0,0 +1,10 @@
+import type { ImageLoaderProps } from "next/image";
+
+// Grid images go through the API's /api/images proxy, which caches resized
+// JPEG/WebP variants on disk. Local assets (placeholder) are served as-is.
+export default function imageLoader({ src, width }: ImageLoaderProps): string {
+    if (src.startsWith("/")) {
+        return src;
+    }
+    return `/api/images?src=${encodeURIComponent(src)}&w=${width}`;
+}
@@ -8,4 +8,9 @@ export interface Property {
     size?: string;
     bedrooms?: string;
     bathrooms?: string;
+    // Normalized by the API; null when upstream has no number ("Consultar")
+    price_eur?: number | null;
+    size_m2?: number | null;
+    num_bedrooms?: number | null;
+    num_bathrooms?: number | null;
 }